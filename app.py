@@ -1,23 +1,40 @@
 import os
+import hmac
+import json
+import math
 import time
+import asyncio
+from contextlib import asynccontextmanager, suppress
 import logging
 import urllib.parse
-import urllib.request
-import json
 import pyotp
-import qrcode
-import base64
-from io import BytesIO
 from starlette.exceptions import HTTPException as StarletteHTTPException
-from fastapi import FastAPI, Request, Depends, Form, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import OperationalError
+from fastapi import FastAPI, Request, Depends, Form, File, UploadFile, status
+from fastapi.responses import RedirectResponse, PlainTextResponse, JSONResponse, Response
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
 import bcrypt
 import models
-from database import engine, get_db, SessionLocal
+import cache
+from bcrypt_pool import PoolBcrypt, PoolSaturado
+from recaptcha import VerificadorRecaptcha, RecaptchaIndisponivel
+from qr import ServicoQRCode
+from sitemap import GeradorSitemap, TAG_SITEMAP, paginas_publicas
+from assets import Manifesto, StaticFilesPrecomprimidos
+import metrics
+from ratelimit import LimitadorTentativas, RATE_LIMIT_IP, RATE_LIMIT_USUARIO
+from sessions import ArmazemSessoes, UsuarioSessao, SESSAO, CONFIANCA, PRE_AUTH
+from database import async_engine, get_db, AsyncSessionLocal, roteador_leitura
+from inicializacao import EstadoInicializacao, AguardarInicializacao, inicializar
+from paginacao import paginar, decodificar_cursor, limitar, LIMITE_PADRAO
+from busca import BuscaProjetos
+from compressao import MiddlewareCompressao
+from templating import criar_templates, precompilar
+from erro404 import Pagina404, BloqueioScanner
+from exportacao import Exportador, ServirExportacao
+import estatisticas
+import transferencia
+import read_models
 
 # --- CONFIGURAÇÃO DE LOG ---
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +52,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         hashed_password.encode('utf-8')
     )
 
+# Como verify_password, mas um hash vazio ou corrompido conta como "não confere"
+def senha_confere(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return bool(hashed_password) and verify_password(plain_password, hashed_password)
+    except ValueError:
+        return False
+
+# Todo bcrypt feito pelas rotas passa por aqui, fora do event loop
+pool_bcrypt = PoolBcrypt()
+
 def validar_senha_forte(senha: str) -> bool:
     if len(senha) < 8: return False
     if not any(c.isupper() for c in senha): return False
@@ -43,126 +70,330 @@ def validar_senha_forte(senha: str) -> bool:
     return True
 
 # --- UTILITÁRIO DO WHATSAPP ---
-def get_whatsapp_url(db: Session):
-    wp = db.query(models.WhatsappConfig).first()
+async def get_whatsapp_url(db: AsyncSession):
+    wp = await read_models.primeiro(db, read_models.WhatsappLeitura)
     if wp and wp.numero:
         numero_limpo = ''.join(filter(str.isdigit, wp.numero))
         msg = urllib.parse.quote(wp.mensagem or "")
         return f"https://api.whatsapp.com/send?phone={numero_limpo}&text={msg}"
     return None
 
-# --- PRELOAD: VERIFICAÇÃO DE DISPONIBILIDADE DO BANCO DE DADOS ---
-def wait_for_db():
-    retries = 60  # Aumentamos para 60 tentativas
-    while retries > 0:
-        try:
-            # Tenta estabelecer uma conexão real com o banco
-            with engine.connect() as conn:
-                logger.info("[OK] Conexão com o banco de dados estabelecida com sucesso!")
-                return
-        except Exception as e:
-            retries -= 1
-            logger.warning(f"[AGUARDANDO] Banco de dados iniciando. Retentando em 3s... ({retries} restantes)")
-            logger.error(f"Motivo da recusa: {e}")
-            time.sleep(3)
-            
-    logger.error("[ERRO FATAL] Não foi possível conectar ao banco de dados após múltiplas tentativas.")
-    exit(1)
+# --- CACHE DO LAYOUT (CONTATOS DO RODAPÉ + WHATSAPP) ---
+# Compartilhado por todas as páginas públicas; invalidado pelas rotas admin de contatos e WhatsApp
+async def carregar_layout(db: AsyncSession):
+    contatos = await read_models.listar(db, read_models.ContatoLeitura,
+                                        read_models.consulta(read_models.ContatoLeitura).limit(10))
+    return {"contatos": contatos, "whatsapp_url": await get_whatsapp_url(db)}
+
+# --- VITRINE DE PROJETOS (PÁGINA INICIAL + API /projetos) ---
+# A página inicial traz só a primeira página; o restante vem de /projetos, paginado por chave (id).
+# O índice de categoria já carrega o id junto, então o filtro também não ordena em memória.
+PROJETOS_POR_PAGINA = int(os.environ.get("PROJETOS_POR_PAGINA", "12"))
+
+def consulta_projetos(categoria: str = None):
+    consulta = read_models.consulta(read_models.ProjetoLeitura)
+    if categoria:
+        consulta = consulta.where(models.Projeto.categoria == categoria)
+    return consulta
+
+async def carregar_projetos(db: AsyncSession):
+    pagina = await paginar(db, consulta_projetos(), models.Projeto.id, models.Projeto.id, limite=PROJETOS_POR_PAGINA)
+    categorias = (await db.scalars(
+        select(models.Projeto.categoria).where(models.Projeto.categoria.isnot(None))
+        .distinct().order_by(models.Projeto.categoria)
+    )).all()
+    projetos = read_models.converter(read_models.ProjetoLeitura, pagina.itens)
+    return {"projetos": projetos, "projetos_proximo": pagina.proximo, "categorias": categorias}
+
+def projeto_json(projeto: read_models.ProjetoLeitura) -> dict:
+    return projeto._asdict()
+
+# Cada página da API já sai serializada (corpo, ETag e cursor seguinte): acertos no cache não tocam no banco nem no Jinja
+async def carregar_pagina_projetos(db: AsyncSession, formato: str, categoria: str, cursor: str, limite: int):
+    pagina = await paginar(db, consulta_projetos(categoria), models.Projeto.id, models.Projeto.id, cursor, limite)
+    projetos = read_models.converter(read_models.ProjetoLeitura, pagina.itens)
+    if formato == "html":
+        corpo = templates.get_template("projetos_cards.html").render({"projetos": projetos}).encode("utf-8")
+    else:
+        corpo = json.dumps({
+            "projetos": [projeto_json(p) for p in projetos],
+            "proximo": pagina.proximo,
+        }, ensure_ascii=False).encode("utf-8")
+    return corpo, cache.gerar_etag(corpo), pagina.proximo
+
+# Índice invertido da busca (/busca): construído no startup e mantido pelas rotas admin de projetos
+busca_projetos = BuscaProjetos()
+
+layout_cache = cache.CacheVersionado([cache.LAYOUT], carregar_layout)
+projetos_cache = cache.CacheVersionado([cache.PROJETOS], carregar_projetos)
+paginas_projetos_cache = cache.CacheConsultas([cache.PROJETOS], carregar_pagina_projetos)
+
+# Carrega todos os templates antes do primeiro visitante (do bytecode, quando pré-compilados no build)
+async def aquecer_templates():
+    inicio = time.perf_counter()
+    quantidade = precompilar(templates.env)
+    logger.info(f"[TEMPLATES] {quantidade} templates carregados em {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+
+# --- CICLO DE VIDA (LIFESPAN) ---
+# Banco, schema e seed ficam numa task: o processo sobe na hora e o /healthz já responde,
+# enquanto o /readyz só libera o tráfego quando tudo estiver pronto
+estado_inicializacao = EstadoInicializacao()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tarefa = asyncio.create_task(inicializar(async_engine, models.Base.metadata, seed_inicial, estado_inicializacao,
+                                             aquecer=(busca_projetos.reconstruir, aquecer_templates),
+                                             seed_em_dia=seed_em_dia))
+    # Health check das réplicas de leitura (DB_REPLICA_URLS / DB_REPLICA_HOSTS), quando configuradas
+    monitor_replicas = asyncio.create_task(roteador_leitura.monitorar()) if roteador_leitura else None
+    # Visualizações e cliques no WhatsApp acumulam em memória e são gravados em lote
+    gravacao_acessos = asyncio.create_task(acessos.executar())
+    yield
+    tarefa.cancel()
+    if monitor_replicas:
+        monitor_replicas.cancel()
+    gravacao_acessos.cancel()
+    # Espera a task terminar de fato: cancelada no meio de um gravar(), o lote dela volta para a memória
+    # antes da gravação final (senão as duas rodariam juntas e a final não veria essas contagens)
+    with suppress(asyncio.CancelledError):
+        await gravacao_acessos
+    if estado_inicializacao.pronto.is_set():
+        await acessos.encerrar()
+    logger.info(f"[BCRYPT] Métricas do pool: {pool_bcrypt.metricas()}")
+    pool_bcrypt.encerrar()
+    await verificador_recaptcha.fechar()
+
+app = FastAPI(title="Henrique.tec.br", description="Infraestrutura e Sistemas", lifespan=lifespan)
+app.add_middleware(AguardarInicializacao, estado=estado_inicializacao)
+# Robôs atrás de /wp-admin, /.env, *.php... levam um 404 em texto antes do roteamento (SCANNER_BLOQUEIO_RAPIDO)
+app.add_middleware(BloqueioScanner)
+# Brotli/gzip nas respostas de texto (o tempo de compressão entra na latência medida pelo middleware de métricas)
+app.add_middleware(MiddlewareCompressao)
+# Com EXPORT_SERVIR=True as páginas públicas saem dos arquivos do `python exportacao.py` (antes mesmo do banco subir)
+exportador = Exportador(app)
+app.add_middleware(ServirExportacao, exportador=exportador)
+# Por fora da exportação: páginas servidas do disco também entram nas estatísticas
+acessos = estatisticas.ContadorAcessos()
+app.add_middleware(estatisticas.MiddlewareAcessos, contador=acessos, site=app)
+app.add_middleware(metrics.MiddlewareMetricas)
+
+# Assets com hash no nome (gerados pelo build_assets.py) e variantes .br/.gz pré-comprimidas
+manifesto = Manifesto("static")
+app.mount("/static", StaticFilesPrecomprimidos(directory="static", manifesto=manifesto), name="static")
+# Bytecode pré-compilado no build (JINJA_BYTECODE_DIR) e sem conferir mtime em produção (JINJA_AUTO_RELOAD=False)
+templates = criar_templates()
+templates.env.globals["static_url"] = manifesto.static_url
+# Com o CSS compilado no build, o base.html dispensa o runtime do Tailwind via CDN
+templates.env.globals["tailwind_compilado"] = "css/site.css" in manifesto
 
-# Executa a verificação ANTES de tentar criar as tabelas
-wait_for_db()
-models.Base.metadata.create_all(bind=engine)
+APP_VERSION = os.environ.get("APP_VERSION", "dev-local")
 
-app = FastAPI(title="Henrique.tec.br", description="Infraestrutura e Sistemas")
+# HTML das páginas públicas pronto em memória, com ETag e reconstrução após edições no painel
+# A sessão é consultada só na hora da requisição (o armazém é criado mais abaixo)
+paginas = cache.CachePaginas(templates, sessao_ativa=lambda token: sessoes.obter(token, SESSAO))
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+async def contexto_layout():
+    return {**await layout_cache.get(), "version": APP_VERSION}
 
-APP_VERSION = os.environ.get("APP_VERSION", "dev-local")
+async def contexto_index():
+    return {**await projetos_cache.get(), **await contexto_layout()}
 
 # --- CONFIGURAÇÕES DO RECAPTCHA ---
 ENABLE_RECAPTCHA = os.environ.get("ENABLE_RECAPTCHA", "False").lower() == "true"
 RECAPTCHA_SITE_KEY = os.environ.get("RECAPTCHA_SITE_KEY", "")
 RECAPTCHA_SECRET_KEY = os.environ.get("RECAPTCHA_SECRET_KEY", "")
-
-# --- STARTUP ---
-@app.on_event("startup")
-def startup_event():
-    db = next(get_db())
-    admin_pwd = os.environ.get("ADMIN_PASSWORD", "admin") 
-    
-    admin_user = db.query(models.Usuario).filter(models.Usuario.username == "admin").first()
-    if not admin_user:
-        admin_user = models.Usuario(username="admin", password_hash=get_password_hash(admin_pwd))
-        db.add(admin_user)
-    else:
-        admin_user.password_hash = get_password_hash(admin_pwd)
-        
-    if not db.query(models.WhatsappConfig).first():
-        wp_config = models.WhatsappConfig(numero="5500000000000", mensagem="Olá! Gostaria de falar sobre Infraestrutura e Sistemas.")
-        db.add(wp_config)
-        
-    db.commit()
+verificador_recaptcha = VerificadorRecaptcha(RECAPTCHA_SECRET_KEY)
+
+# --- QR CODES DO 2FA ---
+servico_qr = ServicoQRCode()
+
+async def qr_code_totp(user: models.Usuario) -> str:
+    uri = pyotp.TOTP(user.totp_secret).provisioning_uri(name=user.username, issuer_name="Henrique.tec.br")
+    return await servico_qr.obter(user.username, uri)
+
+# --- SITEMAP ---
+sitemap_xml = GeradorSitemap(app)
+
+# --- SEED (SOB A TRAVA DO SCHEMA, SÓ QUANDO seed_em_dia() NÃO CONFIRMA QUE JÁ ESTÁ APLICADO) ---
+# Conferência somente leitura, feita por cada réplica em paralelo (sem trava)
+async def seed_em_dia() -> bool:
+    admin_pwd = os.environ.get("ADMIN_PASSWORD", "admin")
+    async with AsyncSessionLocal() as db:
+        hash_admin = await db.scalar(select(models.Usuario.password_hash).where(models.Usuario.username == "admin"))
+        tem_whatsapp = await db.scalar(select(models.WhatsappConfig.id).limit(1)) is not None
+    return tem_whatsapp and hash_admin is not None and await pool_bcrypt.executar(senha_confere, admin_pwd, hash_admin)
+
+async def seed_inicial():
+    admin_pwd = os.environ.get("ADMIN_PASSWORD", "admin")
+    async with AsyncSessionLocal() as db:
+        admin_user = await db.scalar(select(models.Usuario).where(models.Usuario.username == "admin"))
+        if not admin_user:
+            admin_user = models.Usuario(username="admin", password_hash=await pool_bcrypt.executar(get_password_hash, admin_pwd))
+            db.add(admin_user)
+            logger.info("[SEED] Usuário admin criado.")
+        elif not await pool_bcrypt.executar(senha_confere, admin_pwd, admin_user.password_hash):
+            # Só regrava o hash quando o ADMIN_PASSWORD realmente mudou
+            admin_user.password_hash = await pool_bcrypt.executar(get_password_hash, admin_pwd)
+            logger.info("[SEED] ADMIN_PASSWORD alterado: hash do admin atualizado.")
+
+        if not await db.scalar(select(models.WhatsappConfig).limit(1)):
+            wp_config = models.WhatsappConfig(numero="5500000000000", mensagem="Olá! Gostaria de falar sobre Infraestrutura e Sistemas.")
+            db.add(wp_config)
+
+        await db.commit()
+
+# --- SAÚDE (LIVENESS E READINESS) ---
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Só falha se a inicialização desistiu (ex: banco fora do ar além do DB_STARTUP_TIMEOUT): o orquestrador reinicia
+    if estado_inicializacao.erro:
+        return JSONResponse({"status": "erro", "erro": estado_inicializacao.erro}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    if not estado_inicializacao.pronto.is_set():
+        return JSONResponse({"status": "iniciando"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        async with async_engine.connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), 2)
+    except Exception as e:
+        return JSONResponse({"status": "sem_banco", "erro": str(e)}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "pronto", "inicializacao_s": round(estado_inicializacao.duracao, 3)}
 
 # --- ROTAS PÚBLICAS ---
-@app.get("/")
-async def read_root(request: Request, db: Session = Depends(get_db)):
-    projetos = db.query(models.Projeto).all()
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    return templates.TemplateResponse("index.html", {"request": request, "projetos": projetos, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
-
-@app.get("/servicos/linux")
-async def servicos_linux(request: Request, db: Session = Depends(get_db)):
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    return templates.TemplateResponse("linux.html", {"request": request, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
-
-@app.get("/servicos/firewall")
-async def servicos_firewall(request: Request, db: Session = Depends(get_db)):
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
+@app.get("/", tags=[TAG_SITEMAP])
+async def read_root(request: Request):
+    return await paginas.responder(request, "index.html", contexto_index, chaves=(cache.LAYOUT, cache.PROJETOS))
+
+@app.get("/servicos/linux", tags=[TAG_SITEMAP])
+async def servicos_linux(request: Request):
+    return await paginas.responder(request, "linux.html", contexto_layout)
+
+@app.get("/servicos/firewall", tags=[TAG_SITEMAP])
+async def servicos_firewall(request: Request):
     # Note que já deixei preparado para buscar o arquivo firewall.html que criaremos em seguida
-    return templates.TemplateResponse("firewall.html", {"request": request, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
-
-@app.get("/servicos/desktop")
-async def servicos_desktop(request: Request, db: Session = Depends(get_db)):
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    return templates.TemplateResponse("desktop.html", {"request": request, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
-
-@app.get("/servicos/docker")
-async def servicos_docker(request: Request, db: Session = Depends(get_db)):
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    return templates.TemplateResponse("docker.html", {"request": request, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
-
-@app.get("/servicos/virtualizacao")
-async def servicos_virtualizacao(request: Request, db: Session = Depends(get_db)):
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    return templates.TemplateResponse("virtualizacao.html", {"request": request, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
-
-@app.get("/servicos/desenvolvimento")
-async def servicos_desenvolvimento(request: Request, db: Session = Depends(get_db)):
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    return templates.TemplateResponse("desenvolvimento.html", {"request": request, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url})
+    return await paginas.responder(request, "firewall.html", contexto_layout)
+
+@app.get("/servicos/desktop", tags=[TAG_SITEMAP])
+async def servicos_desktop(request: Request):
+    return await paginas.responder(request, "desktop.html", contexto_layout)
+
+@app.get("/servicos/docker", tags=[TAG_SITEMAP])
+async def servicos_docker(request: Request):
+    return await paginas.responder(request, "docker.html", contexto_layout)
+
+@app.get("/servicos/virtualizacao", tags=[TAG_SITEMAP])
+async def servicos_virtualizacao(request: Request):
+    return await paginas.responder(request, "virtualizacao.html", contexto_layout)
+
+@app.get("/servicos/desenvolvimento", tags=[TAG_SITEMAP])
+async def servicos_desenvolvimento(request: Request):
+    return await paginas.responder(request, "desenvolvimento.html", contexto_layout)
+
+# API pública da vitrine: formato=json (padrão) ou html (os mesmos cards da página inicial)
+@app.get("/projetos")
+async def listar_projetos(request: Request, categoria: str = None, cursor: str = None, limite: int = PROJETOS_POR_PAGINA, formato: str = "json"):
+    formato = "html" if formato == "html" else "json"
+    categoria = (categoria or "").strip()[:50] or None
+    # Cursores inválidos viram a primeira página, então nem ocupam uma entrada própria no cache
+    cursor = cursor if decodificar_cursor(cursor) else None
+    corpo, etag, proximo = await paginas_projetos_cache.get(formato, categoria, cursor, limitar(limite))
+
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if proximo:
+        cabecalhos["X-Proximo-Cursor"] = proximo
+    if cache.etag_confere(request, etag):
+        return Response(status_code=304, headers=cabecalhos)
+    tipo = "text/html; charset=utf-8" if formato == "html" else "application/json"
+    return Response(corpo, media_type=tipo, headers=cabecalhos)
+
+# Busca textual nos projetos (título, categoria e descrição), ranqueada por BM25
+async def carregar_projetos_por_id(db: AsyncSession, ids: list):
+    return await read_models.listar(db, read_models.ProjetoLeitura,
+                                    consulta_projetos().where(models.Projeto.id.in_(ids)))
+
+@app.get("/busca")
+async def buscar_projetos(request: Request, q: str = "", limite: int = 20, formato: str = "json"):
+    q = q.strip()[:200]
+    melhores, total = await busca_projetos.buscar(q, limitar(limite)) if q else ([], 0)
+    ids = [doc_id for _, doc_id in melhores]
+    por_id = {}
+    if ids:
+        por_id = {p.id: p for p in await cache.ler(carregar_projetos_por_id, ids)}
+    # Mantém a ordem do ranking (e ignora ids que sumiram entre o índice e o banco)
+    projetos = [por_id[doc_id] for doc_id in ids if doc_id in por_id]
+
+    if formato == "html":
+        return templates.TemplateResponse("projetos_cards.html", {"request": request, "projetos": projetos},
+                                          headers={"X-Total-Resultados": str(total)})
+    pontuacoes = {doc_id: pontuacao for pontuacao, doc_id in melhores}
+    return JSONResponse({
+        "consulta": q, "total": total,
+        "projetos": [{**projeto_json(p), "pontuacao": round(pontuacoes[p.id], 4)} for p in projetos],
+    })
+
+# --- SESSÕES ---
+sessoes = ArmazemSessoes()
+
+class NaoAutenticado(Exception):
+    pass
+
+@app.exception_handler(NaoAutenticado)
+async def nao_autenticado_handler(request: Request, exc: NaoAutenticado):
+    response = RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+    response.delete_cookie("session_token")
+    return response
+
+# Dependência de todas as rotas /admin/*: resolve o usuário pelo token, sem ir ao banco
+async def usuario_atual(request: Request) -> UsuarioSessao:
+    usuario = await sessoes.obter(request.cookies.get("session_token"), SESSAO)
+    if not usuario:
+        raise NaoAutenticado()
+    return usuario
+
+async def iniciar_sessao(user: models.Usuario, trust_device: bool = False):
+    response = RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
+    response.set_cookie(key="session_token", value=await sessoes.criar(user, SESSAO), httponly=True)
+    
+    # Cria cookie separado para confiar no dispositivo
+    if trust_device:
+        response.set_cookie(key="trusted_device", value=await sessoes.criar(user, CONFIANCA), httponly=True, max_age=2592000)
+    return response
+
+# Usuário que já passou pela senha e ainda precisa do código 2FA
+async def usuario_pre_auth(request: Request, db: AsyncSession):
+    pre_auth = await sessoes.obter(request.cookies.get("pre_auth_user"), PRE_AUTH)
+    if not pre_auth:
+        return None
+    return await db.get(models.Usuario, pre_auth.id)
+
+# --- LIMITE DE TENTATIVAS (LOGIN E 2FA) ---
+# Checado antes de qualquer bcrypt/TOTP: uma tentativa bloqueada não custa CPU
+limite_ip = LimitadorTentativas("ip", RATE_LIMIT_IP)
+limite_usuario = LimitadorTentativas("usuario", RATE_LIMIT_USUARIO)
+
+# Devolve None (pode tentar) ou os segundos até a próxima tentativa; o IP é checado primeiro
+# para um IP já bloqueado não continuar gastando o contador do usuário
+async def tentativa_bloqueada(request: Request, chave_usuario: str):
+    ip = request.client.host if request.client else None
+    return await limite_ip.consumir(ip) or await limite_usuario.consumir(chave_usuario)
+
+def aviso_bloqueio(espera: float):
+    minutos = math.ceil(espera / 60)
+    return (f"Muitas tentativas. Tente novamente em {minutos} minuto{'s' if minutos > 1 else ''}.",
+            {"Retry-After": str(math.ceil(espera))})
 
 # --- ROTAS ADMIN (AUTENTICAÇÃO) ---
 @app.get("/admin")
-async def admin_login_page(request: Request, db: Session = Depends(get_db)):
-    if request.cookies.get("session_token"):
+async def admin_login_page(request: Request):
+    if await sessoes.obter(request.cookies.get("session_token"), SESSAO):
         return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
     
-    contatos = db.query(models.Contato).limit(10).all()
-    wp_url = get_whatsapp_url(db)
-    
     return templates.TemplateResponse("admin_login.html", {
         "request": request, 
-        "contatos": contatos, 
+        **await layout_cache.get(), 
         "version": APP_VERSION, 
-        "whatsapp_url": wp_url,
         "enable_recaptcha": ENABLE_RECAPTCHA,
         "recaptcha_site_key": RECAPTCHA_SITE_KEY
     })
@@ -172,8 +403,13 @@ async def admin_login_post(
     request: Request, 
     username: str = Form(...), 
     password: str = Form(...), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
+    espera = await tentativa_bloqueada(request, username)
+    if espera:
+        erro_msg, cabecalhos = aviso_bloqueio(espera)
+        return templates.TemplateResponse("admin_login.html", {"request": request, "erro": True, "erro_msg": erro_msg, **await layout_cache.get(), "version": APP_VERSION, "enable_recaptcha": ENABLE_RECAPTCHA, "recaptcha_site_key": RECAPTCHA_SITE_KEY}, status_code=status.HTTP_429_TOO_MANY_REQUESTS, headers=cabecalhos)
+
     form_data = await request.form()
     g_recaptcha_response = form_data.get("g-recaptcha-response")
     erro_msg = None
@@ -182,289 +418,383 @@ async def admin_login_post(
         if not g_recaptcha_response:
             erro_msg = "Por favor, marque a caixa 'Não sou um robô'."
         else:
-            url = 'https://www.google.com/recaptcha/api/siteverify'
-            data = urllib.parse.urlencode({'secret': RECAPTCHA_SECRET_KEY, 'response': g_recaptcha_response}).encode('utf-8')
-            req = urllib.request.Request(url, data=data)
             try:
-                with urllib.request.urlopen(req) as response:
-                    if not json.loads(response.read().decode()).get('success'):
-                        erro_msg = "Falha na validação do reCAPTCHA."
-            except Exception as e:
+                ip = request.client.host if request.client else None
+                if not await verificador_recaptcha.verificar(g_recaptcha_response, ip):
+                    erro_msg = "Falha na validação do reCAPTCHA."
+            except RecaptchaIndisponivel as e:
                 logger.error(f"Erro reCAPTCHA: {e}")
                 erro_msg = "Erro interno ao validar o reCAPTCHA."
 
-    user = db.query(models.Usuario).filter(models.Usuario.username == username).first()
+    user = await db.scalar(select(models.Usuario).where(models.Usuario.username == username))
+    senha_valida = False
+    status_code = status.HTTP_200_OK
+    if not erro_msg and user:
+        try:
+            senha_valida = await pool_bcrypt.executar(verify_password, password, user.password_hash)
+        except PoolSaturado:
+            erro_msg = "Servidor ocupado. Tente novamente em instantes."
+            status_code = status.HTTP_503_SERVICE_UNAVAILABLE
     
-    if erro_msg or not user or not verify_password(password, user.password_hash):
+    if erro_msg or not senha_valida:
         if not erro_msg: erro_msg = "Credenciais inválidas."
-        contatos = db.query(models.Contato).limit(10).all()
-        wp_url = get_whatsapp_url(db)
-        return templates.TemplateResponse("admin_login.html", {"request": request, "erro": True, "erro_msg": erro_msg, "contatos": contatos, "version": APP_VERSION, "whatsapp_url": wp_url, "enable_recaptcha": ENABLE_RECAPTCHA, "recaptcha_site_key": RECAPTCHA_SITE_KEY})
+        return templates.TemplateResponse("admin_login.html", {"request": request, "erro": True, "erro_msg": erro_msg, **await layout_cache.get(), "version": APP_VERSION, "enable_recaptcha": ENABLE_RECAPTCHA, "recaptcha_site_key": RECAPTCHA_SITE_KEY}, status_code=status_code)
     
+    await limite_usuario.limpar(username)
+
     # 1. Se for o admin, pula o 2FA
     if user.username == 'admin':
-        response = RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
-        response.set_cookie(key="session_token", value=user.username, httponly=True)
-        return response
+        return await iniciar_sessao(user)
 
     # 1.5 NOVO: Verifica se o dispositivo possui o passaporte de confiança de 30 dias
     # CORREÇÃO DE SEGURANÇA: Só aceita pular o 2FA se o usuário ainda tiver o 2FA ativo no banco!
-    if request.cookies.get("trusted_device") == user.username and user.is_2fa_enabled:
-        response = RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
-        response.set_cookie(key="session_token", value=user.username, httponly=True)
-        return response
+    confiavel = await sessoes.obter(request.cookies.get("trusted_device"), CONFIANCA)
+    if confiavel and confiavel.id == user.id and user.is_2fa_enabled:
+        return await iniciar_sessao(user)
         
     # 2. Se não for admin e não for dispositivo confiável, vai pro 2FA
     url_destino = "/admin/2fa-verify" if user.is_2fa_enabled else "/admin/2fa-setup"
     response = RedirectResponse(url=url_destino, status_code=status.HTTP_302_FOUND)
-    response.set_cookie(key="pre_auth_user", value=user.username, httponly=True, max_age=300)
+    response.set_cookie(key="pre_auth_user", value=await sessoes.criar(user, PRE_AUTH), httponly=True, max_age=300)
     return response
 
 # --- ROTAS ADMIN (2FA) ---
 @app.get("/admin/2fa-setup")
-async def admin_2fa_setup(request: Request, db: Session = Depends(get_db)):
-    pre_auth_user = request.cookies.get("pre_auth_user")
-    if not pre_auth_user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+async def admin_2fa_setup(request: Request, db: AsyncSession = Depends(get_db)):
+    user = await usuario_pre_auth(request, db)
+    if not user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
     
-    user = db.query(models.Usuario).filter(models.Usuario.username == pre_auth_user).first()
     if not user.totp_secret:
         user.totp_secret = pyotp.random_base32()
-        db.commit()
+        await db.commit()
+        servico_qr.invalidar(user.username)
         
-    totp = pyotp.TOTP(user.totp_secret)
-    uri = totp.provisioning_uri(name=user.username, issuer_name="Henrique.tec.br")
-    
-    img = qrcode.make(uri)
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    qr_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    
-    return templates.TemplateResponse("admin_2fa_setup.html", {"request": request, "qr_code": qr_base64, "secret": user.totp_secret, "version": APP_VERSION})
+    qr_code = await qr_code_totp(user)
+    return templates.TemplateResponse("admin_2fa_setup.html", {"request": request, "qr_code": qr_code, "secret": user.totp_secret, "version": APP_VERSION})
 
 @app.post("/admin/2fa-setup")
-async def admin_2fa_setup_post(request: Request, code: str = Form(...), db: Session = Depends(get_db)):
+async def admin_2fa_setup_post(request: Request, code: str = Form(...), db: AsyncSession = Depends(get_db)):
     form_data = await request.form()
     trust_device = form_data.get("trust_device") == "on"
 
-    pre_auth_user = request.cookies.get("pre_auth_user")
-    if not pre_auth_user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    
-    user = db.query(models.Usuario).filter(models.Usuario.username == pre_auth_user).first()
+    user = await usuario_pre_auth(request, db)
+    if not user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+
+    espera = await tentativa_bloqueada(request, f"2fa:{user.username}")
+    if espera:
+        erro_msg, cabecalhos = aviso_bloqueio(espera)
+        qr_code = await qr_code_totp(user)
+        return templates.TemplateResponse("admin_2fa_setup.html", {"request": request, "erro": True, "erro_msg": erro_msg, "qr_code": qr_code, "secret": user.totp_secret, "version": APP_VERSION}, status_code=status.HTTP_429_TOO_MANY_REQUESTS, headers=cabecalhos)
+
     totp = pyotp.TOTP(user.totp_secret)
     
     if totp.verify(code):
         user.is_2fa_enabled = True
-        db.commit()
-        
-        response = RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
-        response.set_cookie(key="session_token", value=user.username, httponly=True)
+        await db.commit()
+        await limite_usuario.limpar(f"2fa:{user.username}")
         
-        # Cria cookie separado para confiar no dispositivo
-        if trust_device:
-            response.set_cookie(key="trusted_device", value=user.username, httponly=True, max_age=2592000)
-            
+        response = await iniciar_sessao(user, trust_device)
+        await sessoes.encerrar(request.cookies.get("pre_auth_user"))
         response.delete_cookie("pre_auth_user")
         return response
         
-    uri = totp.provisioning_uri(name=user.username, issuer_name="Henrique.tec.br")
-    img = qrcode.make(uri)
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    qr_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return templates.TemplateResponse("admin_2fa_setup.html", {"request": request, "erro": True, "qr_code": qr_base64, "secret": user.totp_secret, "version": APP_VERSION})
+    qr_code = await qr_code_totp(user)
+    return templates.TemplateResponse("admin_2fa_setup.html", {"request": request, "erro": True, "qr_code": qr_code, "secret": user.totp_secret, "version": APP_VERSION})
 
 @app.get("/admin/2fa-verify")
 async def admin_2fa_verify(request: Request):
-    if not request.cookies.get("pre_auth_user"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+    if not await sessoes.obter(request.cookies.get("pre_auth_user"), PRE_AUTH): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
     return templates.TemplateResponse("admin_2fa_verify.html", {"request": request, "version": APP_VERSION})
 
 @app.post("/admin/2fa-verify")
-async def admin_2fa_verify_post(request: Request, code: str = Form(...), db: Session = Depends(get_db)):
+async def admin_2fa_verify_post(request: Request, code: str = Form(...), db: AsyncSession = Depends(get_db)):
     form_data = await request.form()
     trust_device = form_data.get("trust_device") == "on"
 
-    pre_auth_user = request.cookies.get("pre_auth_user")
-    if not pre_auth_user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    
-    user = db.query(models.Usuario).filter(models.Usuario.username == pre_auth_user).first()
+    user = await usuario_pre_auth(request, db)
+    if not user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+
+    espera = await tentativa_bloqueada(request, f"2fa:{user.username}")
+    if espera:
+        erro_msg, cabecalhos = aviso_bloqueio(espera)
+        return templates.TemplateResponse("admin_2fa_verify.html", {"request": request, "erro": True, "erro_msg": erro_msg, "version": APP_VERSION}, status_code=status.HTTP_429_TOO_MANY_REQUESTS, headers=cabecalhos)
+
     totp = pyotp.TOTP(user.totp_secret)
     
     if totp.verify(code):
-        response = RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
-        response.set_cookie(key="session_token", value=user.username, httponly=True)
-        
-        # Cria cookie separado para confiar no dispositivo
-        if trust_device:
-            response.set_cookie(key="trusted_device", value=user.username, httponly=True, max_age=2592000)
-            
+        await limite_usuario.limpar(f"2fa:{user.username}")
+        response = await iniciar_sessao(user, trust_device)
+        await sessoes.encerrar(request.cookies.get("pre_auth_user"))
         response.delete_cookie("pre_auth_user")
         return response
         
     return templates.TemplateResponse("admin_2fa_verify.html", {"request": request, "erro": True, "version": APP_VERSION})
 
 @app.get("/admin/usuarios/disable_2fa/{usuario_id}")
-async def disable_2fa(request: Request, usuario_id: int, db: Session = Depends(get_db)):
-    current_user = request.cookies.get("session_token")
-    if not current_user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    
-    user = db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
+async def disable_2fa(request: Request, usuario_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    user = await db.get(models.Usuario, usuario_id)
     response = RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
     
     if user and user.username != 'admin':
         user.is_2fa_enabled = False
         user.totp_secret = None
-        db.commit()
+        await db.commit()
+        servico_qr.invalidar(user.username)
+        # Nenhum dispositivo continua pulando o 2FA depois de desativado
+        await sessoes.encerrar_usuario(user.id, CONFIANCA)
         
         # Se o usuário estiver revogando o próprio 2FA, apaga ativamente o cookie do navegador dele
-        if user.username == current_user:
+        if user.id == current_user.id:
             response.delete_cookie("trusted_device")
             
     return response
 
 @app.get("/admin/logout")
-async def admin_logout():
+async def admin_logout(request: Request):
+    await sessoes.encerrar(request.cookies.get("session_token"))
     response = RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
     response.delete_cookie("session_token")
     return response
 
 # --- ROTAS ADMIN (PAINEL GERAL) ---
+# O painel em si só traz o formulário do WhatsApp: as tabelas chegam depois, por aba, via /admin/fragmentos
 @app.get("/admin/dashboard")
-async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
-    current_user = request.cookies.get("session_token")
-    if not current_user:
-        return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    
-    projetos = db.query(models.Projeto).all()
-    contatos = db.query(models.Contato).limit(10).all()
-    usuarios = db.query(models.Usuario).all()
-    wp_config = db.query(models.WhatsappConfig).first()
+async def admin_dashboard(request: Request, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    wp_config = await db.scalar(select(models.WhatsappConfig).limit(1))
     
     return templates.TemplateResponse("admin_dashboard.html", {
-        "request": request, "projetos": projetos, "contatos": contatos, "usuarios": usuarios, 
-        "wp_config": wp_config, "current_user": current_user, "version": APP_VERSION
+        "request": request, "wp_config": wp_config, "current_user": current_user.username, "version": APP_VERSION
     })
 
+# Ordenações aceitas por tabela ("-" na frente = decrescente). Só colunas indexadas: a paginação por
+# chave depende do índice para não virar varredura completa
+ORDENS_PROJETOS = {"id": models.Projeto.id, "titulo": models.Projeto.titulo, "categoria": models.Projeto.categoria}
+ORDENS_USUARIOS = {"id": models.Usuario.id, "username": models.Usuario.username}
+
+def escolher_ordem(ordem: str, ordens: dict, padrao: str):
+    descendente = ordem.startswith("-")
+    coluna = ordens.get(ordem.lstrip("-"))
+    if coluna is None:
+        return escolher_ordem(padrao, ordens, padrao)
+    return coluna, descendente
+
+def resposta_fragmento(request: Request, template: str, pagina, contexto: dict, cursor: str):
+    response = templates.TemplateResponse(template, {
+        "request": request, "primeira_pagina": not cursor, **contexto
+    })
+    if pagina.proximo:
+        response.headers["X-Proximo-Cursor"] = pagina.proximo
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.get("/admin/fragmentos/projetos")
+async def fragmento_projetos(request: Request, q: str = "", ordem: str = "-id", cursor: str = None, limite: int = LIMITE_PADRAO, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    coluna, descendente = escolher_ordem(ordem, ORDENS_PROJETOS, "-id")
+    consulta = select(models.Projeto)
+    if q.strip():
+        consulta = consulta.where(models.Projeto.titulo.contains(q.strip(), autoescape=True))
+    pagina = await paginar(db, consulta, coluna, models.Projeto.id, cursor, limite, descendente)
+    return resposta_fragmento(request, "admin_fragmento_projetos.html", pagina, {"projetos": pagina.itens}, cursor)
+
+@app.get("/admin/fragmentos/contatos")
+async def fragmento_contatos(request: Request, cursor: str = None, limite: int = LIMITE_PADRAO, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    pagina = await paginar(db, select(models.Contato), models.Contato.id, models.Contato.id, cursor, limite)
+    return resposta_fragmento(request, "admin_fragmento_contatos.html", pagina, {"contatos": pagina.itens}, cursor)
+
+@app.get("/admin/fragmentos/usuarios")
+async def fragmento_usuarios(request: Request, q: str = "", ordem: str = "id", cursor: str = None, limite: int = LIMITE_PADRAO, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    coluna, descendente = escolher_ordem(ordem, ORDENS_USUARIOS, "id")
+    consulta = select(models.Usuario)
+    if q.strip():
+        consulta = consulta.where(models.Usuario.username.contains(q.strip(), autoescape=True))
+    pagina = await paginar(db, consulta, coluna, models.Usuario.id, cursor, limite, descendente)
+    return resposta_fragmento(request, "admin_fragmento_usuarios.html", pagina,
+                              {"usuarios": pagina.itens, "current_user": current_user.username}, cursor)
+
+@app.get("/admin/fragmentos/estatisticas")
+async def fragmento_estatisticas(request: Request, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    dados = await estatisticas.resumo(db, paginas_publicas(app))
+    return templates.TemplateResponse("admin_fragmento_estatisticas.html", {"request": request, **dados},
+                                      headers={"Cache-Control": "no-store"})
+
+# --- ROTAS ADMIN (IMPORTAÇÃO E EXPORTAÇÃO EM LOTE) ---
+# /admin/projetos/export, /admin/contatos/import... (NDJSON ou CSV)
+def entidade_transferencia(nome: str):
+    entidade = transferencia.ENTIDADES.get(nome)
+    if entidade is None:
+        raise StarletteHTTPException(status_code=404)
+    return entidade
+
+@app.get("/admin/{nome}/export")
+async def exportar_tabela(nome: str, formato: str = "ndjson", current_user: UsuarioSessao = Depends(usuario_atual)):
+    if formato not in transferencia.FORMATOS:
+        return JSONResponse({"erro": f"formato deve ser {' ou '.join(transferencia.FORMATOS)}"}, status_code=400)
+    return transferencia.exportar(entidade_transferencia(nome), formato)
+
+@app.post("/admin/{nome}/import")
+async def importar_tabela(nome: str, arquivo: UploadFile = File(...), formato: str = Form(None), modo: str = Form("inserir"), simular: bool = Form(False), current_user: UsuarioSessao = Depends(usuario_atual)):
+    entidade = entidade_transferencia(nome)
+    # Sem formato explícito, vale a extensão do arquivo (.csv ou NDJSON)
+    formato = formato or ("csv" if (arquivo.filename or "").lower().endswith(".csv") else "ndjson")
+    if formato not in transferencia.FORMATOS or modo not in ("inserir", "atualizar"):
+        return JSONResponse({"erro": "formato deve ser ndjson ou csv e modo, inserir ou atualizar"}, status_code=400)
+    relatorio = await transferencia.importar(entidade, arquivo.file, formato, modo, simular)
+    return JSONResponse(relatorio, status_code=422 if "falha" in relatorio else 200, headers={"Cache-Control": "no-store"})
+
 # --- ROTAS ADMIN (WHATSAPP) ---
 @app.post("/admin/whatsapp/edit")
-async def edit_whatsapp(request: Request, numero: str = Form(...), mensagem: str = Form(...), db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+async def edit_whatsapp(request: Request, numero: str = Form(...), mensagem: str = Form(...), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
     
-    wp = db.query(models.WhatsappConfig).first()
+    wp = await db.scalar(select(models.WhatsappConfig).limit(1))
     if wp:
         wp.numero = numero
         wp.mensagem = mensagem
     else:
         wp = models.WhatsappConfig(numero=numero, mensagem=mensagem)
         db.add(wp)
-    db.commit()
+    await db.commit()
+    await cache.versoes.invalidar(db, cache.LAYOUT)
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 # --- ROTAS ADMIN (AÇÕES: PROJETOS, CONTATOS E USUÁRIOS) ---
 @app.post("/admin/projetos/add")
-async def add_projeto(request: Request, titulo: str = Form(...), descricao: str = Form(...), categoria: str = Form(...), link_projeto: str = Form(None), link_github: str = Form(None), db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+async def add_projeto(request: Request, titulo: str = Form(...), descricao: str = Form(...), categoria: str = Form(...), link_projeto: str = Form(None), link_github: str = Form(None), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
     novo_projeto = models.Projeto(titulo=titulo, descricao=descricao, categoria=categoria, link_projeto=link_projeto, link_github=link_github)
     db.add(novo_projeto)
-    db.commit()
+    await db.commit()
+    novas = await cache.versoes.invalidar(db, cache.PROJETOS)
+    busca_projetos.atualizar(novo_projeto, novas[cache.PROJETOS])
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.get("/admin/projetos/delete/{projeto_id}")
-async def delete_projeto(request: Request, projeto_id: int, db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    projeto = db.query(models.Projeto).filter(models.Projeto.id == projeto_id).first()
-    if projeto: db.delete(projeto); db.commit()
+async def delete_projeto(request: Request, projeto_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    projeto = await db.scalar(select(models.Projeto).where(models.Projeto.id == projeto_id))
+    if projeto:
+        await db.delete(projeto); await db.commit()
+        novas = await cache.versoes.invalidar(db, cache.PROJETOS)
+        busca_projetos.remover(projeto_id, novas[cache.PROJETOS])
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.get("/admin/projetos/edit/{projeto_id}")
-async def edit_projeto_page(request: Request, projeto_id: int, db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    projeto = db.query(models.Projeto).filter(models.Projeto.id == projeto_id).first()
+async def edit_projeto_page(request: Request, projeto_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    projeto = await db.scalar(select(models.Projeto).where(models.Projeto.id == projeto_id))
     if not projeto: return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
     return templates.TemplateResponse("admin_edit_projeto.html", {"request": request, "projeto": projeto, "version": APP_VERSION})
 
 @app.post("/admin/projetos/edit/{projeto_id}")
-async def edit_projeto_post(request: Request, projeto_id: int, titulo: str=Form(...), descricao: str=Form(...), categoria: str=Form(...), link_projeto: str=Form(None), link_github: str=Form(None), db: Session=Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    projeto = db.query(models.Projeto).filter(models.Projeto.id == projeto_id).first()
+async def edit_projeto_post(request: Request, projeto_id: int, titulo: str=Form(...), descricao: str=Form(...), categoria: str=Form(...), link_projeto: str=Form(None), link_github: str=Form(None), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession=Depends(get_db)):
+    projeto = await db.scalar(select(models.Projeto).where(models.Projeto.id == projeto_id))
     if projeto:
         projeto.titulo = titulo; projeto.descricao = descricao; projeto.categoria = categoria; projeto.link_projeto = link_projeto; projeto.link_github = link_github
-        db.commit()
+        await db.commit()
+        novas = await cache.versoes.invalidar(db, cache.PROJETOS)
+        busca_projetos.atualizar(projeto, novas[cache.PROJETOS])
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.post("/admin/contatos/add")
-async def add_contato(request: Request, nome: str = Form(...), url: str = Form(...), icone: str = Form(None), cor_icone: str = Form(None), cor_hover: str = Form(None), db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    if db.query(models.Contato).count() < 10:
+async def add_contato(request: Request, nome: str = Form(...), url: str = Form(...), icone: str = Form(None), cor_icone: str = Form(None), cor_hover: str = Form(None), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(func.count()).select_from(models.Contato)) < 10:
         # Adicione o cor_icone na linha abaixo
         novo_contato = models.Contato(nome=nome, url=url, icone=icone, cor_icone=cor_icone or "text-gray-400", cor_hover=cor_hover or "hover:bg-neon")
         db.add(novo_contato)
-        db.commit()
+        await db.commit()
+        await cache.versoes.invalidar(db, cache.LAYOUT)
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.get("/admin/contatos/delete/{contato_id}")
-async def delete_contato(request: Request, contato_id: int, db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    contato = db.query(models.Contato).filter(models.Contato.id == contato_id).first()
-    if contato: db.delete(contato); db.commit()
+async def delete_contato(request: Request, contato_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    contato = await db.scalar(select(models.Contato).where(models.Contato.id == contato_id))
+    if contato:
+        await db.delete(contato); await db.commit()
+        await cache.versoes.invalidar(db, cache.LAYOUT)
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.get("/admin/contatos/edit/{contato_id}")
-async def edit_contato_page(request: Request, contato_id: int, db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    contato = db.query(models.Contato).filter(models.Contato.id == contato_id).first()
+async def edit_contato_page(request: Request, contato_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    contato = await db.scalar(select(models.Contato).where(models.Contato.id == contato_id))
     if not contato: return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
     return templates.TemplateResponse("admin_edit_contato.html", {"request": request, "contato": contato, "version": APP_VERSION})
 
 @app.post("/admin/contatos/edit/{contato_id}")
-async def edit_contato_post(request: Request, contato_id: int, nome: str=Form(...), url: str=Form(...), icone: str=Form(None), cor_icone: str=Form(None), cor_hover: str=Form(None), db: Session=Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    contato = db.query(models.Contato).filter(models.Contato.id == contato_id).first()
+async def edit_contato_post(request: Request, contato_id: int, nome: str=Form(...), url: str=Form(...), icone: str=Form(None), cor_icone: str=Form(None), cor_hover: str=Form(None), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession=Depends(get_db)):
+    contato = await db.scalar(select(models.Contato).where(models.Contato.id == contato_id))
     if contato:
         contato.nome = nome; contato.url = url; contato.icone = icone; 
         contato.cor_icone = cor_icone or "text-gray-400" # Nova linha aqui
         contato.cor_hover = cor_hover or "hover:bg-neon"
-        db.commit()
+        await db.commit()
+        await cache.versoes.invalidar(db, cache.LAYOUT)
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.post("/admin/usuarios/add")
-async def add_usuario(request: Request, username: str = Form(...), password: str = Form(...), confirm_password: str = Form(...), db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+async def add_usuario(request: Request, username: str = Form(...), password: str = Form(...), confirm_password: str = Form(...), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
     if password != confirm_password: return RedirectResponse(url="/admin/dashboard?erro_user=senhas_diferentes", status_code=status.HTTP_302_FOUND)
     if not validar_senha_forte(password): return RedirectResponse(url="/admin/dashboard?erro_user=senha_fraca", status_code=status.HTTP_302_FOUND)
-    existe = db.query(models.Usuario).filter(models.Usuario.username == username).first()
+    existe = await db.scalar(select(models.Usuario).where(models.Usuario.username == username))
     if not existe:
-        novo_usuario = models.Usuario(username=username, password_hash=get_password_hash(password))
+        try:
+            senha_hash = await pool_bcrypt.executar(get_password_hash, password)
+        except PoolSaturado:
+            return RedirectResponse(url="/admin/dashboard?erro_user=servidor_ocupado", status_code=status.HTTP_302_FOUND)
+        novo_usuario = models.Usuario(username=username, password_hash=senha_hash)
         db.add(novo_usuario)
-        db.commit()
+        await db.commit()
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.get("/admin/usuarios/delete/{usuario_id}")
-async def delete_usuario(request: Request, usuario_id: int, db: Session = Depends(get_db)):
-    current_user = request.cookies.get("session_token")
-    if not current_user: return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
-    if usuario and usuario.username != 'admin' and usuario.username != current_user:
-        db.delete(usuario); db.commit()
+async def delete_usuario(request: Request, usuario_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    usuario = await db.get(models.Usuario, usuario_id)
+    if usuario and usuario.username != 'admin' and usuario.id != current_user.id:
+        await db.delete(usuario); await db.commit()
+        await sessoes.encerrar_usuario(usuario_id)
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
 @app.get("/admin/usuarios/edit/{usuario_id}")
-async def edit_usuario_page(request: Request, usuario_id: int, db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
+async def edit_usuario_page(request: Request, usuario_id: int, current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
+    usuario = await db.scalar(select(models.Usuario).where(models.Usuario.id == usuario_id))
     if not usuario or usuario.username == 'admin': return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
     return templates.TemplateResponse("admin_edit_usuario.html", {"request": request, "usuario": usuario, "version": APP_VERSION})
 
 @app.post("/admin/usuarios/edit/{usuario_id}")
-async def edit_usuario_post(request: Request, usuario_id: int, password: str = Form(...), confirm_password: str = Form(...), db: Session = Depends(get_db)):
-    if not request.cookies.get("session_token"): return RedirectResponse(url="/admin", status_code=status.HTTP_302_FOUND)
+async def edit_usuario_post(request: Request, usuario_id: int, password: str = Form(...), confirm_password: str = Form(...), current_user: UsuarioSessao = Depends(usuario_atual), db: AsyncSession = Depends(get_db)):
     if password != confirm_password: return RedirectResponse(url=f"/admin/usuarios/edit/{usuario_id}?erro=senhas_diferentes", status_code=status.HTTP_302_FOUND)
     if not validar_senha_forte(password): return RedirectResponse(url=f"/admin/usuarios/edit/{usuario_id}?erro=senha_fraca", status_code=status.HTTP_302_FOUND)
-    usuario = db.query(models.Usuario).filter(models.Usuario.id == usuario_id).first()
+    usuario = await db.scalar(select(models.Usuario).where(models.Usuario.id == usuario_id))
     if usuario and usuario.username != 'admin':
-        usuario.password_hash = get_password_hash(password)
-        db.commit()
+        try:
+            usuario.password_hash = await pool_bcrypt.executar(get_password_hash, password)
+        except PoolSaturado:
+            return RedirectResponse(url=f"/admin/usuarios/edit/{usuario_id}?erro=servidor_ocupado", status_code=status.HTTP_302_FOUND)
+        await db.commit()
     return RedirectResponse(url="/admin/dashboard", status_code=status.HTTP_302_FOUND)
 
+# --- MÉTRICAS (FORMATO PROMETHEUS) ---
+# O scraper precisa enviar "Authorization: Bearer <METRICS_TOKEN>"; sem METRICS_TOKEN o /metrics nem existe (404)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+bcrypt_executadas = metrics.registro.adicionar(metrics.Contador("bcrypt_pool_executadas_total", "Hashes/verificações bcrypt concluídos."))
+bcrypt_rejeitadas = metrics.registro.adicionar(metrics.Contador("bcrypt_pool_rejeitadas_total", "Pedidos recusados com o pool do bcrypt saturado."))
+bcrypt_segundos = metrics.registro.adicionar(metrics.Contador("bcrypt_pool_segundos_total", "Tempo acumulado no pool do bcrypt.", ("fase",)))
+bcrypt_ocupacao = metrics.registro.adicionar(metrics.Medidor("bcrypt_pool_ocupacao", "Tarefas no pool do bcrypt (executando + na fila)."))
+
+@metrics.registro.coletor
+def coletar_bcrypt():
+    dados = pool_bcrypt.metricas()
+    bcrypt_executadas.definir(dados["executadas"])
+    bcrypt_rejeitadas.definir(dados["rejeitadas"])
+    bcrypt_segundos.definir(dados["tempo_total_s"], "execucao")
+    bcrypt_segundos.definir(dados["espera_total_s"], "fila")
+    bcrypt_ocupacao.definir(dados["ocupacao"])
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas(request: Request):
+    # 404 simples: o /metrics responde antes do banco estar pronto, e a página 404 do site lê o layout do banco
+    if not METRICS_TOKEN:
+        return PlainTextResponse("Not Found", status_code=status.HTTP_404_NOT_FOUND)
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode("utf-8"), f"Bearer {METRICS_TOKEN}".encode("utf-8")):
+        return PlainTextResponse("Não autorizado", status_code=status.HTTP_401_UNAUTHORIZED)
+    return PlainTextResponse(metrics.registro.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- ROTAS SEO ---
 @app.get("/robots.txt")
 async def robots(request: Request):
@@ -472,27 +802,30 @@ async def robots(request: Request):
 
 @app.get("/sitemap.xml")
 async def sitemap(request: Request):
-    return templates.TemplateResponse("sitemap.xml", {"request": request}, media_type="application/xml")
+    return await sitemap_xml.responder(request)
+
+# Partes do índice, usadas só quando o sitemap passa de SITEMAP_MAX_URLS
+@app.get("/sitemap-{parte:int}.xml")
+async def sitemap_parte(request: Request, parte: int):
+    # A parte 0 é o próprio /sitemap.xml (índice): /sitemap-0.xml não existe
+    if parte < 1:
+        raise StarletteHTTPException(status_code=404)
+    return await sitemap_xml.responder(request, parte)
+
+# --- CLIQUES NO WHATSAPP ---
+# O botão flutuante passa por aqui (com a página de origem) antes de ir para o api.whatsapp.com
+@app.get("/whatsapp", include_in_schema=False)
+async def whatsapp(request: Request, origem: str = "/"):
+    whatsapp_url = (await layout_cache.get())["whatsapp_url"]
+    if whatsapp_url and not estatisticas.eh_robo(request.headers.get("user-agent", "")):
+        acessos.registrar(origem if origem in paginas_publicas(app) else estatisticas.OUTRA, estatisticas.WHATSAPP)
+    return RedirectResponse(whatsapp_url or "/", status_code=status.HTTP_302_FOUND,
+                            headers={"Cache-Control": "no-store", "X-Robots-Tag": "noindex"})
 
 # --- TRATAMENTO DE ERRO 404 ---
+# HTML pré-renderizado por versão do layout (sem sessão de banco nem template por URL inexistente)
+pagina_404 = Pagina404(templates, contexto_layout, sessao_ativa=lambda token: sessoes.obter(token, SESSAO))
+
 @app.exception_handler(404)
 async def custom_404_handler(request: Request, exc: StarletteHTTPException):
-    # Instancia a sessão do banco de dados manualmente
-    db = SessionLocal()
-    try:
-        contatos = db.query(models.Contato).limit(10).all()
-        wp_url = get_whatsapp_url(db)
-        
-        return templates.TemplateResponse(
-            "404.html", 
-            {
-                "request": request, 
-                "contatos": contatos, 
-                "version": APP_VERSION, 
-                "whatsapp_url": wp_url
-            }, 
-            status_code=404
-        )
-    finally:
-        # Garante que a conexão será devolvida ao pool, mesmo se der erro
-        db.close()
\ No newline at end of file
+    return await pagina_404.responder(request)
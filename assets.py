@@ -0,0 +1,93 @@
+import os
+import json
+import logging
+import mimetypes
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.environ.get("STATIC_DIR", "static")
+# Cache dos arquivos sem hash no nome (ex: links antigos para /static/social-card.jpg)
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", "3600"))
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
+# Extensão da variante gerada pelo build_assets.py para cada Content-Encoding, em ordem de preferência
+VARIANTES = (("br", ".br"), ("gzip", ".gz"))
+
+
+def codificacoes_aceitas(accept_encoding: str) -> set:
+    aceitas = set()
+    for item in accept_encoding.lower().split(","):
+        nome, _, parametros = item.partition(";")
+        parametros = parametros.replace(" ", "")
+        try:
+            peso = float(parametros[2:]) if parametros.startswith("q=") else 1.0
+        except ValueError:
+            peso = 0.0
+        # q=0 significa "não aceito"
+        if nome.strip() and peso > 0:
+            aceitas.add(nome.strip())
+    return aceitas
+
+
+# --- MANIFESTO DO BUILD (NOME ORIGINAL -> NOME COM HASH) ---
+class Manifesto:
+    def __init__(self, diretorio: str = STATIC_DIR):
+        self.diretorio = diretorio
+        self.arquivos = {}
+        caminho = os.path.join(diretorio, "dist", "manifest.json")
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                self.arquivos = json.load(f)
+            logger.info(f"[ASSETS] Manifesto carregado: {len(self.arquivos)} arquivos com hash.")
+        except FileNotFoundError:
+            # Ambiente de desenvolvimento sem build: os nomes originais são servidos direto
+            logger.info("[ASSETS] Sem manifesto (rode build_assets.py): servindo arquivos sem hash.")
+
+    def __contains__(self, nome: str) -> bool:
+        return nome in self.arquivos
+
+    def static_url(self, nome: str) -> str:
+        return "/static/" + self.arquivos.get(nome, nome)
+
+
+# --- ARQUIVOS ESTÁTICOS COM VARIANTES PRÉ-COMPRIMIDAS ---
+# Arquivos com hash nunca mudam de conteúdo: recebem cache imutável e, se o cliente aceitar,
+# a variante .br/.gz gerada no build (sem comprimir nada por requisição)
+class StaticFilesPrecomprimidos(StaticFiles):
+    def __init__(self, *args, manifesto: Manifesto, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.imutaveis = {}  # path com hash -> {content-encoding: (caminho, stat)}
+        for path in manifesto.arquivos.values():
+            variantes = {}
+            for codificacao, extensao in VARIANTES:
+                caminho, stat_result = self.lookup_path(path + extensao)
+                if stat_result:
+                    variantes[codificacao] = (caminho, stat_result)
+            self.imutaveis[path] = variantes
+
+    async def get_response(self, path: str, scope):
+        variantes = self.imutaveis.get(path)
+        if variantes is None:
+            resposta = await super().get_response(path, scope)
+            resposta.headers.setdefault("cache-control", f"public, max-age={STATIC_MAX_AGE}")
+            return resposta
+
+        aceitas = codificacoes_aceitas(Headers(scope=scope).get("accept-encoding", ""))
+        for codificacao, _ in VARIANTES:
+            if codificacao in variantes and codificacao in aceitas and scope["method"] in ("GET", "HEAD"):
+                caminho, stat_result = variantes[codificacao]
+                resposta = self.file_response(caminho, stat_result, scope)
+                resposta.headers["content-encoding"] = codificacao
+                if isinstance(resposta, FileResponse):
+                    resposta.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+                    resposta.headers["content-type"] = resposta.media_type
+                break
+        else:
+            resposta = await super().get_response(path, scope)
+        resposta.headers["cache-control"] = CACHE_IMUTAVEL
+        if variantes:
+            resposta.headers["vary"] = "Accept-Encoding"
+        return resposta
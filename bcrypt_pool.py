@@ -0,0 +1,92 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Threads dedicadas ao bcrypt (o bcrypt libera o GIL enquanto calcula o hash)
+BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", "2"))
+# Quantas operações podem aguardar na fila além das que já estão executando
+BCRYPT_MAX_QUEUE = int(os.environ.get("BCRYPT_MAX_QUEUE", "8"))
+
+# Limites (em segundos) dos buckets do histograma de latência
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class PoolSaturado(Exception):
+    pass
+
+
+# --- POOL LIMITADO PARA HASH/VERIFICAÇÃO DE SENHAS ---
+# Tira o bcrypt do event loop e recusa na hora quando execução + fila já estão cheias,
+# em vez de deixar uma rajada de logins acumular trabalho indefinidamente.
+class PoolBcrypt:
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_fila: int = BCRYPT_MAX_QUEUE):
+        self.workers = workers
+        self.limite = workers + max_fila
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Só é alterado no event loop, então dispensa lock
+        self._ocupacao = 0
+        self._lock_metricas = threading.Lock()
+        self.pico_ocupacao = 0
+        self.executadas = 0
+        self.rejeitadas = 0
+        self.tempo_total = 0.0
+        self.espera_total = 0.0
+        self.buckets = [0] * (len(BUCKETS_LATENCIA) + 1)
+
+    @property
+    def ocupacao(self) -> int:
+        return self._ocupacao
+
+    def _medir(self, funcao, args, enfileirado_em):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self._lock_metricas:
+                self._registrar(duracao, inicio - enfileirado_em)
+
+    def _registrar(self, duracao, espera):
+        self.espera_total += espera
+        self.tempo_total += duracao
+        self.executadas += 1
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if duracao <= limite:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    async def executar(self, funcao, *args):
+        if self._ocupacao >= self.limite:
+            self.rejeitadas += 1
+            logger.warning(f"[BCRYPT] Pool saturado ({self._ocupacao}/{self.limite}). Requisição recusada.")
+            raise PoolSaturado()
+        self._ocupacao += 1
+        self.pico_ocupacao = max(self.pico_ocupacao, self._ocupacao)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._medir, funcao, args, time.perf_counter())
+        finally:
+            self._ocupacao -= 1
+
+    def metricas(self) -> dict:
+        return {
+            "workers": self.workers,
+            "limite": self.limite,
+            "ocupacao": self._ocupacao,
+            "pico_ocupacao": self.pico_ocupacao,
+            "executadas": self.executadas,
+            "rejeitadas": self.rejeitadas,
+            "tempo_total_s": self.tempo_total,
+            "espera_total_s": self.espera_total,
+            "buckets": dict(zip([*map(str, BUCKETS_LATENCIA), "+Inf"], self.buckets)),
+        }
+
+    def encerrar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
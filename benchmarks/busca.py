@@ -0,0 +1,134 @@
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tracemalloc
+from pathlib import Path
+
+# Roda a partir de qualquer diretório: o índice não depende do app nem do banco
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from busca import construir_indice  # noqa: E402
+
+VOCABULARIO = """
+servidor servidores linux debian ubuntu firewall mikrotik rede redes roteador vpn wireguard docker container
+containers kubernetes cluster proxmox virtualização máquina virtual backup armazenamento samba nfs
+monitoramento zabbix grafana prometheus automação ansible script sistema web api fastapi python banco dados
+mysql postgresql migração segurança auditoria certificado ssl proxy nginx apache balanceamento alta
+disponibilidade desempenho otimização suporte manutenção corporativo empresa escritório desktop estação
+configuração implantação integração desenvolvimento aplicação painel relatório usuários acesso remoto
+""".split()
+CATEGORIAS = ["Infraestrutura", "Redes", "Desenvolvimento", "Segurança", "Virtualização", "Suporte"]
+CONSULTAS = ["servidor linux", "firewall", "configuração de redes", "docker kubernetes", "backup", "automação ansible",
+             "segurança vpn corporativa", "banco de dados mysql", "alta disponibilidade", "termo inexistente"]
+
+
+def percentil(valores_ordenados, p):
+    indice = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados) + 0.5) - 1))
+    return valores_ordenados[indice]
+
+
+# Vocabulário com distribuição de Zipf (poucas palavras muito comuns, cauda longa de raras), como em
+# texto real: as palavras técnicas acima são as mais frequentes, seguidas de milhares de termos sintéticos
+def gerar_projetos(quantidade, semente=42):
+    aleatorio = random.Random(semente)
+    palavras = VOCABULARIO + [f"termo{i}" for i in range(max(5000, quantidade // 2))]
+    pesos = [1 / (posicao + 1) for posicao in range(len(palavras))]
+
+    def frase(tamanho):
+        return " ".join(aleatorio.choices(palavras, weights=pesos, k=tamanho)).capitalize()
+
+    return [(i, frase(4), frase(aleatorio.randint(12, 24)) + ".", aleatorio.choice(CATEGORIAS))
+            for i in range(1, quantidade + 1)]
+
+
+def medir_consultas(buscar, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        for consulta in CONSULTAS:
+            inicio = time.perf_counter()
+            buscar(consulta)
+            tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return {"p50_ms": round(percentil(tempos, 50) * 1000, 3), "p95_ms": round(percentil(tempos, 95) * 1000, 3),
+            "p99_ms": round(percentil(tempos, 99) * 1000, 3), "consultas": len(tempos)}
+
+
+# Referência: o que o LIKE faria para entregar o mesmo que /busca (total + 20 primeiros), varrendo a tabela
+# inteira por consulta e ainda sem ranking, radicais nem acentos
+def medir_like(projetos, repeticoes):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE projetos (id INTEGER PRIMARY KEY, titulo TEXT, descricao TEXT, categoria TEXT)")
+    conn.executemany("INSERT INTO projetos VALUES (?, ?, ?, ?)", projetos)
+
+    def buscar(consulta):
+        filtros = " OR ".join(["titulo LIKE ? OR descricao LIKE ?"] * len(consulta.split()))
+        parametros = [f"%{t}%" for t in consulta.split() for _ in range(2)]
+        conn.execute(f"SELECT COUNT(*) FROM projetos WHERE {filtros}", parametros).fetchone()
+        conn.execute(f"SELECT id FROM projetos WHERE {filtros} LIMIT 20", parametros).fetchall()
+
+    return medir_consultas(buscar, repeticoes)
+
+
+def executar(quantidade, repeticoes, comparar_like):
+    projetos = gerar_projetos(quantidade)
+    inicio = time.perf_counter()
+    indice = construir_indice(projetos)
+    construcao = time.perf_counter() - inicio
+    # Memória medida numa segunda construção: o tracemalloc distorceria o tempo da primeira
+    tracemalloc.start()
+    copia = construir_indice(projetos)
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copia
+
+    resultado = {
+        "projetos": quantidade,
+        "construcao_s": round(construcao, 3),
+        "memoria_indice_mb": round(memoria / 1024 / 1024, 2),
+        "indice": medir_consultas(lambda consulta: indice.buscar(consulta, 20), repeticoes),
+    }
+
+    # Atualização incremental (o que as rotas admin fazem a cada edição)
+    inicio = time.perf_counter()
+    for doc_id, titulo, descricao, categoria in projetos[:200]:
+        indice.adicionar(doc_id, titulo=titulo + " editado", descricao=descricao, categoria=categoria)
+    resultado["atualizacao_ms"] = round((time.perf_counter() - inicio) / 200 * 1000, 3)
+
+    if comparar_like:
+        resultado["like"] = medir_like(projetos, repeticoes)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do índice de busca (construção, memória e latência).")
+    parser.add_argument("--projetos", type=lambda v: [int(n) for n in v.split(",")], default=[1000, 10000, 50000],
+                        help="tamanhos do catálogo separados por vírgula (padrão: 1000,10000,50000)")
+    parser.add_argument("--repeticoes", type=int, default=20, help="vezes que o conjunto de consultas é repetido")
+    parser.add_argument("--sem-like", action="store_true", help="não mede a varredura com LIKE no SQLite")
+    parser.add_argument("--saida", help="arquivo JSON de saída (opcional)")
+    args = parser.parse_args()
+
+    resultados = []
+    for quantidade in args.projetos:
+        resultado = executar(quantidade, args.repeticoes, not args.sem_like)
+        resultados.append(resultado)
+        linha = (f">_ {quantidade:>7} projetos: índice em {resultado['construcao_s']}s, {resultado['memoria_indice_mb']} MB | "
+                 f"busca p50 {resultado['indice']['p50_ms']} ms, p95 {resultado['indice']['p95_ms']} ms, "
+                 f"p99 {resultado['indice']['p99_ms']} ms | atualização {resultado['atualizacao_ms']} ms")
+        if "like" in resultado:
+            linha += f" | LIKE p50 {resultado['like']['p50_ms']} ms, p95 {resultado['like']['p95_ms']} ms"
+        print(linha)
+
+    if args.saida:
+        saida = Path(args.saida)
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n>_ [SUCESSO] Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
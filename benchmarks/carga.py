@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Roda a partir da raiz do repositório (templates/ e static/ são caminhos relativos no app)
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+SERVICOS = ["linux", "firewall", "desktop", "docker", "virtualizacao", "desenvolvimento"]
+
+# Usuário criado pela semeadura para exercitar o login + 2FA
+BENCH_USER = "bench"
+BENCH_PASSWORD = "Bench@123456"
+BENCH_TOTP = "JBSWY3DPEHPK3PXPJBSWY3DPEHPK3PXP"
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    indice = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados) + 0.5) - 1))
+    return valores_ordenados[indice]
+
+
+# --- SEMEADURA DO BANCO ---
+def semear(projetos, contatos, usuarios):
+    import bcrypt
+    import models
+    from database import SessionLocal, engine
+    from sqlalchemy import insert, delete
+
+    # Um único hash reaproveitado: a semeadura não deve levar minutos de bcrypt
+    senha_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    # O app só cria as tabelas no lifespan; a semeadura roda antes dele
+    models.Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.execute(delete(models.Projeto))
+        db.execute(delete(models.Contato))
+        db.execute(delete(models.Usuario).where(models.Usuario.username != "admin"))
+        if projetos:
+            db.execute(insert(models.Projeto), [
+                {"titulo": f"Projeto {i}", "descricao": f"Descrição do projeto de benchmark número {i}. " * 3,
+                 "categoria": ("Artigo", "Serviço", "Infraestrutura")[i % 3],
+                 "link_projeto": f"https://exemplo.com/{i}", "link_github": None}
+                for i in range(projetos)
+            ])
+        if contatos:
+            db.execute(insert(models.Contato), [
+                {"nome": f"Contato {i}", "url": f"mailto:contato{i}@exemplo.com", "icone": "fa-solid fa-envelope",
+                 "cor_icone": "text-gray-400", "cor_hover": "hover:text-neon"}
+                for i in range(contatos)
+            ])
+        db.execute(insert(models.Usuario), [
+            {"username": BENCH_USER, "password_hash": senha_hash, "totp_secret": BENCH_TOTP, "is_2fa_enabled": True}
+        ] + [
+            {"username": f"usuario{i}", "password_hash": senha_hash, "totp_secret": None, "is_2fa_enabled": False}
+            for i in range(max(0, usuarios - 1))
+        ])
+        db.commit()
+    print(f">_ Banco semeado: {projetos} projetos, {contatos} contatos, {usuarios} usuários.")
+
+
+# --- CONTADOR DE QUERIES (EVENTO DO SQLALCHEMY NA ENGINE ASSÍNCRONA) ---
+class ContadorQueries:
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.total = 0
+        event.listen(engine, "before_cursor_execute", self._contar)
+
+    def _contar(self, *args):
+        self.total += 1
+
+
+# --- CENÁRIOS ---
+# Cada cenário recebe (cliente, número da iteração) e devolve True se a resposta foi a esperada
+async def cenario_home(cliente, i):
+    return (await cliente.get("/")).status_code == 200
+
+async def cenario_servicos(cliente, i):
+    return (await cliente.get(f"/servicos/{SERVICOS[i % len(SERVICOS)]}")).status_code == 200
+
+async def cenario_sitemap(cliente, i):
+    return (await cliente.get("/sitemap.xml")).status_code == 200
+
+async def cenario_404(cliente, i):
+    return (await cliente.get(f"/pagina-inexistente-{i}")).status_code == 404
+
+async def cenario_login_2fa(cliente, i):
+    import httpx
+    import pyotp
+    from app import app
+    # Cliente próprio por fluxo: cada login tem seus cookies (pre_auth_user -> session_token)
+    fluxo = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=cliente.base_url)
+    r = await fluxo.post("/admin/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+    if r.status_code != 302 or r.headers.get("location") != "/admin/2fa-verify":
+        return False
+    r = await fluxo.post("/admin/2fa-verify", data={"code": pyotp.TOTP(BENCH_TOTP).now()})
+    if r.status_code != 302 or "session_token" not in fluxo.cookies:
+        return False
+    return (await fluxo.get("/admin/dashboard")).status_code == 200
+
+CENARIOS = {
+    "home": cenario_home,
+    "servicos": cenario_servicos,
+    "sitemap": cenario_sitemap,
+    "404": cenario_404,
+    "login_2fa": cenario_login_2fa,
+}
+
+
+async def medir(cliente, contador, cenario, concorrencia, requisicoes):
+    funcao = CENARIOS[cenario]
+    latencias = []
+    erros = 0
+    proxima = 0
+
+    async def trabalhador():
+        nonlocal erros, proxima
+        while proxima < requisicoes:
+            i = proxima
+            proxima += 1
+            inicio = time.perf_counter()
+            try:
+                ok = await funcao(cliente, i)
+            except Exception:
+                ok = False
+            latencias.append(time.perf_counter() - inicio)
+            if not ok:
+                erros += 1
+
+    # Aquecimento: popula caches (páginas, layout, sitemap) antes da medição
+    for i in range(min(5, requisicoes)):
+        await funcao(cliente, i)
+
+    queries_antes = contador.total
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "requisicoes": requisicoes,
+        "erros": erros,
+        "duracao_s": round(duracao, 4),
+        "rps": round(requisicoes / duracao, 2) if duracao else None,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "queries_por_requisicao": round((contador.total - queries_antes) / requisicoes, 3),
+    }
+
+
+async def executar(args):
+    import httpx
+    from app import app, APP_VERSION
+    from database import async_engine
+
+    contador = ContadorQueries(async_engine.sync_engine)
+    resultados = {}
+    # O ASGITransport não dispara o lifespan: startup/shutdown rodam pelo contexto do router
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench.local") as cliente:
+            for cenario in args.cenarios:
+                resultados[cenario] = {}
+                for concorrencia in args.concorrencia:
+                    requisicoes = args.requisicoes_login if cenario == "login_2fa" else args.requisicoes
+                    medida = await medir(cliente, contador, cenario, concorrencia, requisicoes)
+                    resultados[cenario][str(concorrencia)] = medida
+                    print(f">_ {cenario:<10} c={concorrencia:<4} {medida['rps']:>9} req/s  "
+                          f"p50 {medida['p50_ms']:>8} ms  p95 {medida['p95_ms']:>8} ms  p99 {medida['p99_ms']:>8} ms  "
+                          f"{medida['queries_por_requisicao']} queries/req  {medida['erros']} erros")
+
+    return {
+        "app_version": APP_VERSION,
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "banco": async_engine.url.get_backend_name(),
+        "config": {"projetos": args.projetos, "contatos": args.contatos, "usuarios": args.usuarios,
+                   "requisicoes": args.requisicoes, "requisicoes_login": args.requisicoes_login,
+                   "concorrencia": args.concorrencia},
+        "resultados": resultados,
+    }
+
+
+# --- COMPARAÇÃO ENTRE DUAS EXECUÇÕES (EX: DUAS IMAGENS COM APP_VERSION DIFERENTES) ---
+def comparar(base_path, novo_path, tolerancia):
+    base = json.loads(Path(base_path).read_text(encoding="utf-8"))
+    novo = json.loads(Path(novo_path).read_text(encoding="utf-8"))
+    print(f">_ Comparando {base['app_version']} -> {novo['app_version']} (tolerância {tolerancia:.0f}%)\n")
+    regressoes = []
+    for cenario, niveis in novo["resultados"].items():
+        for concorrencia, medida in niveis.items():
+            anterior = base["resultados"].get(cenario, {}).get(concorrencia)
+            if not anterior:
+                continue
+            variacao_p95 = (medida["p95_ms"] / anterior["p95_ms"] - 1) * 100 if anterior["p95_ms"] else 0
+            variacao_rps = (medida["rps"] / anterior["rps"] - 1) * 100 if anterior["rps"] else 0
+            marca = ""
+            if variacao_p95 > tolerancia or -variacao_rps > tolerancia or medida["queries_por_requisicao"] > anterior["queries_por_requisicao"]:
+                marca = "  <-- REGRESSÃO"
+                regressoes.append(f"{cenario} c={concorrencia}")
+            print(f"{cenario:<10} c={concorrencia:<4} p95 {anterior['p95_ms']:>8} -> {medida['p95_ms']:>8} ms ({variacao_p95:+.1f}%)  "
+                  f"rps {anterior['rps']:>9} -> {medida['rps']:>9} ({variacao_rps:+.1f}%)  "
+                  f"queries {anterior['queries_por_requisicao']} -> {medida['queries_por_requisicao']}{marca}")
+    if regressoes:
+        print(f"\n>_ [ERRO] {len(regressoes)} regressões: {', '.join(regressoes)}")
+        return 1
+    print("\n>_ [SUCESSO] Nenhuma regressão acima da tolerância.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga e latência das rotas públicas e do admin.")
+    parser.add_argument("--projetos", type=int, default=200)
+    parser.add_argument("--contatos", type=int, default=5)
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--concorrencia", type=lambda v: [int(n) for n in v.split(",")], default=[1, 10, 50],
+                        help="níveis de concorrência separados por vírgula (padrão: 1,10,50)")
+    parser.add_argument("--requisicoes", type=int, default=1000, help="requisições por cenário e nível")
+    parser.add_argument("--requisicoes-login", type=int, default=50, help="fluxos de login + 2FA por nível (bcrypt é caro)")
+    parser.add_argument("--cenarios", type=lambda v: v.split(","), default=list(CENARIOS),
+                        help=f"cenários separados por vírgula (padrão: {','.join(CENARIOS)})")
+    parser.add_argument("--semear", action="store_true", help="semeia o banco de DB_URL (sempre feito no SQLite temporário)")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/<APP_VERSION>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"), help="compara dois JSONs e sai com erro se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=10.0, help="variação percentual aceita na comparação (padrão: 10)")
+    args = parser.parse_args()
+
+    if args.comparar:
+        sys.exit(comparar(*args.comparar, args.tolerancia))
+
+    desconhecidos = set(args.cenarios) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    # Sem DB_URL, usa um SQLite descartável; com DB_URL (ex: MySQL do container) só semeia se pedido
+    semear_banco = args.semear
+    if not os.environ.get("DB_URL"):
+        os.environ["DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+        semear_banco = True
+    # O fluxo de login repete o mesmo usuário e IP: o limitador de tentativas bloquearia a medição
+    os.environ.setdefault("RATE_LIMIT_IP", "1000000000")
+    os.environ.setdefault("RATE_LIMIT_USUARIO", "1000000000")
+    import app  # noqa: F401
+    # O app liga o log INFO na importação; aqui só interessam avisos e erros
+    logging.getLogger().setLevel(logging.WARNING)
+    if semear_banco:
+        semear(args.projetos, args.contatos, args.usuarios)
+
+    relatorio = asyncio.run(executar(args))
+    saida = Path(args.saida) if args.saida else RESULTADOS_DIR / f"{relatorio['app_version']}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n>_ [SUCESSO] Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+# carga.py acerta o sys.path/diretório e fornece a semeadura do banco
+from carga import semear, RESULTADOS_DIR
+
+ROTAS = ["/", "/servicos/linux", "/sitemap.xml", "/projetos", "/projetos?formato=html", "/busca?q=projeto",
+         "/admin/dashboard", "/admin/fragmentos/projetos"]
+NIVEIS = [("gzip", 1), ("gzip", 6), ("gzip", 9), ("br", 1), ("br", 4), ("br", 5), ("br", 9), ("br", 11)]
+
+
+# Corpos sem compressão de cada rota, exatamente como o app os produz
+async def coletar_corpos():
+    import httpx
+    from app import app
+
+    corpos = {}
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench.local",
+                                     headers={"Accept-Encoding": "identity"}) as cliente:
+            # O admin é isento de 2FA: basta o login para ver o painel
+            await cliente.post("/admin/login", data={"username": "admin", "password": os.environ.get("ADMIN_PASSWORD", "admin")})
+            for rota in ROTAS:
+                resposta = await cliente.get(rota)
+                if resposta.status_code != 200:
+                    print(f">_ [AVISO] {rota} respondeu {resposta.status_code}: ignorada.")
+                    continue
+                corpos[rota] = (resposta.content, "etag" in resposta.headers)
+    return corpos
+
+
+def medir(corpo, codificacao, nivel, repeticoes):
+    from compressao import comprimir
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        comprimido = comprimir(corpo, codificacao, nivel)
+        tempos.append(time.perf_counter() - inicio)
+    return len(comprimido), statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo de CPU x bytes economizados da compressão, por rota e nível.")
+    parser.add_argument("--projetos", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=20, help="compressões por rota e nível (vale a mediana)")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/compressao-<APP_VERSION>.json)")
+    args = parser.parse_args()
+
+    if not os.environ.get("DB_URL"):
+        os.environ["DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    os.environ.setdefault("RATE_LIMIT_IP", "1000000000")
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+    semear(args.projetos, 5, 2)
+    corpos = asyncio.run(coletar_corpos())
+
+    resultados = {}
+    for rota, (corpo, tem_etag) in corpos.items():
+        # Com ETag, a variante é comprimida uma vez por versão da página (níveis *_CACHE); sem, a cada requisição
+        print(f"\n>_ {rota}  ({len(corpo)} bytes, {'variante em cache por ETag' if tem_etag else 'comprimida a cada requisição'})")
+        resultados[rota] = {"bytes": len(corpo), "etag": tem_etag, "niveis": {}}
+        for codificacao, nivel in NIVEIS:
+            tamanho, tempo = medir(corpo, codificacao, nivel, args.repeticoes)
+            economia = len(corpo) - tamanho
+            resultados[rota]["niveis"][f"{codificacao}-{nivel}"] = {
+                "bytes": tamanho, "economia_pct": round(economia / len(corpo) * 100, 1), "tempo_ms": round(tempo * 1000, 3),
+                "us_por_kb_economizado": round(tempo * 1e6 / (economia / 1024), 2) if economia > 0 else None,
+            }
+            medida = resultados[rota]["niveis"][f"{codificacao}-{nivel}"]
+            print(f"    {codificacao:<4} {nivel:>2}: {tamanho:>7} bytes (-{medida['economia_pct']:>5}%)  "
+                  f"{medida['tempo_ms']:>8} ms  {medida['us_por_kb_economizado']} µs/KB economizado")
+
+    saida = Path(args.saida) if args.saida else RESULTADOS_DIR / f"compressao-{app.APP_VERSION}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n>_ [SUCESSO] Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
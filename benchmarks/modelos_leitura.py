@@ -0,0 +1,122 @@
+import os
+import gc
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+# carga.py acerta o sys.path/diretório e fornece a semeadura do banco
+from carga import semear, percentil, RESULTADOS_DIR
+
+
+# Os dois caminhos de carga da grade de projetos: entidades do ORM (como as rotas públicas faziam) x select
+# só das colunas materializado em registros de leitura (read_models)
+def caminhos():
+    import models
+    import read_models
+    from sqlalchemy import select
+
+    async def orm(db):
+        return (await db.scalars(select(models.Projeto).order_by(models.Projeto.id))).all()
+
+    async def leitura(db):
+        return await read_models.listar(db, read_models.ProjetoLeitura,
+                                        read_models.consulta(read_models.ProjetoLeitura).order_by(models.Projeto.id))
+
+    return {"orm": orm, "leitura": leitura}
+
+
+# Uma "requisição": sessão nova (como cache.ler), carga e, opcionalmente, o render dos cards
+async def requisicao(carregar, template=None):
+    from database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        itens = await carregar(db)
+    if template is not None:
+        template.render({"projetos": itens})
+    return itens
+
+
+async def medir_tempo(carregar, repeticoes, template=None):
+    await requisicao(carregar, template)  # Aquecimento (compilação da query, cache de statements)
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await requisicao(carregar, template)
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return {"p50_ms": round(percentil(tempos, 50) * 1000, 3), "p95_ms": round(percentil(tempos, 95) * 1000, 3)}
+
+
+# Blocos e bytes que continuam vivos enquanto o resultado está guardado (o que um cache manteria em memória)
+# e o pico de memória durante a carga. Medido à parte: o tracemalloc distorceria os tempos.
+async def medir_memoria(carregar):
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    base = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    itens = await requisicao(carregar)
+    gc.collect()
+    atual, pico = tracemalloc.get_traced_memory()
+    depois = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diferencas = depois.compare_to(antes, "filename")
+    resultado = {
+        "blocos_retidos": sum(d.count_diff for d in diferencas),
+        "memoria_retida_kb": round((atual - base) / 1024, 1),
+        "pico_kb": round((pico - base) / 1024, 1),
+        "bytes_por_projeto": round((atual - base) / max(1, len(itens))),
+    }
+    del itens
+    return resultado
+
+
+async def executar(quantidade, repeticoes):
+    from app import templates
+    template = templates.get_template("projetos_cards.html")
+    resultado = {"projetos": quantidade}
+    for nome, carregar in caminhos().items():
+        resultado[nome] = {
+            "carga": await medir_tempo(carregar, repeticoes),
+            "requisicao": await medir_tempo(carregar, repeticoes, template),
+            **await medir_memoria(carregar),
+        }
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entidades do ORM x registros de leitura (tempo, alocações e memória).")
+    parser.add_argument("--projetos", type=lambda v: [int(n) for n in v.split(",")], default=[10, 1000, 10000],
+                        help="tamanhos do catálogo separados por vírgula (padrão: 10,1000,10000)")
+    parser.add_argument("--repeticoes", type=int, default=20, help="requisições medidas por caminho e tamanho")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/modelos_leitura-<APP_VERSION>.json)")
+    args = parser.parse_args()
+
+    if not os.environ.get("DB_URL"):
+        os.environ["DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    resultados = []
+    for quantidade in args.projetos:
+        semear(quantidade, 0, 1)
+        resultado = asyncio.run(executar(quantidade, args.repeticoes))
+        resultados.append(resultado)
+        for nome in ("orm", "leitura"):
+            r = resultado[nome]
+            print(f"   {nome:<8} carga p50 {r['carga']['p50_ms']} ms, p95 {r['carga']['p95_ms']} ms | "
+                  f"carga + render p50 {r['requisicao']['p50_ms']} ms | {r['blocos_retidos']} blocos, "
+                  f"{r['memoria_retida_kb']} KB retidos ({r['bytes_por_projeto']} B/projeto), pico {r['pico_kb']} KB")
+
+    saida = Path(args.saida) if args.saida else RESULTADOS_DIR / f"modelos_leitura-{app.APP_VERSION}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n>_ [SUCESSO] Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
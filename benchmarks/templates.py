@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+# carga.py acerta o sys.path/diretório e fornece a semeadura do banco
+from carga import semear, RESULTADOS_DIR, SERVICOS
+
+PAGINAS = ["/"] + [f"/servicos/{servico}" for servico in SERVICOS] + ["/admin/dashboard"]
+
+
+# Carga de todos os templates num Environment novo: compilando do zero x lendo o bytecode pré-compilado
+def medir_carga(repeticoes):
+    from templating import criar_templates, precompilar
+    bytecode_dir = tempfile.mkdtemp(prefix="jinja-")
+    precompilar(criar_templates(bytecode_dir=bytecode_dir).env)
+
+    resultado = {}
+    for nome, diretorio in (("compilando", ""), ("bytecode", bytecode_dir)):
+        tempos = []
+        for _ in range(repeticoes):
+            env = criar_templates(bytecode_dir=diretorio).env
+            inicio = time.perf_counter()
+            quantidade = precompilar(env)
+            tempos.append(time.perf_counter() - inicio)
+        resultado[nome] = round(min(tempos) * 1000, 2)
+    print(f">_ Carga de {quantidade} templates: {resultado['compilando']} ms compilando, "
+          f"{resultado['bytecode']} ms do bytecode")
+    return resultado
+
+
+# Custo do auto_reload: cada TemplateResponse chama get_template(), que confere o mtime do arquivo
+def medir_auto_reload(chamadas):
+    from templating import criar_templates
+    resultado = {}
+    for auto_reload in (True, False):
+        env = criar_templates(bytecode_dir="", auto_reload=auto_reload).env
+        env.get_template("index.html")
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            env.get_template("index.html")
+        resultado["auto_reload" if auto_reload else "sem_auto_reload"] = round((time.perf_counter() - inicio) / chamadas * 1e6, 2)
+    print(f">_ get_template(): {resultado['auto_reload']} µs com auto_reload, {resultado['sem_auto_reload']} µs sem")
+    return resultado
+
+
+# Renderiza cada página várias vezes (logado: a sessão do admin desvia do cache de páginas) e lê os histogramas
+async def perfilar(renders):
+    import httpx
+    import metrics
+    from app import app
+
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench.local") as cliente:
+            await cliente.post("/admin/login", data={"username": "admin", "password": os.environ.get("ADMIN_PASSWORD", "admin")})
+            for pagina in PAGINAS:
+                for _ in range(renders):
+                    await cliente.get(pagina)
+
+    paginas = metrics.render_duracao.resumo()
+    total = sum(soma for _, soma in paginas.values()) or 1
+    blocos = sorted(metrics.blocos_duracao.resumo().items(), key=lambda item: -item[1][1])
+    print(f"\n>_ {'TEMPLATE':<28} {'BLOCO':<14} {'RENDERS':>8} {'MÉDIA (ms)':>11} {'TOTAL (ms)':>11} {'% DO TOTAL':>10}")
+    linhas = []
+    for (template, bloco), (contagem, soma) in blocos:
+        linhas.append({"template": template, "bloco": bloco, "renders": contagem,
+                       "media_ms": round(soma / contagem * 1000, 4), "total_ms": round(soma * 1000, 3),
+                       "pct_total": round(soma / total * 100, 1)})
+        print(f"   {template:<28} {bloco:<14} {contagem:>8} {linhas[-1]['media_ms']:>11} {linhas[-1]['total_ms']:>11} "
+              f"{linhas[-1]['pct_total']:>9}%")
+    return linhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo de compilação e perfil de renderização dos templates (por bloco).")
+    parser.add_argument("--projetos", type=int, default=200)
+    parser.add_argument("--renders", type=int, default=50, help="renderizações por página no perfil")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/templates-<APP_VERSION>.json)")
+    args = parser.parse_args()
+
+    if not os.environ.get("DB_URL"):
+        os.environ["DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+    os.environ.setdefault("RATE_LIMIT_IP", "1000000000")
+    # O perfil por bloco é desligado por padrão no app
+    os.environ.setdefault("TEMPLATE_PERFIL_BLOCOS", "True")
+    import app
+    logging.getLogger().setLevel(logging.WARNING)
+    semear(args.projetos, 5, 2)
+
+    relatorio = {
+        "carga_ms": medir_carga(5),
+        "get_template_us": medir_auto_reload(10000),
+        "blocos": asyncio.run(perfilar(args.renders)),
+    }
+    saida = Path(args.saida) if args.saida else RESULTADOS_DIR / f"templates-{app.APP_VERSION}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n>_ [SUCESSO] Resultados gravados em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+import subprocess
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # Sem o pacote brotli, só as variantes .gz são geradas
+    brotli = None
+
+STATIC_DIR = Path(os.getenv("STATIC_DIR", "static"))
+DIST_DIR = "dist"
+MANIFESTO = "manifest.json"
+# Entrada e saída do Tailwind (a saída entra no fingerprint como qualquer outro asset)
+TAILWIND_BIN = os.getenv("TAILWIND_BIN", "tailwindcss")
+TAILWIND_ENTRADA = STATIC_DIR / "src" / "tailwind.css"
+TAILWIND_SAIDA = STATIC_DIR / "css" / "site.css"
+
+# Pastas que não são publicadas: fontes do build e a própria saída
+IGNORAR = {"src", DIST_DIR}
+# Formatos já comprimidos (jpg, png, woff2...) não ganham nada com gzip/brotli
+COMPRIMIVEIS = {".css", ".js", ".svg", ".json", ".txt", ".xml", ".html", ".ico", ".map"}
+# Variantes menores que isso não compensam o cabeçalho extra
+TAMANHO_MINIMO = 256
+
+
+def compilar_tailwind():
+    executavel = shutil.which(TAILWIND_BIN)
+    if not executavel:
+        print(f">_ [AVISO] '{TAILWIND_BIN}' não encontrado: o site continua usando o runtime do CDN.")
+        return False
+    TAILWIND_SAIDA.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run([executavel, "-c", "tailwind.config.js", "-i", str(TAILWIND_ENTRADA),
+                    "-o", str(TAILWIND_SAIDA), "--minify"], check=True)
+    print(f">_ CSS do Tailwind compilado: {TAILWIND_SAIDA} ({TAILWIND_SAIDA.stat().st_size} bytes)")
+    return True
+
+
+def assets():
+    for caminho in sorted(STATIC_DIR.rglob("*")):
+        relativo = caminho.relative_to(STATIC_DIR)
+        if caminho.is_file() and relativo.parts[0] not in IGNORAR:
+            yield caminho, relativo
+
+
+def nome_com_hash(relativo: Path, conteudo: bytes) -> Path:
+    digest = hashlib.sha256(conteudo).hexdigest()[:12]
+    return relativo.with_name(f"{relativo.stem}.{digest}{relativo.suffix}")
+
+
+def comprimir(destino: Path, conteudo: bytes):
+    gerados = []
+    variantes = [(".gz", lambda dados: gzip.compress(dados, compresslevel=9, mtime=0))]
+    if brotli:
+        variantes.append((".br", lambda dados: brotli.compress(dados, quality=11)))
+    for extensao, compressor in variantes:
+        comprimido = compressor(conteudo)
+        # Só grava a variante se ela for realmente menor que o original
+        if len(comprimido) < len(conteudo):
+            destino.with_name(destino.name + extensao).write_bytes(comprimido)
+            gerados.append(extensao)
+    return gerados
+
+
+def construir():
+    compilar_tailwind()
+
+    saida = STATIC_DIR / DIST_DIR
+    if saida.exists():
+        shutil.rmtree(saida)
+    saida.mkdir(parents=True)
+
+    manifesto = {}
+    total = total_comprimido = 0
+    for caminho, relativo in assets():
+        conteudo = caminho.read_bytes()
+        final = nome_com_hash(relativo, conteudo)
+        destino = saida / final
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(conteudo)
+        manifesto[relativo.as_posix()] = f"{DIST_DIR}/{final.as_posix()}"
+
+        variantes = []
+        if relativo.suffix.lower() in COMPRIMIVEIS and len(conteudo) >= TAMANHO_MINIMO:
+            variantes = comprimir(destino, conteudo)
+        total += len(conteudo)
+        total_comprimido += min([len(conteudo)] + [destino.with_name(destino.name + v).stat().st_size for v in variantes])
+        print(f">_ {relativo.as_posix()} -> {manifesto[relativo.as_posix()]} {' '.join(variantes)}")
+
+    (saida / MANIFESTO).write_text(json.dumps(manifesto, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"\n>_ [SUCESSO] {len(manifesto)} assets publicados em {saida} "
+          f"({total} bytes, {total_comprimido} bytes na melhor variante comprimida).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compila o Tailwind, gera nomes com hash e variantes .br/.gz dos arquivos estáticos.")
+    parser.parse_args()
+    try:
+        construir()
+    except subprocess.CalledProcessError as e:
+        print(f">_ [ERRO] Falha ao compilar o Tailwind: {e}")
+        sys.exit(1)
@@ -0,0 +1,254 @@
+import os
+import re
+import math
+import heapq
+import asyncio
+import logging
+import unicodedata
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from sqlalchemy import select
+import models
+import cache
+
+logger = logging.getLogger(__name__)
+
+# Parâmetros do BM25: saturação da frequência do termo e peso da normalização pelo tamanho
+BUSCA_BM25_K1 = float(os.environ.get("BUSCA_BM25_K1", "1.2"))
+BUSCA_BM25_B = float(os.environ.get("BUSCA_BM25_B", "0.75"))
+
+# Peso de cada campo: um termo no título conta como três ocorrências na descrição
+PESOS_CAMPOS = (("titulo", 3), ("categoria", 2), ("descricao", 1))
+
+FREQUENCIA_MAXIMA = 65535  # Limite do array("H") das frequências
+
+PALAVRAS_VAZIAS = frozenset("""
+a ao aos as com como da das de do dos e em entre na nas no nos o os ou para pela pelas pelo pelos
+por que se sem sob sua suas seu seus um uma umas uns the and of for to in on with
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+# --- NORMALIZAÇÃO (MINÚSCULAS, SEM ACENTOS, RADICAL) ---
+# Tabela direta para os acentos do português; o NFKD (bem mais lento) só entra se sobrar algo fora do ASCII
+_SEM_ACENTO = str.maketrans("áàâãäéèêëíìîïóòôõöúùûüçñ", "aaaaaeeeeiiiiooooouuuucn")
+
+
+def dobrar_acentos(texto: str) -> str:
+    texto = texto.lower().translate(_SEM_ACENTO)
+    if texto.isascii():
+        return texto
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+# Redutor leve para o português (plural e gênero, no estilo do stemmer de Savoy): agressivo o bastante
+# para "servidores"/"servidor" e "configurações"/"configuração" caírem no mesmo termo, sem o custo
+# (e os falsos positivos) de um RSLP completo. Roda depois da remoção de acentos.
+@lru_cache(maxsize=100000)
+def radical(palavra: str) -> str:
+    if len(palavra) < 4 or palavra.isdigit():
+        return palavra
+    if palavra.endswith("mente") and len(palavra) > 7:
+        palavra = palavra[:-5]
+    if palavra.endswith(("oes", "aes")):
+        palavra = palavra[:-3] + "ao"
+    elif palavra.endswith("ais"):
+        palavra = palavra[:-3] + "al"
+    elif palavra.endswith("eis"):
+        palavra = palavra[:-3] + "el"
+    elif palavra.endswith("ois"):
+        palavra = palavra[:-3] + "ol"
+    elif palavra.endswith("ns"):
+        palavra = palavra[:-2] + "m"
+    elif palavra.endswith("res") and len(palavra) > 5:
+        palavra = palavra[:-2]
+    elif palavra.endswith("s") and not palavra.endswith(("ss", "us", "is")):
+        palavra = palavra[:-1]
+    # Gênero e vogal temática: "servidora"/"servidor", "rede"/"redes"
+    if len(palavra) > 4 and palavra[-1] in "aoe":
+        palavra = palavra[:-1]
+    return palavra
+
+
+def termos(texto: str) -> list:
+    if not texto:
+        return []
+    return [radical(t) for t in _TOKEN.findall(dobrar_acentos(texto)) if t not in PALAVRAS_VAZIAS]
+
+
+# --- ÍNDICE INVERTIDO ---
+# Cada termo aponta para dois arrays paralelos, ordenados pelo id do projeto: ids (uint32) e frequências
+# ponderadas (uint16). Ocupa uma fração do que listas/dicts de objetos Python ocupariam com 10k+ projetos.
+class ListaOcorrencias:
+    __slots__ = ("ids", "frequencias")
+
+    def __init__(self):
+        self.ids = array("I")
+        self.frequencias = array("H")
+
+    def definir(self, doc_id: int, frequencia: int):
+        posicao = bisect_left(self.ids, doc_id)
+        if posicao < len(self.ids) and self.ids[posicao] == doc_id:
+            self.frequencias[posicao] = frequencia
+        else:
+            self.ids.insert(posicao, doc_id)
+            self.frequencias.insert(posicao, frequencia)
+
+    def remover(self, doc_id: int):
+        posicao = bisect_left(self.ids, doc_id)
+        if posicao < len(self.ids) and self.ids[posicao] == doc_id:
+            del self.ids[posicao]
+            del self.frequencias[posicao]
+
+
+def frequencias_documento(campos: dict) -> dict:
+    contagem = {}
+    for campo, peso in PESOS_CAMPOS:
+        for termo in termos(campos.get(campo)):
+            contagem[termo] = contagem.get(termo, 0) + peso
+    return contagem
+
+
+class IndiceInvertido:
+    def __init__(self, k1: float = BUSCA_BM25_K1, b: float = BUSCA_BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._ocorrencias = {}   # termo -> ListaOcorrencias
+        self._documentos = {}    # id -> (tamanho ponderado, termos do documento) para remoções
+        self._tamanho_total = 0
+        self._normas = None      # id -> normalização do BM25 pelo tamanho (refeita após mudanças)
+
+    def __len__(self):
+        return len(self._documentos)
+
+    # Carga inicial em lote: acumula listas comuns e converte cada termo em arrays uma única vez
+    @classmethod
+    def construir(cls, linhas):
+        indice = cls()
+        acumulado = {}
+        for doc_id, titulo, descricao, categoria in sorted(linhas, key=lambda linha: linha[0]):
+            contagem = frequencias_documento({"titulo": titulo, "descricao": descricao, "categoria": categoria})
+            for termo, frequencia in contagem.items():
+                par = acumulado.get(termo)
+                if par is None:
+                    par = acumulado[termo] = ([], [])
+                par[0].append(doc_id)
+                par[1].append(min(frequencia, FREQUENCIA_MAXIMA))
+            tamanho = sum(contagem.values())
+            indice._documentos[doc_id] = (tamanho, tuple(contagem))
+            indice._tamanho_total += tamanho
+        for termo, (ids, frequencias) in acumulado.items():
+            lista = indice._ocorrencias[termo] = ListaOcorrencias()
+            lista.ids = array("I", ids)
+            lista.frequencias = array("H", frequencias)
+        return indice
+
+    def adicionar(self, doc_id: int, **campos):
+        self.remover(doc_id)
+        contagem = frequencias_documento(campos)
+        for termo, frequencia in contagem.items():
+            lista = self._ocorrencias.get(termo)
+            if lista is None:
+                lista = self._ocorrencias[termo] = ListaOcorrencias()
+            lista.definir(doc_id, min(frequencia, FREQUENCIA_MAXIMA))
+        tamanho = sum(contagem.values())
+        self._documentos[doc_id] = (tamanho, tuple(contagem))
+        self._tamanho_total += tamanho
+        self._normas = None
+
+    def remover(self, doc_id: int):
+        documento = self._documentos.pop(doc_id, None)
+        if documento is None:
+            return
+        tamanho, termos_doc = documento
+        self._tamanho_total -= tamanho
+        for termo in termos_doc:
+            lista = self._ocorrencias[termo]
+            lista.remover(doc_id)
+            if not lista.ids:
+                del self._ocorrencias[termo]
+        self._normas = None
+
+    # O tamanho médio muda a cada edição, então as normas são recalculadas na primeira busca seguinte
+    def _calcular_normas(self) -> dict:
+        tamanho_medio = self._tamanho_total / len(self._documentos)
+        k1, b = self.k1, self.b
+        return {doc_id: k1 * (1 - b + b * tamanho / tamanho_medio) for doc_id, (tamanho, _) in self._documentos.items()}
+
+    # Devolve [(pontuação, id)] dos `limite` melhores e o total de documentos com algum termo da consulta
+    def buscar(self, consulta: str, limite: int = 20):
+        total_docs = len(self._documentos)
+        if not total_docs:
+            return [], 0
+        if self._normas is None:
+            self._normas = self._calcular_normas()
+        normas = self._normas
+        pontuacoes = {}
+        obter = pontuacoes.get
+        for termo in set(termos(consulta)):
+            lista = self._ocorrencias.get(termo)
+            if lista is None:
+                continue
+            df = len(lista.ids)
+            peso = math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) * (self.k1 + 1)
+            for doc_id, frequencia in zip(lista.ids, lista.frequencias):
+                pontuacoes[doc_id] = obter(doc_id, 0.0) + peso * frequencia / (frequencia + normas[doc_id])
+        # Empate na pontuação: o projeto mais novo primeiro
+        melhores = heapq.nlargest(limite, ((p, doc_id) for doc_id, p in pontuacoes.items()))
+        return melhores, len(pontuacoes)
+
+
+def construir_indice(linhas) -> IndiceInvertido:
+    return IndiceInvertido.construir(linhas)
+
+
+# --- BUSCA DE PROJETOS (ÍNDICE + SINCRONIA COM O BANCO) ---
+async def carregar_linhas(db):
+    return (await db.execute(select(
+        models.Projeto.id, models.Projeto.titulo, models.Projeto.descricao, models.Projeto.categoria
+    ))).all()
+
+
+# O índice vale para uma versão de cache.PROJETOS. As rotas admin deste worker o atualizam na hora
+# (atualizar/remover); edições feitas por outros workers aparecem como versão nova e disparam
+# uma reconstrução completa na próxima busca.
+class BuscaProjetos:
+    def __init__(self):
+        self.indice = IndiceInvertido()
+        self.versao = None
+        self._lock = asyncio.Lock()
+
+    async def reconstruir(self):
+        async with self._lock:
+            # Versão lida antes dos dados: uma edição no meio do caminho só provoca outra reconstrução
+            versao = await cache.versoes.atual(cache.PROJETOS)
+            # Quem esperou no lock enquanto outra busca reconstruía encontra o índice já em dia
+            if self.versao == versao:
+                return
+            linhas = await cache.ler(carregar_linhas)
+            # Tokenização e montagem dos arrays são CPU pura: fora do event loop
+            self.indice = await asyncio.to_thread(construir_indice, linhas)
+            self.versao = versao
+            logger.info(f"[BUSCA] Índice construído com {len(self.indice)} projetos (versão {versao}).")
+
+    async def buscar(self, consulta: str, limite: int = 20):
+        if self.versao != await cache.versoes.atual(cache.PROJETOS):
+            await self.reconstruir()
+        return self.indice.buscar(consulta, limite)
+
+    # Chamados pelas rotas admin com a versão devolvida por versoes.invalidar(): se ela for
+    # exatamente a seguinte à do índice, a única mudança foi esta e o índice segue válido
+    def atualizar(self, projeto: models.Projeto, versao: int):
+        self.indice.adicionar(projeto.id, titulo=projeto.titulo, descricao=projeto.descricao, categoria=projeto.categoria)
+        self._avancar(versao)
+
+    def remover(self, projeto_id: int, versao: int):
+        self.indice.remover(projeto_id)
+        self._avancar(versao)
+
+    def _avancar(self, versao: int):
+        if self.versao is not None and versao == self.versao + 1:
+            self.versao = versao
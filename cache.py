@@ -0,0 +1,276 @@
+import os
+import time
+import hashlib
+import asyncio
+import inspect
+import logging
+from datetime import datetime
+from collections import OrderedDict
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+from database import AsyncSessionLocal, roteador_leitura, leituras_total
+
+logger = logging.getLogger(__name__)
+
+# Intervalo máximo (em segundos) que um worker fica sem conferir se outro worker invalidou o cache
+CACHE_CHECK_INTERVAL = float(os.environ.get("CACHE_CHECK_INTERVAL", "5"))
+# Quantidade máxima de páginas renderizadas mantidas em memória (rota x domínio)
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", "64"))
+# Quantidade máxima de resultados guardados por consulta parametrizada (ex: páginas da API de projetos)
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "256"))
+
+# Chaves de versão: cada uma representa um conjunto de dados editável pelo painel
+LAYOUT = "layout"        # Contatos do rodapé + configuração do WhatsApp
+PROJETOS = "projetos"    # Grade de projetos da página inicial
+
+
+# INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT DO UPDATE (SQLite): cria a chave com versão 1 ou
+# incrementa a existente num único comando, sem a corrida de dois workers inserindo a mesma chave nova
+def consulta_incremento(dialeto: str, chave: str):
+    tabela = models.CacheVersao.__table__
+    # O onupdate do modelo não vale no ramo de update do upsert: a data vai explícita nos dois ramos
+    valores = {"chave": chave, "versao": 1, "atualizado_em": datetime.utcnow()}
+    if dialeto == "mysql":
+        consulta = mysql.insert(tabela).values(valores)
+        return consulta.on_duplicate_key_update(versao=tabela.c.versao + 1, atualizado_em=consulta.inserted.atualizado_em)
+    consulta = sqlite.insert(tabela).values(valores)
+    return consulta.on_conflict_do_update(index_elements=[tabela.c.chave],
+                                          set_={"versao": tabela.c.versao + 1, "atualizado_em": consulta.excluded.atualizado_em})
+
+
+# --- CONTROLE DE VERSÕES (COMPARTILHADO ENTRE WORKERS VIA BANCO) ---
+# Mantém uma cópia local da tabela cache_versoes, relida no máximo a cada CACHE_CHECK_INTERVAL
+# segundos. Em regime estável as rotas públicas não tocam no banco.
+class ControleVersoes:
+    def __init__(self, intervalo: float = CACHE_CHECK_INTERVAL):
+        self.intervalo = intervalo
+        self._versoes = {}
+        self._verificado_em = 0.0
+        self._lock = asyncio.Lock()
+        self._ouvintes = []
+
+    # Registra uma função (ou corrotina) chamada com as chaves invalidadas logo após o commit
+    def ao_invalidar(self, ouvinte):
+        self._ouvintes.append(ouvinte)
+
+    async def _recarregar(self):
+        async with AsyncSessionLocal() as db:
+            linhas = (await db.execute(select(models.CacheVersao.chave, models.CacheVersao.versao))).all()
+        self._versoes = {chave: versao for chave, versao in linhas}
+        self._verificado_em = time.monotonic()
+
+    async def atual(self, chave: str) -> int:
+        if time.monotonic() - self._verificado_em > self.intervalo:
+            async with self._lock:
+                if time.monotonic() - self._verificado_em > self.intervalo:
+                    await self._recarregar()
+        return self._versoes.get(chave, 0)
+
+    # Incrementa as versões no banco e força este worker a relê-las imediatamente.
+    # Devolve as versões novas (lidas na mesma transação, antes de outro worker poder mexer nelas).
+    async def invalidar(self, db: AsyncSession, *chaves: str) -> dict:
+        novas = {}
+        dialeto = db.bind.dialect.name
+        for chave in chaves:
+            await db.execute(consulta_incremento(dialeto, chave))
+            novas[chave] = await db.scalar(select(models.CacheVersao.versao).where(models.CacheVersao.chave == chave))
+        await db.commit()
+        # Os demais workers enxergam a nova versão em até CACHE_CHECK_INTERVAL segundos
+        self._verificado_em = 0.0
+        logger.info(f"[CACHE] Versões invalidadas: {', '.join(chaves)}")
+        for ouvinte in self._ouvintes:
+            try:
+                retorno = ouvinte(set(chaves))
+                if inspect.isawaitable(retorno):
+                    await retorno
+            except Exception as e:
+                logger.error(f"[CACHE] Falha ao reconstruir após invalidação: {e}")
+        return novas
+
+
+versoes = ControleVersoes()
+
+
+# --- LEITURAS NAS RÉPLICAS ---
+# As versões sempre vêm do primário (ControleVersoes); só as cargas dos caches vão para as réplicas. Antes de
+# usar uma réplica, confere se ela já tem as versões que este worker conhece: uma réplica atrasada guardaria
+# dados velhos sob a versão nova até a próxima edição. Com isso, quem acabou de gravar (e quem já viu a
+# gravação) lê o que foi gravado, mesmo com atraso de replicação.
+async def _sessao_replica():
+    indice = roteador_leitura.escolher()
+    if indice is None:
+        return None, None
+    db = roteador_leitura.sessoes[indice]()
+    try:
+        versoes_replica = dict((await db.execute(select(models.CacheVersao.chave, models.CacheVersao.versao))).all())
+    except (DBAPIError, OSError) as e:
+        await db.close()
+        roteador_leitura.marcar_falha(indice, e)
+        leituras_total.somar(1, "primario", "replica_fora")
+        return None, None
+    if any(versoes_replica.get(chave, 0) < versao for chave, versao in versoes._versoes.items()):
+        await db.close()
+        leituras_total.somar(1, "primario", "replica_atrasada")
+        return None, None
+    return indice, db
+
+
+# Executa `await carregar(db, *args)` numa réplica em dia, ou no primário (sem réplicas, todas fora do ar
+# ou atrasadas, ou se a réplica falhar no meio da carga)
+async def ler(carregar, *args):
+    if roteador_leitura:
+        indice, db = await _sessao_replica()
+        if db is not None:
+            try:
+                async with db:
+                    valor = await carregar(db, *args)
+                leituras_total.somar(1, roteador_leitura.nomes[indice], "replica")
+                return valor
+            except (DBAPIError, OSError) as e:
+                roteador_leitura.marcar_falha(indice, e)
+                leituras_total.somar(1, "primario", "replica_fora")
+    else:
+        leituras_total.somar(1, "primario", "sem_replica")
+    async with AsyncSessionLocal() as db:
+        return await carregar(db, *args)
+
+
+# --- CACHE DE LEITURA VERSIONADO ---
+# Guarda o resultado de `await carregar(db)` enquanto as versões das chaves não mudarem
+class CacheVersionado:
+    def __init__(self, chaves, carregar):
+        self.chaves = tuple(chaves)
+        self.carregar = carregar
+        self._versao = None
+        self._valor = None
+        self._lock = asyncio.Lock()
+
+    async def versao(self):
+        return tuple([await versoes.atual(chave) for chave in self.chaves])
+
+    async def get(self):
+        versao = await self.versao()
+        if self._versao == versao:
+            return self._valor
+        async with self._lock:
+            if self._versao != versao:
+                # Sessão própria: os objetos ficam desanexados e nunca são expirados por um commit alheio
+                self._valor = await ler(self.carregar)
+                self._versao = versao
+        return self._valor
+
+
+# --- CACHE DE CONSULTAS PARAMETRIZADAS ---
+# Como o CacheVersionado, mas com um valor por combinação de parâmetros (ex: filtro x cursor da API
+# de projetos), num LRU limitado. Uma mudança de versão descarta todas as entradas de uma vez.
+class CacheConsultas:
+    def __init__(self, chaves, carregar, max_entradas: int = QUERY_CACHE_MAX_ENTRIES):
+        self.chaves = tuple(chaves)
+        self.carregar = carregar
+        self.max_entradas = max_entradas
+        self._versao = None
+        self._valores = OrderedDict()  # parâmetros -> resultado de `await carregar(db, *parâmetros)`
+
+    async def get(self, *parametros):
+        versao = tuple([await versoes.atual(chave) for chave in self.chaves])
+        if self._versao != versao:
+            self._valores.clear()
+            self._versao = versao
+        if parametros in self._valores:
+            self._valores.move_to_end(parametros)
+            return self._valores[parametros]
+        valor = await ler(self.carregar, *parametros)
+        # Se a versão mudou durante a consulta, o resultado pode já nascer velho: entrega sem guardar
+        if self._versao == versao:
+            self._valores[parametros] = valor
+            if len(self._valores) > self.max_entradas:
+                self._valores.popitem(last=False)
+        return valor
+
+
+# --- ETAG ---
+def gerar_etag(corpo: bytes) -> str:
+    return '"' + hashlib.sha256(corpo).hexdigest()[:32] + '"'
+
+
+def etag_confere(request: Request, etag: str) -> bool:
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    candidatos = [c.strip() for c in cabecalho.split(",")]
+    # If-None-Match usa comparação fraca: W/"x" também casa com "x"
+    return "*" in candidatos or any(c.removeprefix("W/") == etag for c in candidatos)
+
+
+# --- CACHE DE PÁGINAS RENDERIZADAS (ETAG / 304) ---
+class PaginaCacheada:
+    __slots__ = ("versao", "corpo", "etag", "template", "contexto", "chaves", "scope")
+
+    def __init__(self, template, contexto, chaves, scope):
+        self.template, self.contexto, self.chaves, self.scope = template, contexto, chaves, scope
+        self.versao = self.corpo = self.etag = None
+
+
+# Guarda o HTML pronto de cada rota pública por domínio. A versão da página é a tupla das versões
+# das chaves de que ela depende; o APP_VERSION já entra no próprio HTML (e portanto no ETag).
+class CachePaginas:
+    # `sessao_ativa(token)`: corrotina que diz se o cookie session_token é de uma sessão válida
+    def __init__(self, templates, max_entradas: int = PAGE_CACHE_MAX_ENTRIES, sessao_ativa=None):
+        self.templates = templates
+        self.max_entradas = max_entradas
+        self.sessao_ativa = sessao_ativa
+        self._paginas = OrderedDict()  # (path, base_url) -> PaginaCacheada
+        versoes.ao_invalidar(self.reconstruir)
+
+    async def _renderizar(self, request: Request, template: str, contexto) -> bytes:
+        dados = await contexto()
+        return self.templates.get_template(template).render({"request": request, **dados}).encode("utf-8")
+
+    async def _atualizar(self, pagina: PaginaCacheada, request: Request):
+        pagina.versao = tuple([await versoes.atual(c) for c in pagina.chaves])
+        pagina.corpo = await self._renderizar(request, pagina.template, pagina.contexto)
+        pagina.etag = gerar_etag(pagina.corpo)
+
+    # Mantém só o necessário para montar um Request equivalente na reconstrução antecipada
+    @staticmethod
+    def _scope_minimo(request: Request) -> dict:
+        scope = request.scope
+        return {
+            "type": "http", "method": "GET", "path": scope["path"], "root_path": scope.get("root_path", ""),
+            "scheme": scope.get("scheme", "http"), "server": scope.get("server"), "query_string": b"",
+            "headers": [(k, v) for k, v in scope.get("headers", []) if k == b"host"],
+        }
+
+    async def responder(self, request: Request, template: str, contexto, chaves=(LAYOUT,)) -> Response:
+        # Usuários logados veem outro menu: só eles ignoram o cache. Um cookie forjado ou expirado recebe a página
+        # cacheada, e a query string (?utm_source=...) também, já que o HTML não depende dela (og:url sai sem ela).
+        token = request.cookies.get("session_token")
+        if token and self.sessao_ativa is not None and await self.sessao_ativa(token):
+            return HTMLResponse(await self._renderizar(request, template, contexto))
+
+        chave = (request.url.path, str(request.base_url))
+        pagina = self._paginas.get(chave)
+        if pagina is None:
+            pagina = PaginaCacheada(template, contexto, tuple(chaves), self._scope_minimo(request))
+            self._paginas[chave] = pagina
+            if len(self._paginas) > self.max_entradas:
+                self._paginas.popitem(last=False)
+        if pagina.versao != tuple([await versoes.atual(c) for c in pagina.chaves]):
+            await self._atualizar(pagina, request)
+        self._paginas.move_to_end(chave)
+
+        cabecalhos = {"ETag": pagina.etag, "Cache-Control": "no-cache"}
+        if etag_confere(request, pagina.etag):
+            return Response(status_code=304, headers=cabecalhos)
+        return HTMLResponse(pagina.corpo, headers=cabecalhos)
+
+    # Re-renderiza já as páginas afetadas, para a próxima visita não pagar o custo do template
+    async def reconstruir(self, chaves_invalidadas: set):
+        for pagina in list(self._paginas.values()):
+            if not chaves_invalidadas.isdisjoint(pagina.chaves):
+                await self._atualizar(pagina, Request(dict(pagina.scope)))
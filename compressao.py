@@ -0,0 +1,201 @@
+import os
+import gzip
+import time
+import zlib
+import logging
+from collections import OrderedDict
+from starlette.datastructures import Headers, MutableHeaders
+import metrics
+from assets import codificacoes_aceitas
+
+try:
+    import brotli
+except ImportError:  # Sem o pacote brotli, só gzip é negociado
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Corpos menores que isso não compensam (o ganho some no cabeçalho e no custo de CPU)
+COMPRESSAO_MINIMO = int(os.environ.get("COMPRESSAO_MINIMO", "1024"))
+# Níveis por requisição (respostas sem ETag, comprimidas a cada vez): rápidos
+COMPRESSAO_BR_NIVEL = int(os.environ.get("COMPRESSAO_BR_NIVEL", "4"))
+COMPRESSAO_GZIP_NIVEL = int(os.environ.get("COMPRESSAO_GZIP_NIVEL", "6"))
+# Níveis das variantes guardadas por ETag: comprimidas uma vez por versão da página, podem ser mais caras
+COMPRESSAO_BR_NIVEL_CACHE = int(os.environ.get("COMPRESSAO_BR_NIVEL_CACHE", "9"))
+COMPRESSAO_GZIP_NIVEL_CACHE = int(os.environ.get("COMPRESSAO_GZIP_NIVEL_CACHE", "9"))
+COMPRESSAO_CACHE_MAX = int(os.environ.get("COMPRESSAO_CACHE_MAX", "128"))
+
+# Só texto ganha com compressão; imagens, fontes woff2, zip etc. já vêm comprimidos
+TIPOS_COMPRIMIVEIS = ("text/", "application/json", "application/xml", "application/javascript",
+                      "application/x-ndjson", "image/svg+xml")
+
+bytes_total = metrics.registro.adicionar(metrics.Contador(
+    "http_compression_bytes_total", "Bytes antes e depois da compressão das respostas.", ("encoding", "fase")))
+compressao_duracao = metrics.registro.adicionar(metrics.Histograma(
+    "http_compression_seconds", "Tempo de CPU comprimindo respostas.", ("encoding",),
+    (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)))
+cache_variantes = metrics.registro.adicionar(metrics.Contador(
+    "http_compression_cache_total", "Variantes comprimidas servidas do cache por ETag.", ("resultado",)))
+
+
+def comprimir(dados: bytes, codificacao: str, nivel: int) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(dados, quality=nivel)
+    return gzip.compress(dados, compresslevel=nivel, mtime=0)
+
+
+# Compressor incremental para respostas em streaming (cada pedaço sai já decodificável pelo cliente)
+class CompressorFluxo:
+    def __init__(self, codificacao: str, nivel: int):
+        self.codificacao = codificacao
+        if codificacao == "br":
+            self._brotli = brotli.Compressor(quality=nivel)
+        else:
+            self._zlib = zlib.compressobj(nivel, zlib.DEFLATED, 31)  # wbits 31 = cabeçalho gzip
+
+    def pedaco(self, dados: bytes) -> bytes:
+        if self.codificacao == "br":
+            return self._brotli.process(dados) + self._brotli.flush()
+        return self._zlib.compress(dados) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        if self.codificacao == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def escolher_codificacao(accept_encoding: str):
+    aceitas = codificacoes_aceitas(accept_encoding)
+    if brotli and "br" in aceitas:
+        return "br"
+    if "gzip" in aceitas:
+        return "gzip"
+    return None
+
+
+def comprimivel(tipo: str) -> bool:
+    return tipo.startswith(TIPOS_COMPRIMIVEIS)
+
+
+# --- MIDDLEWARE ASGI DE COMPRESSÃO ---
+# Respostas com ETag (páginas públicas em cache, /projetos...) têm a variante comprimida guardada por
+# (ETag, codificação): a mesma home não é recomprimida a cada visitante. O ETag vira fraco (W/"..."),
+# como no nginx, e o If-None-Match continua casando com a comparação fraca de cache.etag_confere.
+class MiddlewareCompressao:
+    def __init__(self, app, minimo: int = COMPRESSAO_MINIMO, ignorar=("/static/",), max_cache: int = COMPRESSAO_CACHE_MAX):
+        self.app = app
+        self.minimo = minimo
+        self.ignorar = tuple(ignorar)  # /static tem as próprias variantes pré-comprimidas no build
+        self.max_cache = max_cache
+        self._variantes = OrderedDict()  # (etag, codificação) -> corpo comprimido
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.ignorar):
+            return await self.app(scope, receive, send)
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""))
+
+        inicio_resposta = None
+        compressor = None  # Só existe em respostas em streaming que estão sendo comprimidas
+        repassar = False
+
+        async def enviar(mensagem):
+            nonlocal inicio_resposta, compressor, repassar
+            if repassar:
+                return await send(mensagem)
+
+            if mensagem["type"] == "http.response.start":
+                repassar = True
+                cabecalhos = MutableHeaders(raw=mensagem["headers"])
+                if mensagem["status"] == 304:
+                    # 304 não tem Content-Type: se o cliente negocia compressão, ele guardou a variante
+                    # comprimida, então recebe de volta o mesmo ETag fraco
+                    if codificacao is not None and "etag" in cabecalhos:
+                        cabecalhos.add_vary_header("Accept-Encoding")
+                        self._enfraquecer_etag(cabecalhos)
+                    return await send(mensagem)
+                if "content-encoding" in cabecalhos or not comprimivel(cabecalhos.get("content-type", "")):
+                    return await send(mensagem)
+                # Tipo comprimível: caches intermediários precisam separar as variantes mesmo quando esta
+                # resposta específica sair sem compressão
+                cabecalhos.add_vary_header("Accept-Encoding")
+                if codificacao is None or mensagem["status"] == 204 or scope["method"] == "HEAD":
+                    return await send(mensagem)
+                repassar = False
+                inicio_resposta = mensagem  # Segurado até saber o tamanho do corpo
+                return
+
+            if mensagem["type"] != "http.response.body":
+                return await send(mensagem)
+            corpo = mensagem.get("body", b"")
+            mais = mensagem.get("more_body", False)
+
+            if compressor is not None:
+                comprimido = self._medir(codificacao, compressor.pedaco, corpo)
+                if not mais:
+                    comprimido += compressor.finalizar()
+                self._contar(codificacao, corpo, comprimido)
+                return await send({"type": "http.response.body", "body": comprimido, "more_body": mais})
+
+            if mais:
+                # Streaming (ex: exportações NDJSON/CSV): comprime pedaço a pedaço, sem Content-Length
+                compressor = CompressorFluxo(codificacao, COMPRESSAO_BR_NIVEL if codificacao == "br" else COMPRESSAO_GZIP_NIVEL)
+                cabecalhos = MutableHeaders(raw=inicio_resposta["headers"])
+                del cabecalhos["content-length"]
+                cabecalhos["content-encoding"] = codificacao
+                self._enfraquecer_etag(cabecalhos)
+                await send(inicio_resposta)
+                comprimido = self._medir(codificacao, compressor.pedaco, corpo)
+                self._contar(codificacao, corpo, comprimido)
+                return await send({"type": "http.response.body", "body": comprimido, "more_body": True})
+
+            if len(corpo) < self.minimo:
+                await send(inicio_resposta)
+                return await send(mensagem)
+
+            cabecalhos = MutableHeaders(raw=inicio_resposta["headers"])
+            etag = cabecalhos.get("etag") if inicio_resposta["status"] == 200 else None
+            comprimido = self._variante(etag, corpo, codificacao)
+            self._contar(codificacao, corpo, comprimido)
+            cabecalhos["content-encoding"] = codificacao
+            cabecalhos["content-length"] = str(len(comprimido))
+            self._enfraquecer_etag(cabecalhos)
+            await send(inicio_resposta)
+            await send({"type": "http.response.body", "body": comprimido, "more_body": False})
+
+        await self.app(scope, receive, enviar)
+
+    def _variante(self, etag, corpo: bytes, codificacao: str) -> bytes:
+        if not etag:
+            nivel = COMPRESSAO_BR_NIVEL if codificacao == "br" else COMPRESSAO_GZIP_NIVEL
+            return self._medir(codificacao, comprimir, corpo, codificacao, nivel)
+        chave = (etag, codificacao)
+        comprimido = self._variantes.get(chave)
+        if comprimido is not None:
+            cache_variantes.somar(1, "acerto")
+            self._variantes.move_to_end(chave)
+            return comprimido
+        cache_variantes.somar(1, "falta")
+        nivel = COMPRESSAO_BR_NIVEL_CACHE if codificacao == "br" else COMPRESSAO_GZIP_NIVEL_CACHE
+        comprimido = self._variantes[chave] = self._medir(codificacao, comprimir, corpo, codificacao, nivel)
+        if len(self._variantes) > self.max_cache:
+            self._variantes.popitem(last=False)
+        return comprimido
+
+    @staticmethod
+    def _medir(codificacao: str, funcao, *args) -> bytes:
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            compressao_duracao.observar(time.perf_counter() - inicio, codificacao)
+
+    @staticmethod
+    def _contar(codificacao: str, original: bytes, comprimido: bytes):
+        bytes_total.somar(len(original), codificacao, "original")
+        bytes_total.somar(len(comprimido), codificacao, "comprimido")
+
+    @staticmethod
+    def _enfraquecer_etag(cabecalhos: MutableHeaders):
+        etag = cabecalhos.get("etag")
+        if etag and not etag.startswith("W/"):
+            cabecalhos["etag"] = "W/" + etag
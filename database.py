@@ -1,6 +1,14 @@
 import os
-from sqlalchemy import create_engine
+import asyncio
+import logging
+import itertools
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+import metrics
+
+logger = logging.getLogger(__name__)
 
 # Captura as variáveis de ambiente com valores de fallback por segurança
 DB_USER = os.getenv("DB_USER", "root")
@@ -9,18 +17,134 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "henriquetec")
 
-# Monta a URL dinamicamente
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Ajustes do pool de conexões (ignorados no SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Abaixo do wait_timeout padrão do MySQL
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+
+# Réplicas de leitura (opcional): URLs completas em DB_REPLICA_URLS (ex: sqlite:///./replica.db), ou só os
+# hosts em DB_REPLICA_HOSTS ("replica1,replica2:3307"), com o mesmo usuário, senha e banco do primário
+DB_REPLICA_URLS = os.getenv("DB_REPLICA_URLS", "")
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))  # Segundos entre health checks
+DB_REPLICA_TIMEOUT = float(os.getenv("DB_REPLICA_TIMEOUT", "2"))
+
+# Monta a URL dinamicamente (DB_URL permite apontar para outro banco, ex: sqlite:///./dev.db)
+SQLALCHEMY_DATABASE_URL = os.getenv("DB_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Driver assíncrono equivalente para cada banco suportado
+DRIVERS_ASSINCRONOS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+def url_assincrona(url: str):
+    url = make_url(url)
+    return url.set(drivername=DRIVERS_ASSINCRONOS[url.get_backend_name()])
+
+def opcoes_pool(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Engine síncrona: criação de tabelas, migrate.py e scripts de manutenção
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **opcoes_pool(SQLALCHEMY_DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine assíncrona: usada por todas as rotas, sem bloquear o event loop
+# (no MySQL, o pool mede a espera de cada checkout para o /metrics)
+def criar_engine_assincrona(url: str, nome: str):
+    opcoes = opcoes_pool(url)
+    if opcoes:
+        opcoes["poolclass"] = type("PoolMedido", (metrics.PoolMedido,), {"nome_metrica": nome})
+    engine_assincrona = create_async_engine(url_assincrona(url), **opcoes)
+    metrics.instrumentar_engine(engine_assincrona.sync_engine, nome)
+    return engine_assincrona
+
+async_engine = criar_engine_assincrona(SQLALCHEMY_DATABASE_URL, "async")
+
+# Contagem e tempo das queries (por requisição e no total) expostos no /metrics
+metrics.instrumentar_engine(engine, "sync")
+
+# expire_on_commit=False: atributos continuam acessíveis após o commit sem novo SELECT implícito
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+# --- RÉPLICAS DE LEITURA ---
+def urls_replicas() -> list:
+    if DB_REPLICA_URLS:
+        return [url.strip() for url in DB_REPLICA_URLS.split(",") if url.strip()]
+    urls = []
+    for host in filter(None, (h.strip() for h in DB_REPLICA_HOSTS.split(","))):
+        host, _, porta = host.partition(":")
+        urls.append(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{host}:{porta or DB_PORT}/{DB_NAME}")
+    return urls
+
+leituras_total = metrics.registro.adicionar(metrics.Contador(
+    "db_leituras_total", "Cargas de leitura por destino (réplica ou primário) e motivo.", ("destino", "motivo")))
+replica_saudavel = metrics.registro.adicionar(metrics.Medidor(
+    "db_replica_saudavel", "1 se a réplica passou no último health check.", ("replica",)))
+
+
+# Escolhe a réplica (round-robin entre as saudáveis) para as leituras públicas. Uma falha tira a réplica da
+# rodada na hora; o health check periódico a devolve quando ela voltar a responder.
+class RoteadorLeitura:
+    def __init__(self, urls, intervalo: float = DB_REPLICA_CHECK_INTERVAL, timeout: float = DB_REPLICA_TIMEOUT):
+        self.intervalo = intervalo
+        self.timeout = timeout
+        self.nomes = [f"replica{i}" for i in range(len(urls))]
+        self.engines = [criar_engine_assincrona(url, nome) for url, nome in zip(urls, self.nomes)]
+        self.sessoes = [async_sessionmaker(e, autoflush=False, expire_on_commit=False) for e in self.engines]
+        self.saudavel = [True] * len(urls)
+        self._rodada = itertools.count()
+        for nome in self.nomes:
+            replica_saudavel.definir(1, nome)
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    # Índice da próxima réplica saudável, ou None (sem réplicas, ou todas fora do ar: vale o primário)
+    def escolher(self):
+        saudaveis = [i for i, ok in enumerate(self.saudavel) if ok]
+        if not saudaveis:
+            return None
+        return saudaveis[next(self._rodada) % len(saudaveis)]
+
+    def marcar_falha(self, indice: int, erro: Exception):
+        if self.saudavel[indice]:
+            logger.warning(f"[DB] {self.nomes[indice]} fora da rodada de leitura: {erro}")
+        self.saudavel[indice] = False
+        replica_saudavel.definir(0, self.nomes[indice])
+
+    async def verificar(self):
+        for indice, engine_replica in enumerate(self.engines):
+            try:
+                async with engine_replica.connect() as conn:
+                    await asyncio.wait_for(conn.execute(text("SELECT 1")), self.timeout)
+            except Exception as e:
+                self.marcar_falha(indice, e)
+                continue
+            if not self.saudavel[indice]:
+                logger.info(f"[DB] {self.nomes[indice]} voltou à rodada de leitura.")
+            self.saudavel[indice] = True
+            replica_saudavel.definir(1, self.nomes[indice])
+
+    # Roda no lifespan enquanto houver réplicas configuradas
+    async def monitorar(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await self.verificar()
+
+
+roteador_leitura = RoteadorLeitura(urls_replicas())
@@ -0,0 +1,124 @@
+import os
+import re
+import logging
+from collections import OrderedDict
+from markupsafe import escape
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, PlainTextResponse
+import cache
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Responde os caminhos típicos de varredura (WordPress, .env, .git, PHP...) com um 404 mínimo em texto,
+# antes do roteamento e sem template
+SCANNER_BLOQUEIO_RAPIDO = os.environ.get("SCANNER_BLOQUEIO_RAPIDO", "True").lower() == "true"
+# Prefixos extras de varredura, separados por vírgula (ex: "/owa,/ecp")
+SCANNER_PREFIXOS_EXTRAS = [p.strip() for p in os.environ.get("SCANNER_PREFIXOS", "").split(",") if p.strip()]
+# Domínios (Host) com a página 404 pré-renderizada em memória
+PAGINA_404_MAX_ENTRADAS = int(os.environ.get("PAGINA_404_MAX_ENTRADAS", "16"))
+
+# O site não tem PHP, ASP nem CGI: qualquer caminho assim é robô procurando vulnerabilidade
+PREFIXOS_SCANNER = (
+    "/wp-admin", "/wp-login.php", "/wp-content", "/wp-includes", "/wp-json", "/xmlrpc.php", "/wordpress",
+    "/.env", "/.git", "/.svn", "/.aws", "/.ssh", "/.ds_store", "/phpmyadmin", "/pma", "/myadmin", "/cgi-bin",
+    "/vendor", "/actuator", "/boaform", "/hnap1", "/owa", "/autodiscover", "/console", "/solr", "/telescope",
+    *[p.lower() for p in SCANNER_PREFIXOS_EXTRAS],
+)
+EXTENSOES_SCANNER = re.compile(r"\.(php\d?|asp|aspx|jsp|cgi|env|ini|bak|sql|old|swp)$", re.IGNORECASE)
+
+# Marcador no lugar do caminho pedido: o HTML é renderizado uma vez e o caminho (escapado) entra por substituição
+MARCADOR = "__caminho_404__"
+
+nao_encontrados = metrics.registro.adicionar(metrics.Contador(
+    "http_404_total", "Respostas 404 por prefixo do caminho (ondas de varredura aparecem aqui).", ("prefixo", "tipo")))
+
+
+# Regra de varredura que casa com o caminho ("/wp-admin", "*.php"...) ou None
+def regra_scanner(caminho: str):
+    minusculo = caminho.lower()
+    for prefixo in PREFIXOS_SCANNER:
+        if minusculo.startswith(prefixo) and (len(minusculo) == len(prefixo) or minusculo[len(prefixo)] in "/.?"):
+            return prefixo
+    extensao = EXTENSOES_SCANNER.search(minusculo)
+    if extensao:
+        return "*." + extensao.group(1)
+    return None
+
+
+# Rótulo com cardinalidade limitada: a regra de varredura, o primeiro segmento se for uma rota do app,
+# ou "<outro>" (o caminho cru deixaria qualquer robô criar séries novas no Prometheus)
+def contar(caminho: str, prefixos_app) -> str:
+    regra = regra_scanner(caminho)
+    if regra:
+        nao_encontrados.somar(1, regra, "scanner")
+        return regra
+    segmento = "/" + caminho.lstrip("/").split("/", 1)[0]
+    rotulo = segmento if segmento in prefixos_app else "<outro>"
+    nao_encontrados.somar(1, rotulo, "comum")
+    return rotulo
+
+
+# --- BLOQUEIO RÁPIDO DE VARREDURAS (MIDDLEWARE ASGI) ---
+class BloqueioScanner:
+    def __init__(self, app, ativo: bool = SCANNER_BLOQUEIO_RAPIDO):
+        self.app = app
+        self.ativo = ativo
+
+    async def __call__(self, scope, receive, send):
+        if not self.ativo or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        regra = regra_scanner(scope["path"])
+        if regra is None:
+            return await self.app(scope, receive, send)
+        nao_encontrados.somar(1, regra, "scanner")
+        resposta = PlainTextResponse("Not Found", status_code=404, headers={"Cache-Control": "public, max-age=86400"})
+        await resposta(scope, receive, send)
+
+
+# --- PÁGINA 404 PRÉ-RENDERIZADA ---
+# O 404.html é renderizado uma vez por domínio e versão do layout (contatos + WhatsApp), com o marcador no
+# lugar do caminho; cada 404 só junta os pedaços com o caminho escapado. Sem sessão de banco e sem template
+# por URL inexistente: em regime estável o custo é o de um str.join.
+class Pagina404:
+    def __init__(self, templates, contexto, max_entradas: int = PAGINA_404_MAX_ENTRADAS, sessao_ativa=None):
+        self.templates = templates
+        self.contexto = contexto
+        self.sessao_ativa = sessao_ativa  # Como no CachePaginas: só uma sessão válida desvia do HTML pronto
+        self.max_entradas = max_entradas
+        self._paginas = OrderedDict()  # base_url -> (versão do layout, pedaços do HTML)
+        self._prefixos_app = None
+
+    def _prefixos(self, app) -> set:
+        if self._prefixos_app is None:
+            self._prefixos_app = {"/" + getattr(rota, "path", "").lstrip("/").split("/", 1)[0] for rota in app.routes}
+        return self._prefixos_app
+
+    async def _renderizar(self, request: Request) -> str:
+        return self.templates.get_template("404.html").render({"request": request, **await self.contexto()})
+
+    async def _pedacos(self, request: Request) -> list:
+        scope = {
+            "type": "http", "method": "GET", "path": "/" + MARCADOR, "root_path": request.scope.get("root_path", ""),
+            "scheme": request.url.scheme, "server": request.scope.get("server"), "query_string": b"",
+            "headers": [(k, v) for k, v in request.scope.get("headers", []) if k == b"host"],
+        }
+        return (await self._renderizar(Request(scope))).split("/" + MARCADOR)
+
+    async def responder(self, request: Request) -> HTMLResponse:
+        contar(request.scope["path"], self._prefixos(request.app))
+        # Usuários logados veem outro menu: renderiza na hora (raro, e nunca vem de robô)
+        token = request.cookies.get("session_token")
+        if token and self.sessao_ativa is not None and await self.sessao_ativa(token):
+            return HTMLResponse(await self._renderizar(request), status_code=404)
+
+        chave = str(request.base_url)
+        versao = await cache.versoes.atual(cache.LAYOUT)
+        entrada = self._paginas.get(chave)
+        if entrada is None or entrada[0] != versao:
+            entrada = self._paginas[chave] = (versao, await self._pedacos(request))
+            if len(self._paginas) > self.max_entradas:
+                self._paginas.popitem(last=False)
+        self._paginas.move_to_end(chave)
+        # O root_path já está nos pedaços (veio da renderização): entra só o caminho em si
+        return HTMLResponse(str(escape(request.scope["path"])).join(entrada[1]), status_code=404)
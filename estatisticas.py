@@ -0,0 +1,204 @@
+import os
+import re
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.dialects import mysql, sqlite
+from starlette.datastructures import Headers
+import models
+import metrics
+from database import AsyncSessionLocal
+from sitemap import paginas_publicas
+from exportacao import ESCOPO_EXPORTACAO
+
+logger = logging.getLogger(__name__)
+
+ESTATISTICAS_ATIVAS = os.environ.get("ESTATISTICAS_ATIVAS", "True").lower() == "true"
+# Intervalo (em segundos) entre as gravações em lote: é o atraso máximo dos números do painel
+ESTATISTICAS_INTERVALO = float(os.environ.get("ESTATISTICAS_INTERVALO", "30"))
+# Teto de combinações (dia x rota x evento) pendentes em memória; acima disso novos acessos são descartados
+ESTATISTICAS_MAX_CHAVES = int(os.environ.get("ESTATISTICAS_MAX_CHAVES", "5000"))
+# Tempo máximo da última gravação no desligamento (o que não couber nele se perde, sem segurar o deploy)
+ESTATISTICAS_TIMEOUT_ENCERRAR = float(os.environ.get("ESTATISTICAS_TIMEOUT_ENCERRAR", "5"))
+
+VISUALIZACAO = "visualizacao"
+WHATSAPP = "whatsapp"
+OUTRA = "<outra>"  # Origem de clique fora das páginas públicas (404, parâmetro forjado...)
+DIAS_PAINEL = 30
+
+# Robôs de busca e pré-visualizações de links não são visitas
+ROBOS = re.compile(r"bot|crawl|spider|slurp|preview|facebookexternalhit|curl|wget|python-", re.IGNORECASE)
+
+eventos_total = metrics.registro.adicionar(metrics.Contador(
+    "estatisticas_eventos_total", "Acessos contados para as estatísticas do painel.", ("evento",)))
+descartados_total = metrics.registro.adicionar(metrics.Contador(
+    "estatisticas_descartados_total", "Acessos não contados ou perdidos.", ("motivo",)))
+pendentes = metrics.registro.adicionar(metrics.Medidor(
+    "estatisticas_pendentes", "Combinações dia x rota x evento aguardando gravação."))
+gravacao_duracao = metrics.registro.adicionar(metrics.Histograma(
+    "estatisticas_gravacao_seconds", "Duração de cada gravação em lote.", (), (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)))
+
+
+def eh_robo(user_agent: str) -> bool:
+    return not user_agent or bool(ROBOS.search(user_agent))
+
+
+# INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT DO UPDATE (SQLite): soma ao total do dia
+def consulta_upsert(dialeto: str):
+    tabela = models.AcessoDiario.__table__
+    if dialeto == "mysql":
+        consulta = mysql.insert(tabela)
+        return consulta.on_duplicate_key_update(total=tabela.c.total + consulta.inserted.total)
+    consulta = sqlite.insert(tabela)
+    return consulta.on_conflict_do_update(index_elements=[tabela.c.dia, tabela.c.rota, tabela.c.evento],
+                                          set_={"total": tabela.c.total + consulta.excluded.total})
+
+
+# --- CONTADORES EM MEMÓRIA, GRAVADOS EM LOTE ---
+# Cada acesso só incrementa um dict (sem I/O na requisição). Uma task em segundo plano grava tudo a cada
+# ESTATISTICAS_INTERVALO segundos num único upsert em lote; vários workers somam no mesmo registro do dia.
+class ContadorAcessos:
+    def __init__(self, intervalo: float = ESTATISTICAS_INTERVALO, max_chaves: int = ESTATISTICAS_MAX_CHAVES):
+        self.intervalo = intervalo
+        self.max_chaves = max_chaves
+        self._pendentes = {}  # (dia, rota, evento) -> contagem
+        metrics.registro.coletor(lambda: pendentes.definir(len(self._pendentes)))
+
+    def registrar(self, rota: str, evento: str, quantidade: int = 1):
+        chave = (datetime.now(timezone.utc).date(), rota, evento)
+        if chave in self._pendentes:
+            self._pendentes[chave] += quantidade
+        elif len(self._pendentes) < self.max_chaves:
+            self._pendentes[chave] = quantidade
+        else:
+            descartados_total.somar(quantidade, "limite")
+            return
+        eventos_total.somar(quantidade, evento)
+
+    async def gravar(self) -> int:
+        if not self._pendentes:
+            return 0
+        lote, self._pendentes = self._pendentes, {}
+        inicio = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(consulta_upsert(db.bind.dialect.name), [
+                    {"dia": dia, "rota": rota, "evento": evento, "total": total}
+                    for (dia, rota, evento), total in lote.items()])
+                await db.commit()
+        except asyncio.CancelledError:
+            # Cancelada no meio (desligamento, timeout do encerrar): o lote volta para a memória, como numa falha
+            self._devolver_lote(lote)
+            raise
+        except Exception as e:
+            # Banco fora do ar: as contagens voltam para a memória e entram na próxima gravação
+            self._devolver_lote(lote)
+            logger.warning(f"[ESTATISTICAS] Falha ao gravar {len(lote)} contadores (nova tentativa em "
+                           f"{self.intervalo:.0f}s): {e}")
+            return 0
+        gravacao_duracao.observar(time.perf_counter() - inicio)
+        return sum(lote.values())
+
+    def _devolver_lote(self, lote: dict):
+        for chave, total in lote.items():
+            self._devolver(chave, total)
+
+    def _devolver(self, chave, total: int):
+        if chave in self._pendentes:
+            self._pendentes[chave] += total
+        elif len(self._pendentes) < self.max_chaves:
+            self._pendentes[chave] = total
+        else:
+            descartados_total.somar(total, "falha_gravacao")
+
+    # Task do lifespan
+    async def executar(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await self.gravar()
+
+    # Última gravação no desligamento, limitada no tempo: perder alguns acessos é aceitável, travar o deploy não
+    async def encerrar(self, timeout: float = ESTATISTICAS_TIMEOUT_ENCERRAR):
+        try:
+            await asyncio.wait_for(self.gravar(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        # Se a gravação falhou ou estourou o tempo, as contagens voltaram para a memória, que está acabando
+        perdidos = sum(self._pendentes.values())
+        if perdidos:
+            descartados_total.somar(perdidos, "encerramento")
+            logger.warning(f"[ESTATISTICAS] {perdidos} acessos perdidos no desligamento.")
+
+
+# --- CONTAGEM DAS VISUALIZAÇÕES (MIDDLEWARE ASGI) ---
+# Fica por fora do modo de exportação estática: páginas servidas do disco também contam. Só GET com resposta
+# 200/304 nas páginas públicas, sem robôs nem o próprio admin logado.
+class MiddlewareAcessos:
+    def __init__(self, app, contador: ContadorAcessos, site, ativo: bool = ESTATISTICAS_ATIVAS):
+        self.app = app
+        self.contador = contador
+        self.site = site  # App FastAPI, para descobrir as páginas públicas
+        self.ativo = ativo
+        self._paginas = None
+
+    def paginas(self) -> set:
+        if self._paginas is None:
+            self._paginas = set(paginas_publicas(self.site))
+        return self._paginas
+
+    async def __call__(self, scope, receive, send):
+        if (not self.ativo or scope["type"] != "http" or scope["method"] != "GET" or scope.get(ESCOPO_EXPORTACAO)
+                or scope["path"] not in self.paginas()):
+            return await self.app(scope, receive, send)
+        cabecalhos = Headers(scope=scope)
+        if eh_robo(cabecalhos.get("user-agent", "")):
+            descartados_total.somar(1, "robo")
+            return await self.app(scope, receive, send)
+        if "session_token=" in cabecalhos.get("cookie", ""):
+            return await self.app(scope, receive, send)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and mensagem["status"] in (200, 304):
+                self.contador.registrar(scope["path"], VISUALIZACAO)
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
+
+
+# --- AGREGADOS DO PAINEL ---
+# Lê só a tabela diária (no máximo DIAS_PAINEL x páginas x eventos linhas, pela chave primária)
+async def resumo(db, paginas) -> dict:
+    hoje = datetime.now(timezone.utc).date()
+    inicio = hoje - timedelta(days=DIAS_PAINEL - 1)
+    linhas = (await db.execute(
+        select(models.AcessoDiario.dia, models.AcessoDiario.rota, models.AcessoDiario.evento,
+               func.sum(models.AcessoDiario.total))
+        .where(models.AcessoDiario.dia >= inicio)
+        .group_by(models.AcessoDiario.dia, models.AcessoDiario.rota, models.AcessoDiario.evento)
+    )).all()
+
+    janelas = {"hoje": hoje, "7 dias": hoje - timedelta(days=6), f"{DIAS_PAINEL} dias": inicio}
+    totais = {evento: dict.fromkeys(janelas, 0) for evento in (VISUALIZACAO, WHATSAPP)}
+    por_rota = {rota: {evento: dict.fromkeys(janelas, 0) for evento in (VISUALIZACAO, WHATSAPP)} for rota in paginas}
+    por_dia = {hoje - timedelta(days=i): {VISUALIZACAO: 0, WHATSAPP: 0} for i in range(13, -1, -1)}
+    for dia, rota, evento, total in linhas:
+        if evento not in totais:
+            continue
+        linha_rota = por_rota.setdefault(rota, {e: dict.fromkeys(janelas, 0) for e in (VISUALIZACAO, WHATSAPP)})
+        for nome, desde in janelas.items():
+            if dia >= desde:
+                totais[evento][nome] += total
+                linha_rota[evento][nome] += total
+        if dia in por_dia:
+            por_dia[dia][evento] += total
+
+    maximo = max((valores[VISUALIZACAO] for valores in por_dia.values()), default=0) or 1
+    return {
+        "janelas": list(janelas),
+        "totais": totais,
+        "por_rota": sorted(por_rota.items(), key=lambda item: -item[1][VISUALIZACAO][f"{DIAS_PAINEL} dias"]),
+        "por_dia": [(dia, valores, round(valores[VISUALIZACAO] / maximo * 100)) for dia, valores in por_dia.items()],
+        "intervalo": ESTATISTICAS_INTERVALO,
+    }
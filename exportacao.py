@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+import cache
+from compressao import comprimir, brotli, COMPRESSAO_BR_NIVEL_CACHE, COMPRESSAO_GZIP_NIVEL_CACHE
+from assets import codificacoes_aceitas
+from sitemap import CHAVES_PAGINA, paginas_publicas
+
+logger = logging.getLogger(__name__)
+
+# Diretório com o HTML exportado (servível também por um nginx/CDN, com try_files $uri $uri.html)
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "export")
+# Domínio usado na renderização: og:url, robots.txt e sitemap.xml levam URLs absolutas
+EXPORT_BASE_URL = os.environ.get("EXPORT_BASE_URL", "https://henrique.tec.br/")
+# Serve as páginas públicas direto dos arquivos exportados (o /admin continua dinâmico)
+EXPORT_SERVIR = os.environ.get("EXPORT_SERVIR", "False").lower() == "true"
+
+MANIFESTO = "manifest.json"
+# Marca no scope das requisições da própria exportação: elas precisam chegar às rotas, não aos arquivos
+ESCOPO_EXPORTACAO = "exportacao"
+# Extensão de cada variante pré-comprimida, como nos assets do build
+VARIANTES = (("br", ".br"), ("gzip", ".gz"))
+
+# Rotas fora do sitemap que também são estáticas entre edições, com as chaves de versão de que dependem
+ROTAS_EXTRAS = {
+    "/robots.txt": (),
+    "/sitemap.xml": (cache.LAYOUT, cache.PROJETOS),
+    "/404.html": (cache.LAYOUT,),  # Vira o 404 do export (o caminho pedido não existe de propósito)
+}
+
+
+def arquivo_da_rota(path: str) -> str:
+    if path == "/":
+        return "index.html"
+    nome = path.lstrip("/")
+    return nome if os.path.splitext(nome)[1] else nome + ".html"
+
+
+def gravar(destino: Path, dados: bytes):
+    # Grava num temporário e troca de uma vez: quem estiver servindo nunca lê um arquivo pela metade
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+    temporario.write_bytes(dados)
+    os.replace(temporario, destino)
+
+
+# --- EXPORTAÇÃO ESTÁTICA DAS PÁGINAS PÚBLICAS ---
+# Renderiza cada rota pública pelo próprio app (mesmos middlewares, caches e handlers) e grava o HTML com as
+# variantes .br/.gz. Depois da primeira exportação, cada invalidação do painel reexporta só as páginas que
+# dependem das chaves alteradas.
+class Exportador:
+    def __init__(self, app, destino: str = EXPORT_DIR, base_url: str = EXPORT_BASE_URL):
+        self.app = app
+        self.destino = Path(destino)
+        self.base_url = base_url.rstrip("/") + "/"
+        self._manifesto = None  # path -> entrada, como gravado em manifest.json
+        self._mtime = None
+        self._conferido_em = float("-inf")
+        self._lock = asyncio.Lock()
+        cache.versoes.ao_invalidar(self.atualizar)
+
+    def rotas(self) -> dict:
+        rotas = {path: CHAVES_PAGINA.get(path, (cache.LAYOUT,)) for path in paginas_publicas(self.app)}
+        return {**rotas, **ROTAS_EXTRAS}
+
+    async def _app_exportacao(self, scope, receive, send):
+        await self.app({**scope, ESCOPO_EXPORTACAO: True}, receive, send)
+
+    async def _baixar(self, cliente, path: str):
+        resposta = await cliente.get(path)
+        if resposta.status_code not in (200, 404):
+            raise RuntimeError(f"{path} respondeu {resposta.status_code}")
+        return resposta
+
+    def _gravar_pagina(self, path: str, resposta, chaves) -> dict:
+        arquivo = arquivo_da_rota(path)
+        destino = self.destino / arquivo
+        corpo = resposta.content
+        gravar(destino, corpo)
+        variantes = []
+        for codificacao, extensao in VARIANTES:
+            variante = destino.with_name(destino.name + extensao)
+            comprimido = None
+            if codificacao == "gzip" or brotli:
+                nivel = COMPRESSAO_BR_NIVEL_CACHE if codificacao == "br" else COMPRESSAO_GZIP_NIVEL_CACHE
+                comprimido = comprimir(corpo, codificacao, nivel)
+            # Só grava a variante se ela for realmente menor que o original (e apaga a de uma exportação anterior)
+            if comprimido is not None and len(comprimido) < len(corpo):
+                gravar(variante, comprimido)
+                variantes.append(codificacao)
+            elif variante.exists():
+                variante.unlink()
+        return {"arquivo": arquivo, "status": resposta.status_code, "tipo": resposta.headers["content-type"],
+                "etag": cache.gerar_etag(corpo), "variantes": variantes, "chaves": list(chaves)}
+
+    # Exporta as rotas pedidas (todas, se None) e regrava o manifesto. Devolve quantas páginas foram gravadas.
+    async def exportar(self, caminhos=None) -> int:
+        import httpx
+
+        rotas = self.rotas()
+        completa = caminhos is None
+        caminhos = list(rotas) if completa else [c for c in caminhos if c in rotas]
+        async with self._lock:
+            # Exportação parcial preserva as demais páginas do manifesto
+            manifesto = {} if completa else dict(self._ler_manifesto() or {})
+            transporte = httpx.ASGITransport(app=self._app_exportacao)
+            async with httpx.AsyncClient(transport=transporte, base_url=self.base_url,
+                                         headers={"Accept-Encoding": "identity"}) as cliente:
+                for path in caminhos:
+                    resposta = await self._baixar(cliente, path)
+                    manifesto[path] = await asyncio.to_thread(self._gravar_pagina, path, resposta, rotas[path])
+                    # Catálogo grande: o /sitemap.xml é um índice e as partes também são exportadas
+                    if path == "/sitemap.xml" and b"<sitemapindex" in resposta.content:
+                        parte = 1
+                        while (resposta := await cliente.get(f"/sitemap-{parte}.xml")).status_code == 200:
+                            manifesto[f"/sitemap-{parte}.xml"] = await asyncio.to_thread(
+                                self._gravar_pagina, f"/sitemap-{parte}.xml", resposta, rotas[path])
+                            parte += 1
+            gravar(self.destino / MANIFESTO, json.dumps(
+                {"base_url": self.base_url, "paginas": manifesto}, indent=2, ensure_ascii=False).encode("utf-8"))
+            self._manifesto = manifesto
+            self._mtime = (self.destino / MANIFESTO).stat().st_mtime
+        return len(caminhos)
+
+    # Ouvinte das invalidações: só age se já existe uma exportação neste diretório
+    async def atualizar(self, chaves_invalidadas: set):
+        manifesto = self._ler_manifesto()
+        if manifesto is None:
+            return
+        caminhos = [path for path, chaves in self.rotas().items() if not chaves_invalidadas.isdisjoint(chaves)]
+        if not caminhos:
+            return
+        inicio = time.perf_counter()
+        quantidade = await self.exportar(caminhos)
+        logger.info(f"[EXPORTACAO] {quantidade} páginas reexportadas em {(time.perf_counter() - inicio) * 1000:.0f} ms "
+                    f"({', '.join(sorted(chaves_invalidadas))}).")
+
+    # Manifesto em memória, relido quando outro worker/processo reexportar (conferido a cada CACHE_CHECK_INTERVAL)
+    def _ler_manifesto(self):
+        agora = time.monotonic()
+        if agora - self._conferido_em < cache.CACHE_CHECK_INTERVAL:
+            return self._manifesto
+        self._conferido_em = agora
+        caminho = self.destino / MANIFESTO
+        try:
+            mtime = caminho.stat().st_mtime
+            if mtime != self._mtime:
+                self._manifesto = json.loads(caminho.read_text(encoding="utf-8"))["paginas"]
+                self._mtime = mtime
+        except (FileNotFoundError, ValueError, KeyError):
+            self._manifesto, self._mtime = None, None
+        return self._manifesto
+
+    def entrada(self, path: str):
+        manifesto = self._ler_manifesto()
+        return manifesto.get(path) if manifesto else None
+
+
+# --- SERVIR DIRETO DOS ARQUIVOS EXPORTADOS (MIDDLEWARE ASGI) ---
+# Páginas públicas saem do disco via FileResponse (sendfile/pathsend quando o servidor ASGI oferece), sem
+# FastAPI, SQLAlchemy nem Jinja2. O /admin, usuários logados, query strings e tudo que não foi exportado
+# (/static, /projetos, /busca, /healthz...) seguem para o app.
+class ServirExportacao:
+    def __init__(self, app, exportador: Exportador, ativo: bool = EXPORT_SERVIR):
+        self.app = app
+        self.exportador = exportador
+        self.ativo = ativo
+
+    async def __call__(self, scope, receive, send):
+        if (not self.ativo or scope["type"] != "http" or scope.get(ESCOPO_EXPORTACAO)
+                or scope["method"] not in ("GET", "HEAD") or scope["path"].startswith("/admin")
+                or scope.get("query_string")):
+            return await self.app(scope, receive, send)
+        entrada = self.exportador.entrada(scope["path"])
+        request = Request(scope)
+        if entrada is None or request.cookies.get("session_token"):
+            return await self.app(scope, receive, send)
+
+        # Mesmo ETag (fraco) para todas as variantes, como no middleware de compressão
+        cabecalhos = {"ETag": "W/" + entrada["etag"], "Cache-Control": "no-cache"}
+        if entrada["variantes"]:
+            cabecalhos["Vary"] = "Accept-Encoding"
+        if entrada["status"] == 200 and cache.etag_confere(request, entrada["etag"]):
+            return await Response(status_code=304, headers=cabecalhos)(scope, receive, send)
+
+        arquivo = self.exportador.destino / entrada["arquivo"]
+        aceitas = codificacoes_aceitas(request.headers.get("accept-encoding", ""))
+        for codificacao, extensao in VARIANTES:
+            if codificacao in entrada["variantes"] and codificacao in aceitas:
+                arquivo = arquivo.with_name(arquivo.name + extensao)
+                cabecalhos["Content-Encoding"] = codificacao
+                break
+        resposta = FileResponse(arquivo, status_code=entrada["status"], media_type=entrada["tipo"], headers=cabecalhos)
+        await resposta(scope, receive, send)
+
+
+# --- EXPORTAÇÃO PELA LINHA DE COMANDO ---
+async def _exportar_cli():
+    from app import app, estado_inicializacao, exportador
+
+    async with app.router.lifespan_context(app):
+        await estado_inicializacao.concluida.wait()
+        if not estado_inicializacao.pronto.is_set():
+            print(f">_ [ERRO] Inicialização falhou: {estado_inicializacao.erro}")
+            return 1
+        inicio = time.perf_counter()
+        quantidade = await exportador.exportar()
+        print(f">_ [SUCESSO] {quantidade} páginas exportadas em {exportador.destino} "
+              f"({(time.perf_counter() - inicio) * 1000:.0f} ms, base {exportador.base_url})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_exportar_cli()))
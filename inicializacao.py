@@ -0,0 +1,187 @@
+import os
+import time
+import hashlib
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+from sqlalchemy import text, inspect, select, insert, update
+from sqlalchemy.exc import DBAPIError
+from starlette.responses import PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+# Espera pelo banco com backoff exponencial (com jitter para réplicas não baterem juntas)
+DB_STARTUP_TIMEOUT = float(os.environ.get("DB_STARTUP_TIMEOUT", "180"))
+DB_BACKOFF_INICIAL = float(os.environ.get("DB_BACKOFF_INICIAL", "0.25"))
+DB_BACKOFF_MAX = float(os.environ.get("DB_BACKOFF_MAX", "5"))
+# Quanto tempo o schema/seed pode esperar pela trava enquanto outra réplica o executa
+DB_LOCK_TIMEOUT = int(os.environ.get("DB_LOCK_TIMEOUT", "120"))
+# Quanto tempo uma requisição que chega durante a inicialização espera antes de receber 503
+STARTUP_WAIT = float(os.environ.get("STARTUP_WAIT", "30"))
+
+NOME_TRAVA = "henriquetec_schema"
+# Tabela do marcador (models.EstadoSchema): a assinatura do schema já aplicado por alguma réplica
+TABELA_MARCADOR = "estado_schema"
+
+
+class InicializacaoFalhou(Exception):
+    pass
+
+
+# --- ESTADO DA INICIALIZAÇÃO (CONSULTADO PELO /healthz E /readyz) ---
+class EstadoInicializacao:
+    def __init__(self):
+        self.pronto = asyncio.Event()
+        self.concluida = asyncio.Event()  # Marcada com sucesso ou com erro
+        self.erro = None
+        self.duracao = None
+
+
+async def aguardar_banco(engine, timeout: float = DB_STARTUP_TIMEOUT):
+    limite = time.monotonic() + timeout
+    espera = DB_BACKOFF_INICIAL
+    tentativa = 0
+    while True:
+        tentativa += 1
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            logger.info(f"[OK] Conexão com o banco de dados estabelecida (tentativa {tentativa}).")
+            return
+        except Exception as e:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise InicializacaoFalhou(f"banco indisponível após {tentativa} tentativas: {e}") from e
+            atraso = min(espera, restante) * random.uniform(0.5, 1.0)
+            logger.warning(f"[AGUARDANDO] Banco de dados iniciando. Retentando em {atraso:.1f}s... Motivo: {e}")
+            await asyncio.sleep(atraso)
+            espera = min(espera * 2, DB_BACKOFF_MAX)
+
+
+# Trava consultiva no banco: só uma réplica por vez roda o schema/seed.
+# No MySQL usa GET_LOCK (liberado sozinho se a conexão cair); em outros bancos não há concorrência a proteger.
+@asynccontextmanager
+async def trava_global(conn, nome: str = NOME_TRAVA, timeout: int = DB_LOCK_TIMEOUT):
+    if conn.dialect.name != "mysql":
+        yield
+        return
+    obtida = (await conn.execute(text("SELECT GET_LOCK(:nome, :timeout)"), {"nome": nome, "timeout": timeout})).scalar()
+    if obtida != 1:
+        raise InicializacaoFalhou(f"não foi possível obter a trava '{nome}' em {timeout}s")
+    try:
+        yield
+    finally:
+        await conn.execute(text("SELECT RELEASE_LOCK(:nome)"), {"nome": nome})
+
+
+# create_all não mexe em tabelas que já existem: índices novos declarados nos modelos
+# (ex: index=True numa coluna antiga) são criados aqui
+def criar_indices_faltantes(conn, metadata):
+    inspetor = inspect(conn)
+    for tabela in metadata.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            continue
+        existentes = {indice["name"] for indice in inspetor.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name not in existentes:
+                logger.info(f"[SCHEMA] Criando índice {indice.name} em {tabela.name}...")
+                indice.create(conn)
+
+
+# --- MARCADOR DO SCHEMA (EXECUÇÃO ÚNICA ENTRE RÉPLICAS) ---
+# Hash das tabelas, colunas e índices declarados nos modelos: muda quando o deploy traz schema novo
+def assinatura_schema(metadata) -> str:
+    partes = []
+    for tabela in metadata.sorted_tables:
+        partes.append(f"T {tabela.name}")
+        for coluna in tabela.columns:
+            partes.append(f"C {coluna.name} {coluna.type!r} {coluna.nullable} {coluna.primary_key}")
+        for indice in sorted(tabela.indexes, key=lambda i: i.name or ""):
+            partes.append(f"I {indice.name} {[c.name for c in indice.columns]} {indice.unique}")
+    return hashlib.sha256("\n".join(partes).encode("utf-8")).hexdigest()
+
+
+async def ler_marcador(conn, metadata):
+    tabela = metadata.tables[TABELA_MARCADOR]
+    try:
+        return (await conn.execute(select(tabela.c.assinatura).where(tabela.c.nome == "schema"))).scalar()
+    except DBAPIError:
+        # Banco novo (ou anterior ao marcador): a tabela ainda não existe
+        await conn.rollback()
+        return None
+
+
+async def gravar_marcador(conn, metadata, assinatura: str):
+    tabela = metadata.tables[TABELA_MARCADOR]
+    valores = {"assinatura": assinatura, "atualizado_em": datetime.utcnow()}
+    # Sob a trava global: não há outra réplica gravando ao mesmo tempo
+    if not (await conn.execute(update(tabela).where(tabela.c.nome == "schema").values(valores))).rowcount:
+        await conn.execute(insert(tabela).values(nome="schema", **valores))
+
+
+# Schema e seed rodam uma vez por versão do schema: a primeira réplica aplica sob a trava e grava o marcador;
+# as demais leem o marcador, sem trava nem create_all, e só conferem o seed (`seed_em_dia`, somente leitura,
+# em paralelo). Se o seed estiver desatualizado (ex: ADMIN_PASSWORD trocado), `semear` roda sob a trava.
+# `aquecer`: corrotinas rodadas fora da trava antes de liberar o tráfego (ex: índice de busca).
+# Uma falha nelas só gera aviso: são caches que também se constroem sob demanda.
+async def inicializar(engine, metadata, semear, estado: EstadoInicializacao, aquecer=(), seed_em_dia=None):
+    inicio = time.perf_counter()
+    try:
+        await aguardar_banco(engine)
+        assinatura = assinatura_schema(metadata)
+        async with engine.connect() as conn:
+            schema_em_dia = await ler_marcador(conn, metadata) == assinatura
+            await conn.rollback()
+        if schema_em_dia and seed_em_dia is not None and await seed_em_dia():
+            logger.info("[OK] Schema e seed já aplicados (marcador em dia): pulando a trava.")
+        else:
+            async with engine.connect() as conn:
+                async with trava_global(conn):
+                    # Outra réplica pode ter aplicado o schema enquanto esta esperava a trava
+                    if await ler_marcador(conn, metadata) != assinatura:
+                        await conn.run_sync(metadata.create_all)
+                        await conn.run_sync(criar_indices_faltantes, metadata)
+                        await gravar_marcador(conn, metadata, assinatura)
+                        await conn.commit()
+                        logger.info(f"[SCHEMA] Schema aplicado (assinatura {assinatura[:12]}).")
+                    else:
+                        await conn.rollback()
+                    await semear()
+        for tarefa in aquecer:
+            try:
+                await tarefa()
+            except Exception as e:
+                logger.warning(f"[AVISO] Aquecimento {tarefa.__qualname__} falhou (será refeito sob demanda): {e}")
+        estado.duracao = time.perf_counter() - inicio
+        estado.pronto.set()
+        logger.info(f"[OK] Aplicação pronta em {estado.duracao:.2f}s.")
+    except Exception as e:
+        estado.erro = str(e)
+        logger.error(f"[ERRO FATAL] Falha na inicialização: {e}")
+    finally:
+        estado.concluida.set()
+
+
+# --- SEGURA REQUISIÇÕES ATÉ O APP FICAR PRONTO ---
+# As rotas de saúde respondem desde o primeiro instante; as demais esperam a inicialização
+# (até STARTUP_WAIT segundos) em vez de falharem por falta de tabela ou de seed
+class AguardarInicializacao:
+    def __init__(self, app, estado: EstadoInicializacao, liberados=("/healthz", "/readyz", "/metrics")):
+        self.app = app
+        self.estado = estado
+        self.liberados = set(liberados)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.estado.pronto.is_set() or scope["path"] in self.liberados:
+            return await self.app(scope, receive, send)
+        try:
+            await asyncio.wait_for(self.estado.concluida.wait(), STARTUP_WAIT)
+        except asyncio.TimeoutError:
+            pass
+        if self.estado.pronto.is_set():
+            return await self.app(scope, receive, send)
+        resposta = PlainTextResponse("Serviço iniciando. Tente novamente em instantes.", status_code=503,
+                                     headers={"Retry-After": "5"})
+        await resposta(scope, receive, send)
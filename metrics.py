@@ -0,0 +1,307 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+import jinja2
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Requisições acima deste tempo são logadas com a lista de queries executadas
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "500"))
+# Limite de queries guardadas por requisição (só para o log de lentidão; a contagem não tem limite)
+SLOW_REQUEST_MAX_QUERIES = int(os.environ.get("SLOW_REQUEST_MAX_QUERIES", "100"))
+# Tempo por bloco ({% block %}) e por corpo de template (inclusive includes e o base.html dos extends).
+# Desligado por padrão: embrulha todo bloco de todo render e multiplica as séries do /metrics; ligue ao perfilar.
+TEMPLATE_PERFIL_BLOCOS = os.environ.get("TEMPLATE_PERFIL_BLOCOS", "False").lower() == "true"
+
+BUCKETS_TEMPO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(nomes, valores) -> str:
+    if not nomes:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)) + "}"
+
+
+# --- TIPOS DE MÉTRICA (FORMATO TEXTO DO PROMETHEUS) ---
+class Histograma:
+    def __init__(self, nome: str, descricao: str, rotulos=(), buckets=BUCKETS_TEMPO):
+        self.nome, self.descricao, self.rotulos, self.buckets = nome, descricao, tuple(rotulos), tuple(buckets)
+        self._series = {}  # valores dos rótulos -> [contagem por bucket..., +Inf, soma]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *rotulos):
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[i] += 1
+                    break
+            else:
+                serie[len(self.buckets)] += 1
+            serie[-1] += valor
+
+    def exportar(self):
+        yield f"# HELP {self.nome} {self.descricao}"
+        yield f"# TYPE {self.nome} histogram"
+        with self._lock:
+            series = [(r, list(s)) for r, s in self._series.items()]
+        for valores, serie in series:
+            acumulado = 0
+            for limite, quantidade in zip([*map(str, self.buckets), "+Inf"], serie):
+                acumulado += quantidade
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), valores + (limite,))} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, valores)} {serie[-1]}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, valores)} {acumulado}"
+
+    # {rótulos: (contagem, soma)}: para relatórios fora do formato do Prometheus (ex: benchmarks)
+    def resumo(self) -> dict:
+        with self._lock:
+            return {rotulos: (sum(serie[:-1]), serie[-1]) for rotulos, serie in self._series.items()}
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome: str, descricao: str, rotulos=()):
+        self.nome, self.descricao, self.rotulos = nome, descricao, tuple(rotulos)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def somar(self, valor: float = 1, *rotulos):
+        with self._lock:
+            self._series[rotulos] = self._series.get(rotulos, 0) + valor
+
+    # Para valores mantidos por outro componente e copiados na coleta (ex: pool do bcrypt)
+    def definir(self, valor: float, *rotulos):
+        with self._lock:
+            self._series[rotulos] = valor
+
+    def exportar(self):
+        yield f"# HELP {self.nome} {self.descricao}"
+        yield f"# TYPE {self.nome} {self.tipo}"
+        with self._lock:
+            series = list(self._series.items())
+        for valores, total in series:
+            yield f"{self.nome}{_rotulos(self.rotulos, valores)} {total}"
+
+
+class Medidor(Contador):
+    tipo = "gauge"
+
+
+# --- REGISTRO GLOBAL ---
+class Registro:
+    def __init__(self):
+        self.metricas = []
+        # Funções chamadas a cada coleta para atualizar medidores (pools, bcrypt...)
+        self.coletores = []
+
+    def adicionar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+
+    def coletor(self, funcao):
+        self.coletores.append(funcao)
+        return funcao
+
+    def exportar(self) -> str:
+        for funcao in self.coletores:
+            try:
+                funcao()
+            except Exception as e:
+                logger.warning(f"[METRICS] Falha no coletor {funcao.__name__}: {e}")
+        linhas = []
+        for metrica in self.metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+requisicoes_duracao = registro.adicionar(Histograma(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota.", ("method", "route", "status")))
+requisicoes_em_andamento = registro.adicionar(Medidor(
+    "http_requests_in_progress", "Requisições HTTP sendo atendidas agora."))
+requisicoes_queries = registro.adicionar(Histograma(
+    "http_request_db_queries", "Queries SQL executadas por requisição.", ("route",), BUCKETS_QUERIES))
+requisicoes_tempo_db = registro.adicionar(Histograma(
+    "http_request_db_seconds", "Tempo total em SQL por requisição.", ("route",)))
+requisicoes_tempo_template = registro.adicionar(Histograma(
+    "http_request_template_seconds", "Tempo total renderizando templates por requisição.", ("route",)))
+requisicoes_lentas = registro.adicionar(Contador(
+    "http_slow_requests_total", f"Requisições acima de {SLOW_REQUEST_MS:.0f} ms.", ("route",)))
+render_duracao = registro.adicionar(Histograma(
+    "template_render_seconds", "Tempo de renderização por template.", ("template",)))
+blocos_duracao = registro.adicionar(Histograma(
+    "template_block_render_seconds", "Tempo de renderização por bloco de template (inclusivo).", ("template", "block"),
+    (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)))
+queries_total = registro.adicionar(Contador(
+    "db_queries_total", "Queries SQL executadas (inclusive fora de requisições).", ("engine",)))
+queries_duracao = registro.adicionar(Histograma(
+    "db_query_duration_seconds", "Duração de cada query SQL.", ("engine",)))
+checkout_duracao = registro.adicionar(Histograma(
+    "db_pool_checkout_seconds", "Espera para obter uma conexão do pool.", ("engine",)))
+pool_em_uso = registro.adicionar(Medidor(
+    "db_pool_checked_out", "Conexões do pool em uso.", ("engine",)))
+pool_tamanho = registro.adicionar(Medidor(
+    "db_pool_size", "Tamanho configurado do pool.", ("engine",)))
+pool_overflow = registro.adicionar(Medidor(
+    "db_pool_overflow", "Conexões abertas além do pool_size.", ("engine",)))
+
+
+# --- MEDIÇÃO DA REQUISIÇÃO ATUAL ---
+# Guardada num contextvar: as queries rodam no greenlet do SQLAlchemy, que herda o contexto da task
+class MedicaoRequisicao:
+    __slots__ = ("queries", "total_queries", "tempo_db", "tempo_template")
+
+    def __init__(self):
+        self.queries = []
+        self.total_queries = 0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+
+
+_medicao_atual = contextvars.ContextVar("medicao_requisicao", default=None)
+
+
+# --- HOOKS DO SQLALCHEMY ---
+def instrumentar_engine(engine, nome: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info["metrics_inicio"].pop()
+        queries_total.somar(1, nome)
+        queries_duracao.observar(duracao, nome)
+        medicao = _medicao_atual.get()
+        if medicao is not None:
+            medicao.total_queries += 1
+            medicao.tempo_db += duracao
+            if len(medicao.queries) < SLOW_REQUEST_MAX_QUERIES:
+                medicao.queries.append((statement, duracao))
+
+    @registro.coletor
+    def ocupacao_pool():
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            pool_em_uso.definir(pool.checkedout(), nome)
+            pool_tamanho.definir(pool.size(), nome)
+            pool_overflow.definir(max(pool.overflow(), 0), nome)
+
+
+# Pool que mede quanto cada checkout esperou (fila cheia ou abertura de conexão nova)
+class PoolMedido(AsyncAdaptedQueuePool):
+    nome_metrica = "async"
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            checkout_duracao.observar(time.perf_counter() - inicio, self.nome_metrica)
+
+
+# --- TEMPO DE RENDERIZAÇÃO DOS TEMPLATES ---
+# As funções de bloco do Jinja são geradores: o tempo vai do primeiro pedaço ao último, incluindo
+# blocos aninhados e includes chamados dentro deles
+def _medir_bloco(template: str, bloco: str, funcao):
+    def medido(context):
+        inicio = time.perf_counter()
+        try:
+            yield from funcao(context)
+        finally:
+            blocos_duracao.observar(time.perf_counter() - inicio, template, bloco)
+    return medido
+
+
+# Usada como template_class do Environment: mede tanto TemplateResponse quanto o cache de páginas
+class TemplateMedido(jinja2.Template):
+    # Ponto em que o Jinja monta o Template a partir do código compilado (ou do bytecode em cache):
+    # embrulha cada bloco e o corpo do template ("(raiz)", usado também por includes e extends)
+    @classmethod
+    def _from_namespace(cls, environment, namespace, globals):
+        template = super()._from_namespace(environment, namespace, globals)
+        if TEMPLATE_PERFIL_BLOCOS:
+            nome = template.name or "<string>"
+            template.blocks = {bloco: _medir_bloco(nome, bloco, funcao) for bloco, funcao in template.blocks.items()}
+            template.root_render_func = _medir_bloco(nome, "(raiz)", template.root_render_func)
+        return template
+
+    def render(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            duracao = time.perf_counter() - inicio
+            render_duracao.observar(duracao, self.name or "<string>")
+            medicao = _medicao_atual.get()
+            if medicao is not None:
+                medicao.tempo_template += duracao
+
+
+# --- MIDDLEWARE ASGI ---
+class MiddlewareMetricas:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        medicao = MedicaoRequisicao()
+        token = _medicao_atual.set(medicao)
+        status_code = 500
+
+        async def enviar(mensagem):
+            nonlocal status_code
+            if mensagem["type"] == "http.response.start":
+                status_code = mensagem["status"]
+            await send(mensagem)
+
+        requisicoes_em_andamento.somar(1)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            requisicoes_em_andamento.somar(-1)
+            _medicao_atual.reset(token)
+            # Rótulo pelo molde da rota (/admin/projetos/edit/{projeto_id}), nunca pela URL crua
+            rota = scope.get("route")
+            if rota is not None:
+                nome_rota = rota.path
+            elif scope["path"].startswith("/static/"):
+                nome_rota = "/static"
+            else:
+                nome_rota = "<sem_rota>"
+            requisicoes_duracao.observar(duracao, scope["method"], nome_rota, str(status_code))
+            requisicoes_queries.observar(medicao.total_queries, nome_rota)
+            requisicoes_tempo_db.observar(medicao.tempo_db, nome_rota)
+            requisicoes_tempo_template.observar(medicao.tempo_template, nome_rota)
+            if duracao * 1000 >= SLOW_REQUEST_MS:
+                self._registrar_lenta(scope, nome_rota, status_code, duracao, medicao)
+
+    @staticmethod
+    def _registrar_lenta(scope, nome_rota, status_code, duracao, medicao):
+        requisicoes_lentas.somar(1, nome_rota)
+        linhas = [f"[LENTA] {scope['method']} {scope['path']} ({nome_rota}) -> {status_code} em {duracao * 1000:.0f} ms: "
+                  f"{medicao.total_queries} queries / {medicao.tempo_db * 1000:.0f} ms em SQL, "
+                  f"{medicao.tempo_template * 1000:.0f} ms em templates"]
+        for statement, tempo in medicao.queries:
+            linhas.append(f"    {tempo * 1000:8.2f} ms  {' '.join(statement.split())[:300]}")
+        if medicao.total_queries > len(medicao.queries):
+            linhas.append(f"    ... e mais {medicao.total_queries - len(medicao.queries)} queries")
+        logger.warning("\n".join(linhas))
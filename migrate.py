@@ -1,8 +1,13 @@
 import os
 import re
-from sqlalchemy import create_engine, text
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from sqlalchemy import create_engine, text, insert
 from sqlalchemy.orm import sessionmaker
 import models
+import cache
 
 # 1. Configuração da Conexão (Lendo as variáveis do Docker)
 DB_USER = os.getenv("DB_USER", "henrique")
@@ -11,78 +16,148 @@ DB_HOST = os.getenv("DB_HOST", "db")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "henriquetec")
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = os.getenv("DB_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Banco de origem do WordPress (por padrão, o mesmo banco do site)
+WP_DB_URL = os.getenv("WP_DB_URL") or SQLALCHEMY_DATABASE_URL
 
-# >>> ADICIONE ESTA LINHA <<<
-# Ela instrui o MySQL a criar a tabela com base no models.py, caso ela não exista
-models.Base.metadata.create_all(bind=engine)
+# Nome do checkpoint na tabela migracao_checkpoints
+CHECKPOINT = "wordpress"
+
+# Tamanhos máximos vindos do próprio modelo (evita estourar as colunas no MySQL em modo estrito)
+LIMITE_TITULO = models.Projeto.titulo.type.length
+LIMITE_DESCRICAO = models.Projeto.descricao.type.length
+
+# Regex pré-compiladas: comentários do Gutenberg (<!-- wp:... -->) e shortcodes somem;
+# tags HTML e qualquer sequência de espaços viram um único espaço numa só passada
+RE_REMOVER = re.compile(r'<!--.*?-->|\[[^\]]*\]', re.S)
+RE_ESPACOS = re.compile(r'(?:<[^>]*>|\s)+')
 
 def limpar_texto_wp(texto_bruto):
     if not texto_bruto:
         return ""
-    # Remove blocos de comentário do editor Gutenberg do WP (ex: )
-    texto = re.sub(r'', '', texto_bruto)
-    # Remove shortcodes antigos
-    texto = re.sub(r'\[.*?\]', '', texto)
-    # Remove tags HTML padrão
-    texto = re.sub(r'<.*?>', ' ', texto)
-    # Remove excesso de espaços em branco e quebras de linha
-    texto = re.sub(r'\s+', ' ', texto)
-    return texto.strip()
-
-def migrar_dados():
+    texto = RE_REMOVER.sub('', texto_bruto)
+    return RE_ESPACOS.sub(' ', texto).strip()
+
+def resumir(texto, limite):
+    return texto if len(texto) <= limite else texto[:limite - 3].rstrip() + "..."
+
+# Roda nos processos do pool: recebe linhas (ID, título, conteúdo, tipo) e devolve registros prontos
+def preparar_lote(linhas):
+    registros = []
+    for _, titulo, conteudo_completo, tipo in linhas:
+        descricao_limpa = limpar_texto_wp(conteudo_completo)
+        # Ignora registos vazios
+        if not titulo or not descricao_limpa:
+            continue
+        registros.append({
+            "titulo": resumir(titulo.strip(), LIMITE_TITULO),
+            "descricao": resumir(descricao_limpa, LIMITE_DESCRICAO),
+            # Classifica com base no tipo de postagem do WordPress
+            "categoria": "Artigo" if tipo == 'post' else "Serviço",
+            "link_projeto": None,
+            "link_github": None,
+        })
+    return registros
+
+def ler_checkpoint(db):
+    checkpoint = db.get(models.MigracaoCheckpoint, CHECKPOINT)
+    if not checkpoint:
+        checkpoint = models.MigracaoCheckpoint(nome=CHECKPOINT, ultimo_id=0, registros=0)
+        db.add(checkpoint)
+        db.commit()
+    return checkpoint
+
+# Incrementa a versão dos projetos para os workers do site descartarem o cache da página inicial
+def invalidar_cache_projetos(db):
+    db.execute(cache.consulta_incremento(db.bind.dialect.name, cache.PROJETOS))
+    db.commit()
+
+def migrar_dados(lote=500, workers=None, reiniciar=False):
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    origem = create_engine(WP_DB_URL) if WP_DB_URL != SQLALCHEMY_DATABASE_URL else engine
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # Ela instrui o MySQL a criar as tabelas com base no models.py, caso não existam
+    models.Base.metadata.create_all(bind=engine)
+
     db = SessionLocal()
     try:
-        # 2. Busca posts e páginas publicados da tabela antiga do WP
+        checkpoint = ler_checkpoint(db)
+        if reiniciar:
+            print(">_ [AVISO] Checkpoint zerado: posts já migrados serão inseridos novamente.")
+            checkpoint.ultimo_id, checkpoint.registros = 0, 0
+            db.commit()
+        print(f">_ Retomando a partir do ID {checkpoint.ultimo_id} ({checkpoint.registros} registros já migrados).")
+
+        # 2. Busca posts e páginas publicados da tabela antiga do WP, em ordem de ID para permitir retomar
         query = text("""
-            SELECT post_title, post_content, post_type 
-            FROM wp_posts 
-            WHERE post_status = 'publish' 
+            SELECT ID, post_title, post_content, post_type
+            FROM wp_posts
+            WHERE post_status = 'publish'
             AND post_type IN ('post', 'page')
+            AND ID > :ultimo_id
+            ORDER BY ID
         """)
-        
-        resultados = db.execute(query)
-        
-        contador = 0
-        for linha in resultados:
-            titulo = linha[0]
-            conteudo_completo = linha[1]
-            tipo = linha[2]
-            
-            # Limpa e sanitiza o texto do banco de dados antigo
-            descricao_limpa = limpar_texto_wp(conteudo_completo)
-            
-            # Ignora registos vazios
-            if not titulo or not descricao_limpa:
-                continue
-                
-            # Classifica com base no tipo de postagem do WordPress
-            categoria = "Artigo" if tipo == 'post' else "Serviço"
-            
-            # 3. Formata a string para não quebrar o design (ex: pega os primeiros 200 caracteres)
-            descricao_resumida = descricao_limpa if len(descricao_limpa) < 200 else descricao_limpa[:200] + "..."
-            
-            # 4. Insere no novo modelo SQLAlchemy
-            novo_registro = models.Projeto(
-                titulo=titulo,
-                descricao=descricao_resumida,
-                categoria=categoria,
-                link="#"
-            )
-            
-            db.add(novo_registro)
-            contador += 1
-            
-        db.commit()
-        print(f"\\n>_ [SUCESSO] {contador} registos foram migrados do WordPress para o novo formato!")
-        
+
+        inicio = time.perf_counter()
+        lidos = inseridos = 0
+        workers = workers or os.cpu_count() or 1
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        pendentes = deque()  # (maior ID do lote, future ou registros) em ordem de leitura
+
+        def gravar(ultimo_id, registros):
+            nonlocal inseridos
+            # 3. Insere o lote e avança o checkpoint na MESMA transação: reexecutar nunca duplica registros
+            if registros:
+                db.execute(insert(models.Projeto), registros)
+            checkpoint.ultimo_id = ultimo_id
+            checkpoint.registros += len(registros)
+            db.commit()
+            inseridos += len(registros)
+            decorrido = time.perf_counter() - inicio
+            print(f">_ ID {ultimo_id}: {lidos} lidos, {inseridos} inseridos ({lidos / decorrido:.0f} linhas/s)")
+
+        def esvaziar(ate):
+            while len(pendentes) > ate:
+                ultimo_id, trabalho = pendentes.popleft()
+                gravar(ultimo_id, trabalho.result() if pool else trabalho)
+
+        try:
+            # stream_results usa cursor no servidor: o MySQL não entrega a tabela inteira de uma vez
+            with origem.connect().execution_options(stream_results=True, yield_per=lote) as conn:
+                resultado = conn.execute(query, {"ultimo_id": checkpoint.ultimo_id})
+                for linhas in resultado.partitions(lote):
+                    linhas = [tuple(linha) for linha in linhas]
+                    lidos += len(linhas)
+                    trabalho = pool.submit(preparar_lote, linhas) if pool else preparar_lote(linhas)
+                    pendentes.append((linhas[-1][0], trabalho))
+                    # Limita os lotes em voo para a memória não crescer com o tamanho do dump
+                    esvaziar(workers * 2)
+                esvaziar(0)
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        if inseridos:
+            invalidar_cache_projetos(db)
+        decorrido = time.perf_counter() - inicio
+        taxa = lidos / decorrido if decorrido else 0
+        print(f"\n>_ [SUCESSO] {inseridos} registos foram migrados do WordPress para o novo formato! "
+              f"({lidos} lidos em {decorrido:.1f}s, {taxa:.0f} linhas/s)")
+
     except Exception as e:
-        print(f"\\n>_ [ERRO] Ocorreu uma falha na migração: {e}")
+        db.rollback()
+        print(f"\n>_ [ERRO] Ocorreu uma falha na migração: {e}")
+        print(">_ Os lotes já gravados ficam salvos; rode novamente para continuar de onde parou.")
     finally:
         db.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra posts e páginas publicados do WordPress para a tabela de projetos.")
+    parser.add_argument("--lote", type=int, default=int(os.getenv("MIGRACAO_LOTE", "500")), help="linhas por lote (padrão: 500)")
+    parser.add_argument("--workers", type=int, default=None, help="processos para limpar o texto (padrão: nº de CPUs)")
+    parser.add_argument("--reiniciar", action="store_true", help="ignora o checkpoint e migra tudo desde o início")
+    args = parser.parse_args()
+
     print(">_ Iniciando protocolo de migração de dados...")
-    migrar_dados()
\ No newline at end of file
+    migrar_dados(lote=args.lote, workers=args.workers, reiniciar=args.reiniciar)
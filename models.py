@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Float
 from database import Base
 
 class Projeto(Base):
@@ -6,7 +7,7 @@ class Projeto(Base):
     id = Column(Integer, primary_key=True, index=True)
     titulo = Column(String(60), index=True) 
     descricao = Column(String(160)) 
-    categoria = Column(String(50))
+    categoria = Column(String(50), index=True)          # Filtro/ordenação do painel e da API pública
     link_projeto = Column(String(255), nullable=True)
     link_github = Column(String(255), nullable=True)
 
@@ -31,4 +32,49 @@ class WhatsappConfig(Base):
     __tablename__ = "whatsapp_config"
     id = Column(Integer, primary_key=True, index=True)
     numero = Column(String(50))
-    mensagem = Column(String(255))
\ No newline at end of file
+    mensagem = Column(String(255))
+
+class CacheVersao(Base):
+    __tablename__ = "cache_versoes"
+    chave = Column(String(50), primary_key=True)            # Ex: "layout", "projetos"
+    versao = Column(Integer, default=0, nullable=False)    # Incrementado a cada edição no painel
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Sessao(Base):
+    __tablename__ = "sessoes"
+    token_hash = Column(String(64), primary_key=True)   # SHA-256 do token do cookie (o token em si nunca é gravado)
+    tipo = Column(String(20))                           # "sessao", "confianca" (dispositivo confiável) ou "pre_auth"
+    usuario_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), index=True)
+    expira_em = Column(DateTime, index=True)
+
+class EstadoSchema(Base):
+    __tablename__ = "estado_schema"
+    nome = Column(String(50), primary_key=True)         # "schema"
+    assinatura = Column(String(64), nullable=False)     # Hash das tabelas/colunas/índices dos modelos já aplicados
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MigracaoCheckpoint(Base):
+    __tablename__ = "migracao_checkpoints"
+    nome = Column(String(50), primary_key=True)         # Ex: "wordpress"
+    ultimo_id = Column(Integer, default=0)              # Maior ID de origem já gravado
+    registros = Column(Integer, default=0)              # Total de registros inseridos até agora
+    atualizado_em = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Contadores do limitador de tentativas (login/2FA) quando RATE_LIMIT_BACKEND=db
+class LimiteTentativa(Base):
+    __tablename__ = "limites_tentativas"
+    chave = Column(String(120), primary_key=True)          # "<limitador>:<ip ou usuário>"
+    inicio_janela = Column(Float, nullable=False, default=0)
+    atual = Column(Integer, nullable=False, default=0)
+    anterior = Column(Integer, nullable=False, default=0)
+    bloqueado_ate = Column(Float, nullable=False, default=0)
+    nivel = Column(Integer, nullable=False, default=0)
+
+# Acessos já agregados por dia (UTC): visualizações das páginas públicas e cliques no WhatsApp por página de
+# origem. Somados em memória e gravados em lote pelo estatisticas.py; não há tabela de eventos brutos
+class AcessoDiario(Base):
+    __tablename__ = "acessos_diarios"
+    dia = Column(Date, primary_key=True)
+    rota = Column(String(100), primary_key=True)        # Ex: "/", "/servicos/linux" ou "<outra>"
+    evento = Column(String(20), primary_key=True)       # "visualizacao" ou "whatsapp"
+    total = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,79 @@
+import json
+import base64
+import binascii
+from sqlalchemy import and_, or_
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+class Pagina:
+    __slots__ = ("itens", "proximo")
+
+    def __init__(self, itens, proximo):
+        self.itens = itens
+        self.proximo = proximo  # Cursor da próxima página (None na última)
+
+
+# Cursor opaco: [valor da coluna de ordenação, id] do último item entregue
+def codificar_cursor(valor, id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([valor, id]).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    if not cursor:
+        return None
+    try:
+        valor, id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return valor, int(id)
+    except (ValueError, TypeError, binascii.Error):
+        # Cursor adulterado ou de outra ordenação: recomeça da primeira página
+        return None
+
+
+def limitar(limite) -> int:
+    return max(1, min(int(limite or LIMITE_PADRAO), LIMITE_MAXIMO))
+
+
+# Condição "vem depois de (valor, id)" na ordem (coluna, id). NULL vem primeiro na ordem crescente
+# (MySQL e SQLite) e por último na decrescente, então precisa de tratamento próprio.
+def _depois_de(coluna, coluna_id, valor, id, descendente: bool):
+    if coluna is coluna_id:
+        return coluna_id < id if descendente else coluna_id > id
+    if descendente:
+        if valor is None:
+            return and_(coluna.is_(None), coluna_id < id)
+        return or_(coluna < valor, and_(coluna == valor, coluna_id < id), coluna.is_(None))
+    if valor is None:
+        return or_(and_(coluna.is_(None), coluna_id > id), coluna.isnot(None))
+    return or_(coluna > valor, and_(coluna == valor, coluna_id > id))
+
+
+# --- PAGINAÇÃO POR CHAVE (KEYSET) ---
+# Em vez de OFFSET (que lê e descarta todas as linhas anteriores), continua a partir do último
+# item entregue: o custo de qualquer página é o mesmo da primeira, usando o índice da coluna.
+async def paginar(db, consulta, coluna, coluna_id, cursor: str = None, limite: int = LIMITE_PADRAO,
+                  descendente: bool = False) -> Pagina:
+    limite = limitar(limite)
+    posicao = decodificar_cursor(cursor)
+    if posicao is not None:
+        consulta = consulta.where(_depois_de(coluna, coluna_id, *posicao, descendente))
+    if coluna is coluna_id:
+        ordem = [coluna_id.desc() if descendente else coluna_id.asc()]
+    else:
+        ordem = [coluna.desc(), coluna_id.desc()] if descendente else [coluna.asc(), coluna_id.asc()]
+    # Busca um item a mais só para saber se existe próxima página
+    linhas = (await db.execute(consulta.order_by(*ordem).limit(limite + 1))).all()
+    itens = [linha[0] if len(linha) == 1 else linha for linha in linhas[:limite]]
+    proximo = None
+    if len(linhas) > limite:
+        ultimo = linhas[limite - 1]
+        proximo = codificar_cursor(_valor(ultimo, coluna), _valor(ultimo, coluna_id))
+    return Pagina(itens, proximo)
+
+
+# Aceita tanto select(Modelo) quanto selects só de colunas
+def _valor(linha, coluna):
+    if len(linha) == 1 and hasattr(linha[0], coluna.key):
+        return getattr(linha[0], coluna.key)
+    return linha._mapping[coluna.key]
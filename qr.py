@@ -0,0 +1,75 @@
+import os
+import base64
+import urllib.parse
+from io import BytesIO
+from collections import OrderedDict
+import qrcode
+from starlette.concurrency import run_in_threadpool
+
+# "svg" dispensa o Pillow (só a matriz do QR é calculada) e fica nítido em qualquer escala
+QR_FORMAT = os.environ.get("QR_FORMAT", "png").lower()
+QR_CACHE_MAX = int(os.environ.get("QR_CACHE_MAX", "128"))
+
+
+# --- QR CODES DO 2FA (CACHE LRU POR URI DE PROVISIONAMENTO) ---
+# A URI contém o segredo TOTP, então trocar o segredo já gera outra chave. O índice por usuário
+# serve para descartar a imagem antiga assim que o segredo muda ou o 2FA é desativado.
+class ServicoQRCode:
+    def __init__(self, formato: str = QR_FORMAT, max_entradas: int = QR_CACHE_MAX):
+        self.formato = formato
+        self.max_entradas = max_entradas
+        self._imagens = OrderedDict()  # uri -> data URI pronto para o <img src>
+        self._uri_por_usuario = {}
+
+    @staticmethod
+    def _svg(uri: str) -> str:
+        qr = qrcode.QRCode(border=4)
+        qr.add_data(uri)
+        qr.make(fit=True)
+        matriz = qr.get_matrix()
+        tamanho = len(matriz)
+        # Um retângulo por sequência horizontal de módulos pretos (bem menor que um por módulo)
+        trechos = []
+        for y, linha in enumerate(matriz):
+            x = 0
+            while x < tamanho:
+                if not linha[x]:
+                    x += 1
+                    continue
+                inicio = x
+                while x < tamanho and linha[x]:
+                    x += 1
+                trechos.append(f"M{inicio} {y}h{x - inicio}v1h-{x - inicio}z")
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {tamanho} {tamanho}" shape-rendering="crispEdges">'
+            f'<rect width="100%" height="100%" fill="#fff"/><path d="{"".join(trechos)}"/></svg>'
+        )
+
+    def _renderizar(self, uri: str) -> str:
+        if self.formato == "svg":
+            return "data:image/svg+xml," + urllib.parse.quote(self._svg(uri), safe=" =:/")
+        buffered = BytesIO()
+        qrcode.make(uri).save(buffered, format="PNG")
+        return "data:image/png;base64," + base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+    async def obter(self, username: str, uri: str) -> str:
+        imagem = self._imagens.get(uri)
+        if imagem is not None:
+            self._imagens.move_to_end(uri)
+            return imagem
+
+        # Renderização do QR é CPU pura: roda no threadpool para não travar o event loop
+        imagem = await run_in_threadpool(self._renderizar, uri)
+        uri_antiga = self._uri_por_usuario.get(username)
+        if uri_antiga and uri_antiga != uri:
+            self._imagens.pop(uri_antiga, None)
+        self._uri_por_usuario[username] = uri
+        self._imagens[uri] = imagem
+        while len(self._imagens) > self.max_entradas:
+            self._imagens.popitem(last=False)
+        return imagem
+
+    def invalidar(self, username: str):
+        uri = self._uri_por_usuario.pop(username, None)
+        if uri:
+            self._imagens.pop(uri, None)
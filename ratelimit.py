@@ -0,0 +1,166 @@
+import os
+import time
+import hashlib
+import itertools
+import logging
+from collections import OrderedDict
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+import models
+import metrics
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# "memory": contadores por worker | "db": tabela limites_tentativas, compartilhada entre workers/réplicas
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_JANELA = float(os.environ.get("RATE_LIMIT_JANELA", "900"))          # 15 minutos
+RATE_LIMIT_IP = int(os.environ.get("RATE_LIMIT_IP", "30"))                     # Tentativas por IP na janela
+RATE_LIMIT_USUARIO = int(os.environ.get("RATE_LIMIT_USUARIO", "10"))           # Tentativas por usuário na janela
+# Bloqueio progressivo: dobra a cada estouro seguido, até o máximo
+RATE_LIMIT_BLOQUEIO = float(os.environ.get("RATE_LIMIT_BLOQUEIO", "30"))
+RATE_LIMIT_BLOQUEIO_MAX = float(os.environ.get("RATE_LIMIT_BLOQUEIO_MAX", "900"))
+RATE_LIMIT_MAX_CHAVES = int(os.environ.get("RATE_LIMIT_MAX_CHAVES", "100000"))
+# Chaves maiores que isso (ex: username gigante no formulário) viram o hash SHA-256: tamanho fixo na memória
+# e dentro da coluna limites_tentativas.chave
+CHAVE_MAX = 64
+# Com a memória cheia, quantas das chaves menos recentes são olhadas atrás de uma que não esteja bloqueada
+DESCARTE_VARREDURA = 1000
+
+tentativas_total = metrics.registro.adicionar(metrics.Contador(
+    "ratelimit_tentativas_total", "Tentativas avaliadas pelo limitador.", ("limitador", "resultado")))
+chaves_ativas = metrics.registro.adicionar(metrics.Medidor(
+    "ratelimit_chaves", "Chaves com contador em memória.", ("limitador",)))
+chaves_bloqueadas = metrics.registro.adicionar(metrics.Medidor(
+    "ratelimit_chaves_bloqueadas", "Chaves bloqueadas agora (memória deste worker).", ("limitador",)))
+
+
+# Estado de uma chave: [início da janela atual, contagem atual, contagem da janela anterior,
+# bloqueado até (epoch), nível do bloqueio progressivo]
+def _novo_estado(agora: float, janela: float) -> list:
+    return [agora - agora % janela, 0, 0, 0.0, 0]
+
+
+# Janela deslizante aproximada por duas janelas fixas: a anterior entra com peso proporcional
+# ao quanto dela ainda está dentro dos últimos `janela` segundos (O(1) de memória por chave)
+def _avaliar(estado: list, agora: float, limite: int, janela: float):
+    inicio, atual, anterior, bloqueado_ate, nivel = estado
+    if bloqueado_ate > agora:
+        return bloqueado_ate - agora
+
+    decorrido = agora - inicio
+    if decorrido >= janela:
+        if decorrido >= 2 * janela:
+            # Uma janela inteira sem tentativas: zera também o bloqueio progressivo
+            anterior, nivel = 0, 0
+        else:
+            anterior = atual
+        atual = 0
+        inicio = agora - agora % janela
+        decorrido = agora - inicio
+
+    estimativa = anterior * (1 - decorrido / janela) + atual
+    if estimativa >= limite:
+        nivel += 1
+        bloqueio = min(RATE_LIMIT_BLOQUEIO * 2 ** (nivel - 1), RATE_LIMIT_BLOQUEIO_MAX)
+        # Passado o bloqueio, sobra uma única tentativa: se ela também falhar, o próximo bloqueio dobra
+        estado[:] = [inicio, limite - 1, 0, agora + bloqueio, nivel]
+        return bloqueio
+
+    estado[:] = [inicio, atual + 1, anterior, bloqueado_ate, nivel]
+    return None
+
+
+def normalizar_chave(chave: str) -> str:
+    if len(chave) <= CHAVE_MAX:
+        return chave
+    return hashlib.sha256(chave.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+# --- LIMITADOR DE TENTATIVAS (JANELA DESLIZANTE + BLOQUEIO PROGRESSIVO) ---
+class LimitadorTentativas:
+    def __init__(self, nome: str, limite: int, janela: float = RATE_LIMIT_JANELA,
+                 backend: str = RATE_LIMIT_BACKEND, max_chaves: int = RATE_LIMIT_MAX_CHAVES):
+        self.nome = nome
+        self.limite = limite
+        self.janela = janela
+        self.persistente = backend == "db"
+        self.max_chaves = max_chaves
+        self._estados = OrderedDict()  # chave -> estado (ver _novo_estado)
+
+        @metrics.registro.coletor
+        def coletar():
+            agora = time.time()
+            chaves_ativas.definir(len(self._estados), self.nome)
+            chaves_bloqueadas.definir(sum(1 for e in self._estados.values() if e[3] > agora), self.nome)
+
+    # Conta a tentativa e devolve None (liberada) ou os segundos até poder tentar de novo
+    async def consumir(self, chave: str):
+        if not chave:
+            return None
+        chave = normalizar_chave(chave)
+        agora = time.time()
+        if self.persistente:
+            espera = await self._consumir_db(chave, agora)
+        else:
+            estado = self._estados.get(chave)
+            if estado is None:
+                while len(self._estados) >= self.max_chaves:
+                    self._descartar(agora)
+                estado = self._estados[chave] = _novo_estado(agora, self.janela)
+            self._estados.move_to_end(chave)
+            espera = _avaliar(estado, agora, self.limite, self.janela)
+
+        tentativas_total.somar(1, self.nome, "bloqueada" if espera else "liberada")
+        if espera:
+            logger.warning(f"[RATE LIMIT] {self.nome} '{chave}' bloqueado por mais {espera:.0f}s")
+        return espera
+
+    # Memória cheia: sai a chave menos recente que não esteja bloqueada nem em bloqueio progressivo. Assim um
+    # spray de usernames aleatórios não empurra para fora a chave de quem está bloqueado.
+    def _descartar(self, agora: float):
+        for chave, estado in itertools.islice(self._estados.items(), DESCARTE_VARREDURA):
+            if estado[3] <= agora and not estado[4]:
+                del self._estados[chave]
+                return
+        self._estados.popitem(last=False)
+
+    async def _consumir_db(self, chave: str, agora: float):
+        chave_db = f"{self.nome}:{chave}"
+        for _ in range(2):
+            async with AsyncSessionLocal() as db:
+                # FOR UPDATE serializa workers concorrentes na mesma chave
+                linha = await db.scalar(select(models.LimiteTentativa)
+                                        .where(models.LimiteTentativa.chave == chave_db).with_for_update())
+                if linha is None:
+                    # Chaves novas são raras: aproveita para apagar as que já esfriaram
+                    await db.execute(delete(models.LimiteTentativa).where(
+                        models.LimiteTentativa.inicio_janela < agora - 2 * self.janela,
+                        models.LimiteTentativa.bloqueado_ate < agora))
+                    linha = models.LimiteTentativa(chave=chave_db)
+                    estado = _novo_estado(agora, self.janela)
+                    db.add(linha)
+                else:
+                    estado = [linha.inicio_janela, linha.atual, linha.anterior, linha.bloqueado_ate, linha.nivel]
+                espera = _avaliar(estado, agora, self.limite, self.janela)
+                linha.inicio_janela, linha.atual, linha.anterior, linha.bloqueado_ate, linha.nivel = estado
+                try:
+                    await db.commit()
+                    return espera
+                except IntegrityError:
+                    # Outro worker criou a mesma chave ao mesmo tempo: relê e aplica de novo
+                    await db.rollback()
+        return espera
+
+    # Login bem-sucedido: zera o contador da chave (ex: o usuário que errou a senha algumas vezes)
+    async def limpar(self, chave: str):
+        if not chave:
+            return
+        chave = normalizar_chave(chave)
+        self._estados.pop(chave, None)
+        if self.persistente:
+            async with AsyncSessionLocal() as db:
+                linha = await db.get(models.LimiteTentativa, f"{self.nome}:{chave}")
+                if linha is not None:
+                    await db.delete(linha)
+                    await db.commit()
@@ -0,0 +1,61 @@
+from typing import NamedTuple, Optional
+from sqlalchemy import select
+import models
+
+# --- MODELOS DE LEITURA (PÁGINAS PÚBLICAS) ---
+# As rotas públicas só exibem os dados: em vez de entidades do ORM (identity map, atributos instrumentados,
+# estado na sessão), fazem select só das colunas e montam registros imutáveis. São tuplas com nome
+# (__slots__ vazio, atributos somente leitura), então os templates usam `proj.titulo` como antes e os caches
+# guardam valores que nenhum commit expira.
+# Os campos de cada registro têm os nomes das colunas do modelo; a consulta sai deles.
+
+
+class ProjetoLeitura(NamedTuple):
+    id: int
+    titulo: Optional[str]
+    descricao: Optional[str]
+    categoria: Optional[str]
+    link_projeto: Optional[str]
+    link_github: Optional[str]
+
+
+class ContatoLeitura(NamedTuple):
+    id: int
+    nome: Optional[str]
+    url: Optional[str]
+    icone: Optional[str]
+    cor_icone: Optional[str]
+    cor_hover: Optional[str]
+
+
+class WhatsappLeitura(NamedTuple):
+    numero: Optional[str]
+    mensagem: Optional[str]
+
+
+MODELOS = {
+    ProjetoLeitura: models.Projeto,
+    ContatoLeitura: models.Contato,
+    WhatsappLeitura: models.WhatsappConfig,
+}
+
+
+def consulta(registro):
+    modelo = MODELOS[registro]
+    return select(*[getattr(modelo, campo) for campo in registro._fields])
+
+
+# Linhas (Row) de consulta(registro) -> registros; também serve para os itens de paginar()
+def converter(registro, linhas) -> list:
+    criar = registro._make
+    return [criar(linha) for linha in linhas]
+
+
+async def listar(db, registro, consulta_registro=None) -> list:
+    resultado = await db.execute(consulta(registro) if consulta_registro is None else consulta_registro)
+    return converter(registro, resultado)
+
+
+async def primeiro(db, registro, consulta_registro=None):
+    linha = (await db.execute((consulta(registro) if consulta_registro is None else consulta_registro).limit(1))).first()
+    return None if linha is None else registro._make(linha)
@@ -0,0 +1,92 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# URL configurável para permitir apontar os testes para um servidor local
+RECAPTCHA_VERIFY_URL = os.environ.get("RECAPTCHA_VERIFY_URL", "https://www.google.com/recaptcha/api/siteverify")
+RECAPTCHA_TIMEOUT = float(os.environ.get("RECAPTCHA_TIMEOUT", "3"))
+# Disjuntor: após N falhas seguidas, deixa de chamar o Google por alguns segundos
+RECAPTCHA_MAX_FALHAS = int(os.environ.get("RECAPTCHA_MAX_FALHAS", "5"))
+RECAPTCHA_PAUSA = float(os.environ.get("RECAPTCHA_PAUSA", "30"))
+# Tokens aprovados recentemente (ex: o usuário errou a senha e reenviou o mesmo formulário)
+RECAPTCHA_CACHE_TTL = float(os.environ.get("RECAPTCHA_CACHE_TTL", "120"))
+RECAPTCHA_CACHE_MAX = int(os.environ.get("RECAPTCHA_CACHE_MAX", "1024"))
+
+
+class RecaptchaIndisponivel(Exception):
+    pass
+
+
+# --- VERIFICADOR ASSÍNCRONO DO RECAPTCHA ---
+# Qualquer objeto com `async verificar(token, ip)` e `async fechar()` pode substituí-lo.
+class VerificadorRecaptcha:
+    def __init__(self, secret: str, url: str = RECAPTCHA_VERIFY_URL, timeout: float = RECAPTCHA_TIMEOUT,
+                 max_falhas: int = RECAPTCHA_MAX_FALHAS, pausa: float = RECAPTCHA_PAUSA):
+        self.secret = secret
+        self.url = url
+        self.timeout = timeout
+        self.max_falhas = max_falhas
+        self.pausa = pausa
+        self._client = None
+        self._falhas = 0
+        self._aberto_ate = 0.0
+        self._aprovados = OrderedDict()  # token -> expira_em
+
+    # Cliente criado sob demanda e reaproveitado (conexões keep-alive com o Google)
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    def _em_cache(self, token: str) -> bool:
+        expira_em = self._aprovados.get(token)
+        if expira_em is None:
+            return False
+        if expira_em < time.monotonic():
+            del self._aprovados[token]
+            return False
+        return True
+
+    def _guardar(self, token: str):
+        self._aprovados[token] = time.monotonic() + RECAPTCHA_CACHE_TTL
+        self._aprovados.move_to_end(token)
+        while len(self._aprovados) > RECAPTCHA_CACHE_MAX:
+            self._aprovados.popitem(last=False)
+
+    async def verificar(self, token: str, ip: str = None) -> bool:
+        if self._em_cache(token):
+            return True
+        # Disjuntor aberto: falha rápido em vez de segurar o login esperando timeout
+        if self._falhas >= self.max_falhas and time.monotonic() < self._aberto_ate:
+            raise RecaptchaIndisponivel("disjuntor aberto após falhas consecutivas")
+
+        dados = {"secret": self.secret, "response": token}
+        if ip:
+            dados["remoteip"] = ip
+        try:
+            resposta = await self._get_client().post(self.url, data=dados)
+            resposta.raise_for_status()
+            sucesso = bool(resposta.json().get("success"))
+        except (httpx.HTTPError, ValueError) as e:
+            self._falhas += 1
+            if self._falhas >= self.max_falhas:
+                self._aberto_ate = time.monotonic() + self.pausa
+                logger.warning(f"[RECAPTCHA] {self._falhas} falhas seguidas. Pausando verificações por {self.pausa:.0f}s.")
+            raise RecaptchaIndisponivel(str(e)) from e
+
+        self._falhas = 0
+        if sucesso:
+            self._guardar(token)
+        return sucesso
+
+    async def fechar(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
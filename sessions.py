@@ -0,0 +1,123 @@
+import os
+import time
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from sqlalchemy import select, delete
+import models
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# "memory": sessões só na memória do worker | "db": gravadas na tabela sessoes (sobrevivem a
+# reinícios e valem em todos os workers, com a memória funcionando como cache)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory").lower()
+SESSION_TTL = int(os.environ.get("SESSION_TTL", "28800"))            # 8 horas
+SESSION_CACHE_MAX = int(os.environ.get("SESSION_CACHE_MAX", "10000"))
+# No modo "db", por quanto tempo um worker confia na cópia local antes de reconsultar o banco
+# (é o atraso máximo para um logout/revogação feito em outro worker valer aqui)
+SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", "60"))
+
+# Tipos de token e validade de cada um
+SESSAO = "sessao"
+CONFIANCA = "confianca"     # Dispositivo confiável: pula o 2FA por 30 dias
+PRE_AUTH = "pre_auth"       # Senha validada, aguardando o código do 2FA
+VALIDADES = {SESSAO: SESSION_TTL, CONFIANCA: 2592000, PRE_AUTH: 300}
+
+
+# Cópia enxuta do usuário guardada junto da sessão (evita reconsultar a tabela usuarios)
+class UsuarioSessao:
+    __slots__ = ("id", "username")
+
+    def __init__(self, id: int, username: str):
+        self.id, self.username = id, username
+
+    @classmethod
+    def de_modelo(cls, usuario: models.Usuario):
+        return cls(usuario.id, usuario.username)
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+# --- ARMAZÉM DE SESSÕES (TTL + LRU EM MEMÓRIA, COM TABELA OPCIONAL) ---
+class ArmazemSessoes:
+    def __init__(self, backend: str = SESSION_BACKEND, max_entradas: int = SESSION_CACHE_MAX):
+        self.persistente = backend == "db"
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()  # hash do token -> (tipo, UsuarioSessao, expira_em monotônico)
+
+    def _guardar(self, token_hash: str, tipo: str, usuario: UsuarioSessao, ttl: float):
+        self._entradas[token_hash] = (tipo, usuario, time.monotonic() + ttl)
+        self._entradas.move_to_end(token_hash)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    async def criar(self, usuario: models.Usuario, tipo: str) -> str:
+        token = secrets.token_urlsafe(32)
+        token_hash = _hash(token)
+        ttl = VALIDADES[tipo]
+        registro = UsuarioSessao.de_modelo(usuario)
+        if self.persistente:
+            async with AsyncSessionLocal() as db:
+                # Logins são raros: aproveita para limpar o que já expirou
+                await db.execute(delete(models.Sessao).where(models.Sessao.expira_em < datetime.utcnow()))
+                db.add(models.Sessao(token_hash=token_hash, tipo=tipo, usuario_id=registro.id,
+                                     expira_em=datetime.utcnow() + timedelta(seconds=ttl)))
+                await db.commit()
+            ttl = min(ttl, SESSION_CACHE_TTL)
+        self._guardar(token_hash, tipo, registro, ttl)
+        return token
+
+    async def obter(self, token: str, tipo: str = SESSAO):
+        if not token:
+            return None
+        token_hash = _hash(token)
+        entrada = self._entradas.get(token_hash)
+        if entrada is not None:
+            if entrada[2] > time.monotonic():
+                self._entradas.move_to_end(token_hash)
+                return entrada[1] if entrada[0] == tipo else None
+            del self._entradas[token_hash]
+        if not self.persistente:
+            return None
+
+        async with AsyncSessionLocal() as db:
+            linha = (await db.execute(
+                select(models.Sessao.tipo, models.Sessao.expira_em, models.Usuario.id, models.Usuario.username)
+                .join(models.Usuario, models.Usuario.id == models.Sessao.usuario_id)
+                .where(models.Sessao.token_hash == token_hash, models.Sessao.expira_em > datetime.utcnow())
+            )).first()
+        if linha is None:
+            return None
+        restante = (linha.expira_em - datetime.utcnow()).total_seconds()
+        registro = UsuarioSessao(linha.id, linha.username)
+        self._guardar(token_hash, linha.tipo, registro, min(restante, SESSION_CACHE_TTL))
+        return registro if linha.tipo == tipo else None
+
+    async def encerrar(self, token: str):
+        if not token:
+            return
+        token_hash = _hash(token)
+        self._entradas.pop(token_hash, None)
+        if self.persistente:
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(models.Sessao).where(models.Sessao.token_hash == token_hash))
+                await db.commit()
+
+    # Revoga todos os tokens do usuário (de um tipo ou de todos), ex: usuário excluído ou 2FA desativado
+    async def encerrar_usuario(self, usuario_id: int, *tipos: str):
+        for token_hash, (tipo, usuario, _) in list(self._entradas.items()):
+            if usuario.id == usuario_id and (not tipos or tipo in tipos):
+                del self._entradas[token_hash]
+        if self.persistente:
+            consulta = delete(models.Sessao).where(models.Sessao.usuario_id == usuario_id)
+            if tipos:
+                consulta = consulta.where(models.Sessao.tipo.in_(tipos))
+            async with AsyncSessionLocal() as db:
+                await db.execute(consulta)
+                await db.commit()
+        logger.info(f"[SESSÃO] Tokens revogados para o usuário {usuario_id}: {', '.join(tipos) or 'todos'}")
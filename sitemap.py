@@ -0,0 +1,144 @@
+import os
+import gzip
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from xml.sax.saxutils import escape
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.responses import Response
+from sqlalchemy import select
+import models
+import cache
+
+# Limite do protocolo é 50.000 URLs por arquivo; acima disso o /sitemap.xml vira um índice
+SITEMAP_MAX_URLS = int(os.environ.get("SITEMAP_MAX_URLS", "50000"))
+SITEMAP_GZIP = os.environ.get("SITEMAP_GZIP", "True").lower() == "true"
+# Domínios (Host) com o sitemap montado em memória; os menos usados saem primeiro
+SITEMAP_MAX_ENTRADAS = int(os.environ.get("SITEMAP_MAX_ENTRADAS", "8"))
+
+# Rotas com esta tag entram no sitemap
+TAG_SITEMAP = "paginas"
+
+# Chaves de versão de cada página: a maior data de alteração entre elas vira o <lastmod>
+CHAVES_PAGINA = {"/": (cache.LAYOUT, cache.PROJETOS)}
+
+
+# Páginas públicas (GET com a tag do sitemap): também exportadas e contadas nas estatísticas
+def paginas_publicas(app) -> list:
+    return [rota.path for rota in app.routes
+            if isinstance(rota, APIRoute) and TAG_SITEMAP in rota.tags and "GET" in rota.methods]
+
+
+class ArquivoSitemap:
+    __slots__ = ("xml", "xml_gz", "etag", "modificado_em")
+
+    def __init__(self, xml: bytes, modificado_em: datetime):
+        self.xml = xml
+        self.xml_gz = gzip.compress(xml, compresslevel=9, mtime=0) if SITEMAP_GZIP else None
+        self.etag = '"' + hashlib.sha256(xml).hexdigest()[:32] + '"'
+        self.modificado_em = modificado_em.replace(microsecond=0)
+
+
+# --- SITEMAP GERADO A PARTIR DAS ROTAS + BANCO (MONTADO UMA VEZ, GUARDADO EM MEMÓRIA) ---
+class GeradorSitemap:
+    def __init__(self, app, max_urls: int = SITEMAP_MAX_URLS, max_entradas: int = SITEMAP_MAX_ENTRADAS):
+        self.app = app
+        self.max_urls = max_urls
+        self.max_entradas = max_entradas
+        # base_url -> (versao, [arquivo 0 (índice ou único), parte 1, parte 2, ...]), num LRU: o Host vem do cliente
+        self._arquivos = OrderedDict()
+
+    def _paginas(self):
+        return paginas_publicas(self.app)
+
+    @staticmethod
+    async def _carregar_datas(db):
+        return (await db.execute(select(models.CacheVersao.chave, models.CacheVersao.atualizado_em))).all()
+
+    async def _datas_alteracao(self) -> dict:
+        linhas = await cache.ler(self._carregar_datas)
+        return {chave: data.replace(tzinfo=timezone.utc) for chave, data in linhas if data}
+
+    async def _urls(self):
+        datas = await self._datas_alteracao()
+        for path in self._paginas():
+            alteracoes = [datas[c] for c in CHAVES_PAGINA.get(path, (cache.LAYOUT,)) if c in datas]
+            if path == "/":
+                yield path, max(alteracoes, default=None), "weekly", "1.0"
+            else:
+                yield path, max(alteracoes, default=None), "monthly", "0.8"
+
+    @staticmethod
+    def _urlset(base_url: str, urls) -> bytes:
+        linhas = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for path, lastmod, changefreq, priority in urls:
+            linhas.append("    <url>")
+            linhas.append(f"        <loc>{escape(base_url + path.lstrip('/'))}</loc>")
+            if lastmod:
+                linhas.append(f"        <lastmod>{lastmod.date().isoformat()}</lastmod>")
+            linhas.append(f"        <changefreq>{changefreq}</changefreq>")
+            linhas.append(f"        <priority>{priority}</priority>")
+            linhas.append("    </url>")
+        linhas.append("</urlset>")
+        return "\n".join(linhas).encode("utf-8")
+
+    async def _montar(self, base_url: str) -> list:
+        urls = [url async for url in self._urls()]
+        agora = datetime.now(timezone.utc)
+        modificado_em = max((u[1] for u in urls if u[1]), default=agora)
+        if len(urls) <= self.max_urls:
+            return [ArquivoSitemap(self._urlset(base_url, urls), modificado_em)]
+
+        # Catálogo grande: /sitemap.xml vira índice apontando para /sitemap-1.xml, /sitemap-2.xml...
+        partes = [urls[i:i + self.max_urls] for i in range(0, len(urls), self.max_urls)]
+        arquivos = [None]
+        linhas = ['<?xml version="1.0" encoding="UTF-8"?>', '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for numero, parte in enumerate(partes, start=1):
+            modificado_parte = max((u[1] for u in parte if u[1]), default=agora)
+            arquivos.append(ArquivoSitemap(self._urlset(base_url, parte), modificado_parte))
+            linhas.append(f"    <sitemap><loc>{escape(base_url)}sitemap-{numero}.xml</loc>"
+                          f"<lastmod>{modificado_parte.date().isoformat()}</lastmod></sitemap>")
+        linhas.append("</sitemapindex>")
+        arquivos[0] = ArquivoSitemap("\n".join(linhas).encode("utf-8"), modificado_em)
+        return arquivos
+
+    @staticmethod
+    def _nao_modificado(request: Request, arquivo: ArquivoSitemap) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            return any(c.strip().removeprefix("W/") in (arquivo.etag, "*") for c in if_none_match.split(","))
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return arquivo.modificado_em <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def responder(self, request: Request, parte: int = 0) -> Response:
+        base_url = str(request.base_url)
+        versao = (await cache.versoes.atual(cache.LAYOUT), await cache.versoes.atual(cache.PROJETOS))
+        guardado = self._arquivos.get(base_url)
+        if guardado is None or guardado[0] != versao:
+            guardado = (versao, await self._montar(base_url))
+            self._arquivos[base_url] = guardado
+            if len(self._arquivos) > self.max_entradas:
+                self._arquivos.popitem(last=False)
+        self._arquivos.move_to_end(base_url)
+
+        arquivos = guardado[1]
+        if parte >= len(arquivos) or arquivos[parte] is None:
+            raise StarletteHTTPException(status_code=404)
+        arquivo = arquivos[parte]
+
+        cabecalhos = {"ETag": arquivo.etag, "Last-Modified": format_datetime(arquivo.modificado_em, usegmt=True),
+                      "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if self._nao_modificado(request, arquivo):
+            return Response(status_code=304, headers=cabecalhos)
+        if arquivo.xml_gz and "gzip" in request.headers.get("accept-encoding", ""):
+            cabecalhos["Content-Encoding"] = "gzip"
+            return Response(arquivo.xml_gz, media_type="application/xml", headers=cabecalhos)
+        return Response(arquivo.xml, media_type="application/xml", headers=cabecalhos)
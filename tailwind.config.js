@@ -0,0 +1,19 @@
+// Mesma configuração que o base.html injeta no runtime do CDN (usada pelo build_assets.py)
+module.exports = {
+    content: ["./templates/**/*.html"],
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                darkbg: '#050505',
+                panel: '#111111',
+                neon: '#00ffcc',
+                accent: '#3b82f6'
+            },
+            fontFamily: {
+                mono: ['"Fira Code"', 'monospace'],
+                sans: ['Inter', 'sans-serif'],
+            }
+        }
+    }
+}
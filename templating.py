@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+import logging
+import jinja2
+from fastapi.templating import Jinja2Templates
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.environ.get("TEMPLATES_DIR", "templates")
+# Diretório do cache de bytecode (preenchido no build da imagem). Vazio = compila na memória de cada worker.
+JINJA_BYTECODE_DIR = os.environ.get("JINJA_BYTECODE_DIR", "")
+# Em produção os templates não mudam: sem auto_reload o Jinja não confere o mtime do arquivo a cada render
+JINJA_AUTO_RELOAD = os.environ.get("JINJA_AUTO_RELOAD", "True").lower() == "true"
+
+EXTENSOES = (".html", ".xml", ".txt")
+
+
+# App e pré-compilação precisam do mesmo Environment: o bytecode depende das opções de compilação (autoescape)
+def criar_templates(diretorio: str = TEMPLATES_DIR, bytecode_dir: str = JINJA_BYTECODE_DIR,
+                    auto_reload: bool = JINJA_AUTO_RELOAD) -> Jinja2Templates:
+    opcoes = {"auto_reload": auto_reload}
+    if bytecode_dir:
+        os.makedirs(bytecode_dir, exist_ok=True)
+        opcoes["bytecode_cache"] = jinja2.FileSystemBytecodeCache(bytecode_dir)
+    templates = Jinja2Templates(directory=diretorio, **opcoes)
+    # Mede o tempo de renderização de cada template e bloco (precisa vir antes do primeiro template ser carregado)
+    templates.env.template_class = metrics.TemplateMedido
+    return templates
+
+
+# Carrega todos os templates: compila (gravando o bytecode, se houver cache) e deixa-os no cache do Environment
+def precompilar(env: jinja2.Environment) -> int:
+    nomes = [nome for nome in env.list_templates() if nome.endswith(EXTENSOES)]
+    for nome in nomes:
+        env.get_template(nome)
+    return len(nomes)
+
+
+# --- PRÉ-COMPILAÇÃO NO BUILD DA IMAGEM ---
+if __name__ == "__main__":
+    if not JINJA_BYTECODE_DIR:
+        print(">_ [ERRO] Defina JINJA_BYTECODE_DIR com o diretório do cache de bytecode.")
+        sys.exit(1)
+    inicio = time.perf_counter()
+    quantidade = precompilar(criar_templates().env)
+    print(f">_ [SUCESSO] {quantidade} templates pré-compilados em {JINJA_BYTECODE_DIR} "
+          f"({(time.perf_counter() - inicio) * 1000:.0f} ms)")
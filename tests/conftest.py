@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os testes importam os módulos da raiz (como os benchmarks) e nunca tocam no banco de DB_URL:
+# cada execução usa um SQLite descartável, definido antes de o database.py criar as engines
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ["DB_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='testes-')}/testes.db"
+
+
+# Tabelas criadas uma vez por execução; os testes que gravam limpam as suas
+@pytest.fixture(scope="session")
+def banco():
+    import models
+    from database import engine
+    models.Base.metadata.create_all(bind=engine)
+    return engine
@@ -0,0 +1,123 @@
+import pytest
+
+import busca
+from busca import IndiceInvertido, dobrar_acentos, radical, termos
+
+
+def test_dobrar_acentos():
+    assert dobrar_acentos("Configuração Ágil ÇÃO") == "configuracao agil cao"
+    # Fora da tabela do português: cai no NFKD
+    assert dobrar_acentos("Ångström ñandú") == "angstrom nandu"
+
+
+@pytest.mark.parametrize("plural, singular", [
+    ("servidores", "servidor"),
+    ("servidoras", "servidor"),
+    ("configurações", "configuração"),
+    ("redes", "rede"),
+    ("firewalls", "firewall"),
+    ("portais", "portal"),
+    ("papéis", "papel"),
+    ("anzóis", "anzol"),
+    ("itens", "item"),
+    ("automaticamente", "automático"),
+])
+def test_plural_genero_e_acento_caem_no_mesmo_termo(plural, singular):
+    assert termos(plural) == termos(singular)
+
+
+def test_radical_preserva_palavras_curtas_e_numeros():
+    assert radical("dns") == "dns"
+    assert radical("2024") == "2024"
+    assert radical("linux") == "linux"
+    assert radical("status") == "status"
+
+
+def test_termos_ignora_palavras_vazias_e_pontuacao():
+    assert termos("Backup dos servidores, com VPN!") == ["backup", "servidor", "vpn"]
+    assert termos("") == termos(None) == []
+
+
+def indice_exemplo():
+    return IndiceInvertido.construir([
+        (1, "Servidor de E-mail", "Postfix e Dovecot em Linux", "Linux"),
+        (2, "Firewall MikroTik", "Regras de firewall e VPN para a rede do escritório", "Redes"),
+        (3, "Backup Automático", "Cópias noturnas dos servidores de arquivos", "Linux"),
+        (4, "Monitoramento", "Alertas da rede e dos servidores", "Infraestrutura"),
+    ])
+
+
+def ids(resultado):
+    return [doc_id for _, doc_id in resultado[0]]
+
+
+def test_busca_sem_acento_encontra_texto_acentuado():
+    indice = indice_exemplo()
+    assert ids(indice.buscar("automatico")) == [3]
+    assert ids(indice.buscar("COPIAS NOTURNAS")) == [3]
+    assert ids(indice.buscar("escritorio")) == [2]
+
+
+def test_busca_no_plural_encontra_o_singular():
+    indice = indice_exemplo()
+    melhores, total = indice.buscar("servidores")
+    assert total == 3
+    # O termo no título vale três ocorrências na descrição
+    assert ids((melhores, total))[0] == 1
+    assert set(ids((melhores, total))) == {1, 3, 4}
+
+
+def test_bm25_termo_raro_pesa_mais_que_termo_comum():
+    indice = indice_exemplo()
+    # "vpn" só aparece no projeto 2; "servidor" em três: quem tem o termo raro sobe
+    assert ids(indice.buscar("servidor vpn"))[0] == 2
+
+
+def test_bm25_satura_a_repeticao_do_termo():
+    indice = IndiceInvertido.construir([
+        (1, "Linux", "", ""),
+        (2, "Linux", "linux " * 50, ""),
+        (3, "Outro", "sem relação", ""),
+    ])
+    (p_repetido, id_repetido), (p_simples, _) = indice.buscar("linux")[0]
+    assert id_repetido == 2
+    # 51 ocorrências a mais rendem bem menos que o dobro da pontuação (k1 satura a frequência)
+    assert p_simples < p_repetido < 2 * p_simples
+
+
+def test_empate_traz_o_projeto_mais_novo_primeiro():
+    indice = IndiceInvertido.construir([(i, "Docker", "", "") for i in (3, 10, 7)])
+    assert ids(indice.buscar("docker")) == [10, 7, 3]
+
+
+def test_limite_e_total():
+    indice = IndiceInvertido.construir([(i, f"Projeto {i}", "", "") for i in range(1, 31)])
+    melhores, total = indice.buscar("projetos", limite=5)
+    assert len(melhores) == 5 and total == 30
+    assert indice.buscar("inexistente") == ([], 0)
+    assert IndiceInvertido().buscar("projeto") == ([], 0)
+
+
+def test_edicoes_incrementais_batem_com_a_construcao_em_lote():
+    linhas = [
+        (1, "Servidor de E-mail", "Postfix", "Linux"),
+        (2, "Firewall", "Regras e VPN", "Redes"),
+        (3, "Backup", "Cópias dos servidores", "Linux"),
+    ]
+    incremental = IndiceInvertido()
+    for doc_id, titulo, descricao, categoria in reversed(linhas):
+        incremental.adicionar(doc_id, titulo=titulo, descricao=descricao, categoria=categoria)
+    incremental.adicionar(4, titulo="Temporário", descricao="servidor", categoria="")
+    incremental.remover(4)
+    # Reeditar troca os termos do documento em vez de acumular
+    incremental.adicionar(2, titulo="Firewall", descricao="Regras e VPN", categoria="Redes")
+    lote = IndiceInvertido.construir(linhas)
+    for consulta in ("servidor", "vpn linux", "firewall", "temporario"):
+        assert incremental.buscar(consulta) == lote.buscar(consulta)
+    assert len(incremental) == 3
+
+
+def test_frequencia_limitada_ao_array():
+    indice = IndiceInvertido.construir([(1, "", "kernel " * (busca.FREQUENCIA_MAXIMA + 10), "")])
+    assert indice._ocorrencias["kernel"].frequencias[0] == busca.FREQUENCIA_MAXIMA
+    assert ids(indice.buscar("kernel")) == [1]
@@ -0,0 +1,126 @@
+import json
+import base64
+import asyncio
+
+import pytest
+from sqlalchemy import select, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+import models
+import read_models
+from paginacao import paginar, codificar_cursor, decodificar_cursor, limitar, LIMITE_MAXIMO
+
+# Categorias com NULLs e empates, para o desempate pelo id e a posição dos NULLs nas duas ordens
+CATEGORIAS = ["linux", None, "redes", "linux", None, "backup", "redes", "linux", None, "backup", "web"]
+
+
+@pytest.fixture
+def sessao(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/paginacao.db")
+
+    async def preparar():
+        async with engine.begin() as conexao:
+            await conexao.run_sync(models.Projeto.__table__.create)
+            await conexao.execute(insert(models.Projeto.__table__), [
+                {"id": i, "titulo": f"Projeto {i}", "descricao": "", "categoria": categoria}
+                for i, categoria in enumerate(CATEGORIAS, start=1)])
+
+    asyncio.run(preparar())
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def percorrer(sessao, consulta, coluna, descendente=False, limite=3):
+    async def todas():
+        ids, cursor, paginas = [], None, 0
+        async with sessao() as db:
+            while True:
+                pagina = await paginar(db, consulta, coluna, models.Projeto.id, cursor, limite, descendente)
+                ids.extend(item.id for item in pagina.itens)
+                paginas += 1
+                if pagina.proximo is None:
+                    return ids, paginas
+                cursor = pagina.proximo
+
+    return asyncio.run(todas())
+
+
+# NULL vem primeiro na ordem crescente e por último na decrescente (MySQL e SQLite)
+def ordem_esperada(descendente: bool) -> list:
+    projetos = list(enumerate(CATEGORIAS, start=1))
+    nulos = sorted((i for i, c in projetos if c is None), reverse=descendente)
+    valores = [i for _, i in sorted(((c, i) for i, c in projetos if c is not None), reverse=descendente)]
+    return valores + nulos if descendente else nulos + valores
+
+
+@pytest.mark.parametrize("descendente", [False, True])
+def test_percorre_coluna_com_nulos_sem_repetir_nem_pular(sessao, descendente):
+    ids, paginas = percorrer(sessao, select(models.Projeto), models.Projeto.categoria, descendente)
+    assert ids == ordem_esperada(descendente)
+    assert paginas == 4
+
+
+@pytest.mark.parametrize("limite", [1, 2, 5])
+def test_cursor_parado_num_nulo(sessao, limite):
+    # Com limite 1 e 2 a página termina dentro do bloco de NULLs, nas duas ordens
+    for descendente in (False, True):
+        ids, _ = percorrer(sessao, select(models.Projeto), models.Projeto.categoria, descendente, limite)
+        assert ids == ordem_esperada(descendente)
+
+
+def test_ordem_so_pelo_id(sessao):
+    ids, _ = percorrer(sessao, select(models.Projeto), models.Projeto.id, descendente=True, limite=4)
+    assert ids == list(range(len(CATEGORIAS), 0, -1))
+
+
+def test_select_de_colunas_dos_modelos_de_leitura(sessao):
+    consulta = read_models.consulta(read_models.ProjetoLeitura)
+    ids, _ = percorrer(sessao, consulta, models.Projeto.categoria)
+    assert ids == ordem_esperada(False)
+
+
+def test_ultima_pagina_cheia_nao_tem_proximo(sessao):
+    ids, paginas = percorrer(sessao, select(models.Projeto), models.Projeto.id, limite=len(CATEGORIAS))
+    assert len(ids) == len(CATEGORIAS) and paginas == 1
+
+
+def _bruto(conteudo: bytes) -> str:
+    return base64.urlsafe_b64encode(conteudo).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "nao-e-base64!!",
+    _bruto(b"\xff\xfe"),                       # Não é UTF-8
+    _bruto(b"{nao json"),
+    _bruto(b"42"),                             # JSON que não é par
+    _bruto(json.dumps([1, 2, 3]).encode()),
+    _bruto(json.dumps(["linux", "abc"]).encode()),
+    _bruto(json.dumps(["linux", None]).encode()),
+    _bruto(json.dumps({"a": 1, "b": 2}).encode()),
+])
+def test_cursor_adulterado_e_ignorado(cursor):
+    assert decodificar_cursor(cursor) is None
+
+
+def test_cursor_adulterado_recomeca_da_primeira_pagina(sessao):
+    async def primeira(cursor):
+        async with sessao() as db:
+            pagina = await paginar(db, select(models.Projeto), models.Projeto.categoria, models.Projeto.id, cursor, 3)
+            return [item.id for item in pagina.itens]
+
+    assert asyncio.run(primeira(_bruto(b"[1, 2, 3]"))) == asyncio.run(primeira(None))
+
+
+def test_cursor_ida_e_volta():
+    for valor in (None, "linux", "ação", 7):
+        assert decodificar_cursor(codificar_cursor(valor, 12)) == (valor, 12)
+    # O id volta como int mesmo que o cursor traga uma string numérica
+    assert decodificar_cursor(_bruto(json.dumps(["x", "12"]).encode())) == ("x", 12)
+    assert decodificar_cursor("") is None
+
+
+def test_limitar():
+    assert limitar(None) == limitar(0) == 50
+    assert limitar(-5) == 1
+    assert limitar(10 ** 6) == LIMITE_MAXIMO
+    assert limitar("20") == 20
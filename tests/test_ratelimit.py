@@ -0,0 +1,92 @@
+import asyncio
+
+import ratelimit
+from ratelimit import LimitadorTentativas, RATE_LIMIT_BLOQUEIO, RATE_LIMIT_BLOQUEIO_MAX, _avaliar, _novo_estado
+
+JANELA = 100.0
+
+
+def test_libera_ate_o_limite_e_bloqueia():
+    estado = _novo_estado(1000.0, JANELA)
+    assert [_avaliar(estado, 1000.0, 3, JANELA) for _ in range(3)] == [None, None, None]
+    assert _avaliar(estado, 1000.0, 3, JANELA) == RATE_LIMIT_BLOQUEIO
+    # Durante o bloqueio devolve só o tempo restante, sem contar a tentativa
+    assert _avaliar(estado, 1010.0, 3, JANELA) == RATE_LIMIT_BLOQUEIO - 10
+    assert estado[4] == 1
+
+
+def test_virada_da_janela_pondera_a_anterior():
+    estado = _novo_estado(1000.0, JANELA)
+    for _ in range(3):
+        assert _avaliar(estado, 1000.0, 4, JANELA) is None
+    # 150s depois: nova janela em 1100, metade dela decorrida -> as 3 anteriores pesam 1.5
+    liberadas = 0
+    while _avaliar(estado, 1150.0, 4, JANELA) is None:
+        liberadas += 1
+    assert liberadas == 3
+    assert estado[0] == 1100.0 and estado[2] == 0
+
+
+def test_janela_anterior_so_conta_no_inicio_da_nova():
+    estado = _novo_estado(1000.0, JANELA)
+    for _ in range(4):
+        _avaliar(estado, 1000.0, 5, JANELA)
+    # Quase no fim da nova janela a anterior já não pesa quase nada
+    assert all(_avaliar(estado, 1199.0, 5, JANELA) is None for _ in range(4))
+    assert estado[1] == 4 and estado[2] == 4
+
+
+def test_duas_janelas_sem_tentativas_zeram_o_bloqueio_progressivo():
+    estado = _novo_estado(1000.0, JANELA)
+    _avaliar(estado, 1000.0, 1, JANELA)
+    assert _avaliar(estado, 1000.0, 1, JANELA) == RATE_LIMIT_BLOQUEIO
+    agora = 1000.0 + max(RATE_LIMIT_BLOQUEIO, 2 * JANELA) + JANELA
+    assert _avaliar(estado, agora, 1, JANELA) is None
+    assert estado[2] == 0 and estado[4] == 0
+
+
+def test_bloqueio_progressivo_dobra_ate_o_maximo():
+    janela = 10 ** 7  # Sem virada de janela no meio do teste
+    estado = _novo_estado(0.0, janela)
+    agora, esperas = 0.0, []
+    for _ in range(8):
+        # Passado cada bloqueio sobra uma única tentativa; a seguinte bloqueia pelo dobro
+        assert _avaliar(estado, agora, 1, janela) is None
+        espera = _avaliar(estado, agora, 1, janela)
+        esperas.append(espera)
+        agora += espera
+    assert esperas == [min(RATE_LIMIT_BLOQUEIO * 2 ** n, RATE_LIMIT_BLOQUEIO_MAX) for n in range(8)]
+
+
+def test_chave_longa_vira_hash():
+    assert ratelimit.normalizar_chave("a" * ratelimit.CHAVE_MAX) == "a" * ratelimit.CHAVE_MAX
+    longa = "a" * (ratelimit.CHAVE_MAX + 1)
+    normalizada = ratelimit.normalizar_chave(longa)
+    assert len(normalizada) == 64 and normalizada != longa[:64]
+    assert ratelimit.normalizar_chave("ç" * 10000) != ratelimit.normalizar_chave("c" * 10000)
+
+    limitador = LimitadorTentativas("teste_chave", 5, JANELA, backend="memory")
+
+    async def cenario():
+        await limitador.consumir(longa)
+        assert list(limitador._estados) == [normalizada]
+        await limitador.limpar(longa)
+        assert not limitador._estados
+
+    asyncio.run(cenario())
+
+
+def test_memoria_cheia_preserva_chaves_bloqueadas():
+    limitador = LimitadorTentativas("teste_descarte", 1, JANELA, backend="memory", max_chaves=3)
+
+    async def cenario():
+        await limitador.consumir("alvo")
+        assert await limitador.consumir("alvo")
+        # Spray de usernames aleatórios: as chaves novas se revezam, a bloqueada fica
+        for i in range(50):
+            await limitador.consumir(f"aleatorio-{i}")
+        assert len(limitador._estados) == 3
+        assert "alvo" in limitador._estados
+        assert await limitador.consumir("alvo")
+
+    asyncio.run(cenario())
@@ -0,0 +1,152 @@
+import io
+import json
+import asyncio
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import models
+import transferencia
+from transferencia import ENTIDADES, importar, registros_do_arquivo, validar
+
+PROJETOS = ENTIDADES["projetos"]
+CONTATOS = ENTIDADES["contatos"]
+
+
+def projeto(**campos):
+    return {"titulo": "Servidor", "descricao": "Postfix e Dovecot", "categoria": "Linux", **campos}
+
+
+def ndjson(*linhas) -> io.BytesIO:
+    return io.BytesIO("".join(linha if isinstance(linha, str) else json.dumps(linha, ensure_ascii=False) + "\n"
+                              for linha in linhas).encode("utf-8"))
+
+
+# --- VALIDAÇÃO ---
+def test_validar_aceita_e_limpa_os_valores():
+    valores, erro = validar(PROJETOS, projeto(titulo="  Servidor  ", link_github="", id="7"))
+    assert erro is None
+    assert valores["titulo"] == "Servidor" and valores["id"] == 7
+    assert valores["link_github"] is None
+
+
+@pytest.mark.parametrize("campo, limite", [("titulo", 60), ("descricao", 160), ("categoria", 50)])
+def test_validar_recusa_texto_acima_do_tamanho_da_coluna(campo, limite):
+    assert validar(PROJETOS, projeto(**{campo: "x" * limite}))[1] is None
+    valores, erro = validar(PROJETOS, projeto(**{campo: "x" * (limite + 1)}))
+    assert valores is None
+    assert erro == f"'{campo}' tem {limite + 1} caracteres (máximo {limite})"
+
+
+def test_validar_conta_caracteres_e_nao_bytes():
+    assert validar(PROJETOS, projeto(titulo="ç" * 60))[1] is None
+
+
+@pytest.mark.parametrize("registro, mensagem", [
+    (projeto(titulo=None), "'titulo' é obrigatório"),
+    (projeto(titulo="   "), "'titulo' é obrigatório"),
+    (projeto(senha="x"), "campos desconhecidos: senha"),
+    (projeto(id="abc"), "id inválido: 'abc'"),
+    (projeto(id=0), "id inválido: 0"),
+    (projeto(id=-3), "id inválido: -3"),
+    (projeto(id=[1]), "id inválido: [1]"),
+])
+def test_validar_recusa_registros_invalidos(registro, mensagem):
+    assert validar(PROJETOS, registro) == (None, mensagem)
+
+
+def test_validar_aplica_os_padroes_do_painel():
+    valores, erro = validar(CONTATOS, {"nome": "GitHub", "url": "https://github.com", "cor_icone": " "})
+    assert erro is None
+    assert valores["cor_icone"] == "text-gray-400" and valores["cor_hover"] == "hover:bg-neon"
+
+
+def test_validar_converte_numeros_em_texto():
+    valores, erro = validar(PROJETOS, projeto(categoria=2024))
+    assert erro is None and valores["categoria"] == "2024"
+
+
+# --- LEITURA DO ARQUIVO ---
+def test_ndjson_com_linhas_invalidas():
+    arquivo = ndjson(projeto(), "\n", "{quebrado\n", "[1, 2]\n", '"texto"\n', projeto(titulo="Último"))
+    registros = list(registros_do_arquivo(arquivo, "ndjson"))
+    assert [linha for linha, _ in registros] == [1, 3, 4, 5, 6]
+    assert isinstance(registros[0][1], dict) and registros[4][1]["titulo"] == "Último"
+    assert registros[1][1].startswith("JSON inválido:")
+    assert registros[2][1] == registros[3][1] == "cada linha deve ser um objeto JSON"
+
+
+def test_ndjson_com_utf8_invalido_falha():
+    with pytest.raises(UnicodeDecodeError):
+        list(registros_do_arquivo(io.BytesIO(b'{"titulo": "\xff"}\n'), "ndjson"))
+
+
+def test_csv_com_bom_e_colunas_a_mais():
+    conteudo = "\ufefftitulo,descricao,categoria\nServidor,\"Postfix, Dovecot\",Linux\nA,B,C,D\n"
+    registros = list(registros_do_arquivo(io.BytesIO(conteudo.encode("utf-8")), "csv"))
+    assert registros[0] == (2, {"titulo": "Servidor", "descricao": "Postfix, Dovecot", "categoria": "Linux"})
+    assert registros[1] == (3, "mais colunas que o cabeçalho")
+
+
+# --- IMPORTAÇÃO ---
+@pytest.fixture
+def tabelas(banco):
+    def limpar():
+        with banco.begin() as conexao:
+            conexao.execute(delete(models.Projeto))
+            conexao.execute(delete(models.Contato))
+
+    limpar()
+    yield
+    limpar()
+
+
+def contar(modelo) -> int:
+    from database import SessionLocal
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(modelo))
+
+
+def test_importar_pula_linhas_invalidas_e_grava_as_validas(tabelas):
+    arquivo = ndjson(projeto(), "{quebrado\n", projeto(titulo="x" * 61), projeto(id=99, titulo="Outro"), "[]\n")
+    relatorio = asyncio.run(importar(PROJETOS, arquivo, "ndjson"))
+    assert relatorio["linhas"] == 5 and relatorio["inseridos"] == 2 and relatorio["atualizados"] == 0
+    assert [erro["linha"] for erro in relatorio["erros"]] == [2, 3, 5]
+    assert relatorio["erros"][1]["erro"] == "'titulo' tem 61 caracteres (máximo 60)"
+    assert contar(models.Projeto) == 2
+
+
+def test_importar_simulado_nao_grava(tabelas):
+    relatorio = asyncio.run(importar(PROJETOS, ndjson(projeto(), projeto()), "ndjson", simular=True))
+    assert relatorio["inseridos"] == 2 and relatorio["simulacao"]
+    assert contar(models.Projeto) == 0
+
+
+def test_importar_atualiza_pelo_id(tabelas):
+    asyncio.run(importar(PROJETOS, ndjson(projeto(id=5)), "ndjson", modo="atualizar"))
+    relatorio = asyncio.run(importar(PROJETOS, ndjson(projeto(id=5, titulo="Novo"), projeto(id=6)), "ndjson",
+                                     modo="atualizar"))
+    assert relatorio["atualizados"] == 1 and relatorio["inseridos"] == 1
+    from database import SessionLocal
+    with SessionLocal() as db:
+        assert db.get(models.Projeto, 5).titulo == "Novo"
+
+
+def test_importar_respeita_o_teto_de_contatos(tabelas):
+    contatos = [{"nome": f"Rede {i}", "url": f"https://exemplo.com/{i}"} for i in range(CONTATOS.limite + 1)]
+    relatorio = asyncio.run(importar(CONTATOS, ndjson(*contatos), "ndjson"))
+    assert relatorio["inseridos"] == 0 and "máximo 10" in relatorio["falha"]
+    assert contar(models.Contato) == 0
+
+
+def test_importar_desfaz_tudo_acima_do_maximo_de_linhas(tabelas, monkeypatch):
+    monkeypatch.setattr(transferencia, "IMPORTACAO_MAX_LINHAS", 3)
+    relatorio = asyncio.run(importar(PROJETOS, ndjson(*[projeto() for _ in range(4)]), "ndjson"))
+    assert relatorio["inseridos"] == 0 and relatorio["falha"] == "arquivo passa de 3 linhas"
+    assert contar(models.Projeto) == 0
+
+
+def test_relatorio_limita_os_erros_listados(tabelas, monkeypatch):
+    monkeypatch.setattr(transferencia, "IMPORTACAO_MAX_ERROS", 2)
+    relatorio = asyncio.run(importar(PROJETOS, ndjson(*["{\n"] * 5), "ndjson"))
+    assert len(relatorio["erros"]) == 2 and relatorio["erros_omitidos"] == 3
@@ -0,0 +1,226 @@
+import io
+import os
+import csv
+import json
+import asyncio
+import logging
+import itertools
+from datetime import datetime, timezone
+from sqlalchemy import select, insert, func
+from sqlalchemy.dialects import mysql, sqlite
+from starlette.responses import StreamingResponse
+import models
+import cache
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Linhas por lote: tamanho de cada leitura do cursor na exportação e de cada insert/upsert na importação
+TRANSFERENCIA_LOTE = int(os.environ.get("TRANSFERENCIA_LOTE", "500"))
+# Teto de linhas por arquivo importado e de erros listados no relatório
+IMPORTACAO_MAX_LINHAS = int(os.environ.get("IMPORTACAO_MAX_LINHAS", "100000"))
+IMPORTACAO_MAX_ERROS = int(os.environ.get("IMPORTACAO_MAX_ERROS", "200"))
+
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+# Tabela exportável/importável: colunas, campos obrigatórios, valores padrão (os mesmos dos formulários do
+# painel), teto de registros e a chave de cache invalidada pela importação
+class Entidade:
+    __slots__ = ("nome", "modelo", "colunas", "obrigatorios", "padroes", "limite", "chave_cache")
+
+    def __init__(self, nome: str, modelo, obrigatorios, chave_cache: str, padroes=None, limite: int = None):
+        self.nome = nome
+        self.modelo = modelo
+        self.colunas = [coluna.name for coluna in modelo.__table__.columns]
+        self.obrigatorios = set(obrigatorios)
+        self.padroes = padroes or {}
+        self.limite = limite
+        self.chave_cache = chave_cache
+
+
+ENTIDADES = {
+    "projetos": Entidade("projetos", models.Projeto, ("titulo", "descricao", "categoria"), cache.PROJETOS),
+    "contatos": Entidade("contatos", models.Contato, ("nome", "url"), cache.LAYOUT,
+                         padroes={"cor_icone": "text-gray-400", "cor_hover": "hover:bg-neon"}, limite=10),
+}
+
+
+# --- EXPORTAÇÃO EM STREAMING ---
+# Cursor do lado do servidor (stream + yield_per): só um lote de linhas em memória por vez. A sessão é aberta
+# dentro do gerador porque a do Depends(get_db) fecha antes de a resposta terminar de ser enviada.
+async def _linhas(entidade: Entidade):
+    colunas = [getattr(entidade.modelo, nome) for nome in entidade.colunas]
+    async with AsyncSessionLocal() as db:
+        resultado = await db.stream(select(*colunas).order_by(entidade.modelo.id)
+                                    .execution_options(yield_per=TRANSFERENCIA_LOTE))
+        async for lote in resultado.partitions():
+            yield lote
+
+
+async def _ndjson(entidade: Entidade):
+    async for lote in _linhas(entidade):
+        yield "".join(json.dumps(dict(zip(entidade.colunas, linha)), ensure_ascii=False) + "\n" for linha in lote)
+
+
+async def _csv(entidade: Entidade):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    escritor.writerow(entidade.colunas)
+    async for lote in _linhas(entidade):
+        escritor.writerows(["" if valor is None else valor for valor in linha] for linha in lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # Tabela vazia: só o cabeçalho
+        yield buffer.getvalue()
+
+
+def exportar(entidade: Entidade, formato: str) -> StreamingResponse:
+    data = datetime.now(timezone.utc).strftime("%Y%m%d")
+    corpo = _csv(entidade) if formato == "csv" else _ndjson(entidade)
+    return StreamingResponse(corpo, media_type=FORMATOS[formato], headers={
+        "Content-Disposition": f'attachment; filename="{entidade.nome}-{data}.{formato}"',
+        "Cache-Control": "no-store",
+    })
+
+
+# --- LEITURA INCREMENTAL DO UPLOAD ---
+# Devolve um iterador de (número da linha, dict ou mensagem de erro). O arquivo é lido sob demanda: cada
+# lote é puxado numa thread (islice) e nunca há mais que um lote em memória.
+def registros_do_arquivo(arquivo, formato: str):
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            if None in registro:
+                yield leitor.line_num, "mais colunas que o cabeçalho"
+            else:
+                yield leitor.line_num, registro
+        return
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as e:
+            yield numero, f"JSON inválido: {e}"
+            continue
+        yield numero, registro if isinstance(registro, dict) else "cada linha deve ser um objeto JSON"
+
+
+# Valida contra as colunas do modelo (obrigatórios e tamanho máximo). Devolve (valores, None) ou (None, erro).
+def validar(entidade: Entidade, registro: dict):
+    desconhecidos = set(registro) - set(entidade.colunas)
+    if desconhecidos:
+        return None, f"campos desconhecidos: {', '.join(sorted(map(str, desconhecidos)))}"
+    valores = {}
+    for nome in entidade.colunas:
+        valor = registro.get(nome)
+        if isinstance(valor, str):
+            valor = valor.strip() or None
+        if nome == "id":
+            if valor is not None:
+                try:
+                    valor = int(valor)
+                except (TypeError, ValueError):
+                    return None, f"id inválido: {valor!r}"
+                if valor <= 0:
+                    return None, f"id inválido: {valor}"
+            valores[nome] = valor
+            continue
+        if valor is None:
+            if nome in entidade.obrigatorios:
+                return None, f"'{nome}' é obrigatório"
+            valores[nome] = entidade.padroes.get(nome)
+            continue
+        if not isinstance(valor, str):
+            valor = str(valor)
+        limite = getattr(entidade.modelo, nome).type.length
+        if limite and len(valor) > limite:
+            return None, f"'{nome}' tem {len(valor)} caracteres (máximo {limite})"
+        valores[nome] = valor
+    return valores, None
+
+
+def consulta_upsert(entidade: Entidade, dialeto: str):
+    tabela = entidade.modelo.__table__
+    atualizaveis = [nome for nome in entidade.colunas if nome != "id"]
+    if dialeto == "mysql":
+        consulta = mysql.insert(tabela)
+        return consulta.on_duplicate_key_update({nome: consulta.inserted[nome] for nome in atualizaveis})
+    consulta = sqlite.insert(tabela)
+    return consulta.on_conflict_do_update(index_elements=[tabela.c.id],
+                                          set_={nome: consulta.excluded[nome] for nome in atualizaveis})
+
+
+# --- IMPORTAÇÃO EM LOTES NUMA ÚNICA TRANSAÇÃO ---
+# modo "inserir": toda linha vira um registro novo (o id do arquivo é ignorado)
+# modo "atualizar": linhas com id existente são atualizadas, as demais inseridas (upsert por id)
+# Linhas inválidas entram no relatório e são puladas; as válidas são gravadas juntas, com a invalidação
+# do cache no mesmo commit. Com simular=True tudo é validado e gravado, mas desfeito no final.
+async def importar(entidade: Entidade, arquivo, formato: str, modo: str = "inserir", simular: bool = False) -> dict:
+    relatorio = {"formato": formato, "modo": modo, "simulacao": simular, "linhas": 0,
+                 "inseridos": 0, "atualizados": 0, "erros": [], "erros_omitidos": 0}
+
+    def erro(linha: int, mensagem: str):
+        if len(relatorio["erros"]) < IMPORTACAO_MAX_ERROS:
+            relatorio["erros"].append({"linha": linha, "erro": mensagem})
+        else:
+            relatorio["erros_omitidos"] += 1
+
+    registros = registros_do_arquivo(arquivo, formato)
+    async with AsyncSessionLocal() as db:
+        dialeto = db.bind.dialect.name
+        try:
+            while True:
+                lote = await asyncio.to_thread(lambda: list(itertools.islice(registros, TRANSFERENCIA_LOTE)))
+                if not lote:
+                    break
+                novos, existentes = [], []
+                for linha, registro in lote:
+                    relatorio["linhas"] += 1
+                    if relatorio["linhas"] > IMPORTACAO_MAX_LINHAS:
+                        raise ValueError(f"arquivo passa de {IMPORTACAO_MAX_LINHAS} linhas")
+                    if isinstance(registro, str):
+                        erro(linha, registro)
+                        continue
+                    valores, mensagem = validar(entidade, registro)
+                    if mensagem:
+                        erro(linha, mensagem)
+                    elif modo == "atualizar" and valores["id"] is not None:
+                        existentes.append(valores)
+                    else:
+                        valores.pop("id")
+                        novos.append(valores)
+
+                if existentes:
+                    ids = [valores["id"] for valores in existentes]
+                    ja_existem = set((await db.scalars(select(entidade.modelo.id).where(entidade.modelo.id.in_(ids)))).all())
+                    await db.execute(consulta_upsert(entidade, dialeto), existentes)
+                    relatorio["atualizados"] += sum(1 for i in ids if i in ja_existem)
+                    relatorio["inseridos"] += sum(1 for i in ids if i not in ja_existem)
+                if novos:
+                    await db.execute(insert(entidade.modelo.__table__), novos)
+                    relatorio["inseridos"] += len(novos)
+
+            # Mesmo teto do painel (ex: 10 contatos no rodapé), conferido com tudo já gravado na transação
+            if entidade.limite and relatorio["inseridos"]:
+                total = await db.scalar(select(func.count()).select_from(entidade.modelo))
+                if total > entidade.limite:
+                    raise ValueError(f"a importação deixaria {total} {entidade.nome} (máximo {entidade.limite})")
+        except Exception as e:
+            # Erro de banco (ou arquivo grande demais) no meio do caminho: nada do arquivo é gravado
+            await db.rollback()
+            logger.warning(f"[IMPORTACAO] {entidade.nome}: importação desfeita na linha {relatorio['linhas']}: {e}")
+            relatorio.update(inseridos=0, atualizados=0, falha=str(e))
+            return relatorio
+
+        if simular or not (relatorio["inseridos"] or relatorio["atualizados"]):
+            await db.rollback()
+        else:
+            # Versão do cache incrementada no mesmo commit dos dados
+            await cache.versoes.invalidar(db, entidade.chave_cache)
+            logger.info(f"[IMPORTACAO] {entidade.nome}: {relatorio['inseridos']} inseridos, "
+                        f"{relatorio['atualizados']} atualizados, {relatorio['linhas'] - relatorio['inseridos'] - relatorio['atualizados']} com erro.")
+    return relatorio